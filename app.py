@@ -10,25 +10,19 @@
 """
 import sys
 import signal
+import multiprocessing
+import asyncio
 import logging
-import threading
-import numpy as np
 from pathlib import Path
+from typing import Optional
 
 from version import get_version_string
-from config import load_games, load_csv_codes, load_actions, load_test_config, load_test_service_config
+from config import GameConfig, load_games, load_csv_codes, load_actions, load_test_config, load_test_service_config
 from config.machine_profiles import load_machine_profiles, match_machine_profile
 from notification import LarkClient
-from hotkey import start_hotkey_listener, stop_event
+from hotkey import start_hotkey_listener, stop_event, wait_while
 from game import GameRunner
-
-# 測試相關導入
-try:
-    from qa.test_manager import TestTaskManager
-    from qa.test_service import TestServiceClient
-except ImportError:
-    TestTaskManager = None
-    TestServiceClient = None
+from game.navigation import load_cashout_selector_hits
 
 # BASE_DIR: 若是打包成 .exe，取可執行檔所在資料夾；否則取 .py 檔案所在資料夾
 BASE_DIR = Path(getattr(sys, "frozen", False) and Path(sys.executable).parent or Path(__file__).resolve().parent)
@@ -39,6 +33,10 @@ import os
 load_dotenv(BASE_DIR / "dotenv.env")
 LARK_WEBHOOK = os.getenv("LARK_WEBHOOK_URL")
 
+# Worker 分批啟動：每批數量與批次間隔（秒）
+WORKER_START_BATCH = 10
+WORKER_BATCH_DELAY = 1.5
+
 # 設定 logging 到終端
 logging.basicConfig(
     level=logging.INFO,
@@ -47,7 +45,7 @@ logging.basicConfig(
 
 
 def handle_interrupt(sig, frame):
-    """Ctrl+C 時將 stop_event 設為 True，讓各執行緒優雅退出"""
+    """Ctrl+C 時將 stop_event 設為 True，讓各 Worker 優雅退出"""
     print("\n🛑 收到 Ctrl+C，中止中…")
     stop_event.set()
 
@@ -62,7 +60,7 @@ def main():
     3. 讀取配置（config/loader.py）
     4. 初始化通知客戶端（notification/lark.py）
     5. 為每個遊戲創建 GameRunner（game/game_runner.py）
-    6. 啟動所有遊戲執行器
+    6. 在同一個事件迴圈中啟動所有遊戲執行器（asyncio.TaskGroup）
     7. 等待所有執行完成
     """
     # 0. 顯示版本資訊
@@ -76,9 +74,12 @@ def main():
     
     # 2. 讀取配置
     logging.info("[Runner] 開始讀取設定檔")
-    games = load_games(BASE_DIR)
+    csv_codes = load_csv_codes(BASE_DIR)
+    games = load_games(BASE_DIR, csv_codes)
     keyword_actions, machine_actions = load_actions(BASE_DIR)
     test_config = load_test_config(BASE_DIR)
+    # Cashout 選擇器命中次數保存在可執行檔 / 專案所在資料夾，跨執行沿用
+    load_cashout_selector_hits(BASE_DIR)
     
     # 2.5. 讀取機器類型配置
     machine_profiles = load_machine_profiles(BASE_DIR)
@@ -103,32 +104,39 @@ def main():
     # 3.5. 讀取測試服務配置
     test_service_config = load_test_service_config(BASE_DIR)
     test_service = None
-    if test_service_config.get("enabled") and TestServiceClient:
-        test_service = TestServiceClient(
-            service_url=test_service_config.get("url"),
-            api_key=test_service_config.get("api_key")
-        )
-        logging.info(f"[Runner] 測試服務已啟用: {test_service_config.get('url')}")
-    else:
+    if test_service_config.get("enabled"):
+        # 只有啟用時才載入 qa 模組，未使用時不付出匯入成本
+        try:
+            from qa.test_service import TestServiceClient
+        except ImportError:
+            TestServiceClient = None
+        if TestServiceClient:
+            test_service = TestServiceClient(
+                service_url=test_service_config.get("url"),
+                api_key=test_service_config.get("api_key")
+            )
+            logging.info(f"[Runner] 測試服務已啟用: {test_service_config.get('url')}")
+    if not test_service:
         logging.info("[Runner] 測試服務未啟用")
     
-    # 3.6. 讀取 CSV 機器號，創建共享佇列
-    csv_codes = load_csv_codes(BASE_DIR)
-    task_manager = None
-    if csv_codes and TestTaskManager:
-        task_manager = TestTaskManager(csv_codes)
-        logging.info(f"[Runner] 共享佇列已建立: {len(csv_codes)} 個機器號, {len(games)} 個 URL (Worker)")
-    else:
+    # 3.6. 有 CSV 機器號時使用佇列模式（佇列在確定 Worker 後建立）
+    TestTaskManager = None
+    if csv_codes:
+        try:
+            from qa.test_manager import TestTaskManager
+        except ImportError:
+            pass
+    use_queue = bool(csv_codes and TestTaskManager)
+    if not use_queue:
         logging.info("[Runner] 沒有 CSV 機器號，將使用單機模式")
     
-    # 4. 為每個 URL 創建 GameRunner 並啟動
-    #    每個 URL 是一個 Worker，從共享佇列中依次取機器號測試
-    threads: list[threading.Thread] = []
-    logging.info(f"[Runner] 準備啟動 {len(games)} 個執行緒 (Worker)")
+    # 4. 為每個 URL 創建 GameRunner
+    #    每個 URL 是一個 Worker，先從自己的佇列取機器號測試，空了再向其他 Worker 竊取
+    worker_confs: list[tuple[str, GameConfig]] = []
     
     for idx, conf in enumerate(games):
-        # 如果有共享佇列，初始 game_title_code 由佇列分配（不用 load_games 配對的）
-        if task_manager:
+        # 如果有佇列，初始 game_title_code 由佇列分配（不用 load_games 配對的）
+        if use_queue:
             # 清空 load_games 配對的 game_title_code，由 GameRunner 的循環控制
             conf.game_title_code = None
         else:
@@ -147,6 +155,19 @@ def main():
                 logging.warning(f"[Runner] 機器 {idx+1} 無 game_title_code，跳過執行")
                 continue
         
+        worker_confs.append((f"Worker-{idx+1}", conf))
+    
+    # 4.5. 將 CSV 機器號輪流分配到各 Worker 的本地佇列
+    task_manager = None
+    if use_queue:
+        task_manager = TestTaskManager(csv_codes, worker_ids=[name for name, _ in worker_confs])
+        logging.info(f"[Runner] 工作佇列已建立: {len(csv_codes)} 個機器號, {len(worker_confs)} 個 URL (Worker)")
+    
+    # 所有 Worker 開好瀏覽器後才一起進入測試流程，避免先啟動的 Worker 搶跑
+    start_barrier = asyncio.Barrier(len(worker_confs)) if worker_confs else None
+    
+    runners: list[tuple[str, GameRunner]] = []
+    for worker_name, conf in worker_confs:
         runner = GameRunner(
             conf, 
             lark, 
@@ -157,30 +178,13 @@ def main():
             task_manager=task_manager,
             machine_profile=None,  # 由 GameRunner 內部動態匹配
             machine_profiles=machine_profiles,  # 傳入所有 profiles 供動態匹配
+            start_barrier=start_barrier,
+            worker_id=worker_name,
         )
-        
-        worker_name = f"Worker-{idx+1}"
-        logging.info(f"[Runner] 啟動 {worker_name} (URL: ...{conf.url[-30:]})")
-        
-        t = threading.Thread(
-            target=runner.run,
-            name=worker_name,
-            daemon=True,
-        )
-        t.start()
-        threads.append(t)
-        # 錯開啟動時間，避免同時啟動造成資源競爭
-        if idx < len(games) - 1:
-            delay = 1.0 + np.random.random()
-            logging.info(f"[Runner] 等待 {delay:.2f} 秒後啟動下一個執行緒")
-            import time
-            time.sleep(delay)
-    
-    # 5. 等待所有 Worker 完成
-    if task_manager:
-        logging.info(f"[Runner] 所有 Worker 已啟動，等待佇列處理完畢...")
-    for t in threads:
-        t.join()
+        runners.append((worker_name, runner))
+    
+    # 5. 在同一個事件迴圈中啟動所有 Worker 並等待完成
+    asyncio.run(_run_workers(runners, task_manager, start_barrier))
     
     if task_manager:
         logging.info(f"[Runner] 所有機器測試完成! 進度: {task_manager.get_progress()}")
@@ -189,6 +193,70 @@ def main():
             logging.info(f"[Runner]   {worker_id}: 完成 {len(codes)} 台 - {codes}")
 
 
+async def _supervise_worker(worker_name: str, runner: GameRunner):
+    """
+    執行單一 Worker；一旦發生未處理例外立即記錄完整 traceback 並設置 stop_event，
+    讓其他 Worker 優雅收尾（發送報告、關閉瀏覽器），而不是被直接取消
+    """
+    try:
+        await runner.run_async()
+    except Exception:
+        logging.exception(f"[Runner] {worker_name} 發生未處理例外，通知所有 Worker 停止")
+        stop_event.set()
+        # 此 Worker 可能在抵達啟動 Barrier 前就失敗，abort 讓其他 Worker 不再空等
+        if runner.start_barrier:
+            await runner.start_barrier.abort()
+    else:
+        logging.info(f"[Runner] {worker_name} 已結束")
+
+
+async def _abort_barrier_on_stop(start_barrier: asyncio.Barrier):
+    """stop_event 一旦置位（Ctrl+C、熱鍵或 Worker 失敗）就 abort 啟動 Barrier，喚醒仍在等待的 Worker"""
+    await wait_while(lambda: not stop_event.is_set())
+    await start_barrier.abort()
+
+
+async def _run_workers(
+    runners: list[tuple[str, GameRunner]],
+    task_manager,
+    start_barrier: Optional[asyncio.Barrier] = None,
+):
+    """
+    以 asyncio.TaskGroup 並行執行所有 Worker（共用一個事件迴圈，不再每個 Worker 一條執行緒）
+    """
+    # 非 Windows 平台改由事件迴圈處理 Ctrl+C；Windows 不支援時沿用 signal.signal
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGINT, handle_interrupt, signal.SIGINT, None)
+    except (NotImplementedError, RuntimeError):
+        pass
+    
+    logging.info(f"[Runner] 準備啟動 {len(runners)} 個 Worker")
+    stop_watcher = asyncio.create_task(_abort_barrier_on_stop(start_barrier)) if start_barrier else None
+    try:
+        await _start_workers(runners, task_manager)
+    finally:
+        if stop_watcher:
+            stop_watcher.cancel()
+
+
+async def _start_workers(runners: list[tuple[str, GameRunner]], task_manager):
+    """分批建立所有 Worker 任務並等待全部結束"""
+    async with asyncio.TaskGroup() as tg:
+        for idx, (worker_name, runner) in enumerate(runners):
+            # 分批啟動：每批最多 WORKER_START_BATCH 個，批次之間錯開，避免同時啟動造成資源競爭
+            if idx and idx % WORKER_START_BATCH == 0:
+                logging.info(f"[Runner] 等待 {WORKER_BATCH_DELAY:.1f} 秒後啟動下一批 Worker")
+                await asyncio.sleep(WORKER_BATCH_DELAY)
+            logging.info(f"[Runner] 啟動 {worker_name} (URL: ...{runner.cfg.url[-30:]})")
+            tg.create_task(_supervise_worker(worker_name, runner), name=worker_name)
+        
+        if task_manager:
+            logging.info(f"[Runner] 所有 Worker 已啟動，等待佇列處理完畢...")
+
+
 if __name__ == "__main__":
+    # 打包成 .exe 時，圖片比對進程池的子進程需要由此分流，不可重新執行 main()
+    multiprocessing.freeze_support()
     main()
 
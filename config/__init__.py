@@ -1,5 +1,5 @@
 """配置管理模組"""
-from .models import GameConfig
+from .models import GameConfig, MachineAction
 from .loader import load_games, load_actions, load_test_service_config, load_csv_codes
 from .test_config import TestConfig, TestScenario, TestFeatures, load_test_config
 from .machine_profiles import (
@@ -9,6 +9,7 @@ from .machine_profiles import (
 
 __all__ = [
     "GameConfig",
+    "MachineAction",
     "load_games",
     "load_csv_codes",
     "load_actions",
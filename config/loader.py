@@ -2,68 +2,98 @@
 import json
 import csv
 import logging
+from functools import lru_cache
+from itertools import zip_longest
 from pathlib import Path
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any
 
-from .models import GameConfig
+from .models import GameConfig, MachineAction
 
+# orjson 在 C 層解析並直接處理 bytes，未安裝時退回標準庫 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-def load_games(base_dir: Path) -> List[GameConfig]:
+
+def read_json(path: Path) -> Any:
+    """讀取 JSON 檔案（優先使用 orjson）"""
+    if orjson is not None:
+        with path.open("rb") as f:
+            return orjson.loads(f.read())
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_games(base_dir: Path, game_title_codes: Optional[List[str]] = None) -> List[GameConfig]:
     """
     讀取 game_config.json 和 game_title_codes.csv，配對後返回 GameConfig 列表
+
+    Args:
+        base_dir: 專案根目錄
+        game_title_codes: 已讀取的機器號列表（可選）；提供時不再重新解析 CSV
     """
     # 讀取遊戲清單
     try:
-        with (base_dir / "game_config.json").open("r", encoding="utf-8") as f:
-            cfg_list = json.load(f)
+        cfg_list = read_json(base_dir / "game_config.json")
         logging.info(f"[Config] 讀取 game_config.json 成功，筆數={len(cfg_list)}")
     except Exception as e:
         logging.error(f"[Config] 讀取 game_config.json 失敗: {e}")
         raise
 
-    # 讀取 game_title_codes.csv
-    game_title_codes: List[str] = []
-    csv_path = base_dir / "game_title_codes.csv"
-    if csv_path.exists():
-        try:
-            with csv_path.open("r", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    code = row.get("game_title_code", "").strip()
-                    if code:  # 只添加非空值
-                        game_title_codes.append(code)
-            logging.info(f"[Config] 讀取 game_title_codes.csv 成功，共 {len(game_title_codes)} 個代碼")
-        except Exception as e:
-            logging.warning(f"[Config] 讀取 game_title_codes.csv 失敗: {e}")
-    else:
-        logging.warning(f"[Config] game_title_codes.csv 不存在，將使用空值")
-
-    # 配對 game_config.json 和 game_title_codes.csv
-    games: List[GameConfig] = []
-    code_index = 0  # CSV 索引計數器
-    for raw in cfg_list:
-        if raw.get("enabled", True):
-            # 從 CSV 中按順序取得 game_title_code
-            game_title_code = None
-            if code_index < len(game_title_codes):
-                game_title_code = game_title_codes[code_index]
-                code_index += 1
-                logging.info(f"[Config] 配對 game_title_code: {game_title_code} -> URL: {raw.get('url', '')[:50]}...")
-            else:
-                logging.warning(f"[Config] CSV 中的 game_title_code 數量不足，第 {code_index + 1} 個配置將使用空值")
-            
-            games.append(
-                GameConfig(
-                    url=raw.get("url"),
-                    game_title_code=game_title_code,
-                    machine_type=raw.get("machine_type"),  # 可選的機器類型
-                    enabled=True,
-                )
-            )
+    # 讀取 game_title_codes.csv（呼叫端已讀取時直接共用）
+    if game_title_codes is None:
+        game_title_codes = load_csv_codes(base_dir)
+
+    # 配對 game_config.json 和 game_title_codes.csv（依序一對一，CSV 不足時為空值）
+    enabled = [raw for raw in cfg_list if raw.get("enabled", True)]
+    games: List[GameConfig] = [
+        GameConfig(
+            url=raw.get("url"),
+            game_title_code=code,
+            machine_type=raw.get("machine_type"),  # 可選的機器類型
+            enabled=True,
+        )
+        for raw, code in zip_longest(enabled, game_title_codes[:len(enabled)])
+    ]
+    
+    matched = min(len(enabled), len(game_title_codes))
+    logging.info(f"[Config] 配對 game_title_code: {matched}/{len(enabled)} 個 enabled 配置")
+    if matched < len(enabled):
+        logging.warning(f"[Config] CSV 中的 game_title_code 數量不足，{len(enabled) - matched} 個配置將使用空值")
     
     return games
 
 
+@lru_cache(maxsize=8)
+def _parse_csv_codes(csv_path: str, mtime_ns: int) -> Tuple[str, ...]:
+    """
+    解析 game_title_codes.csv 的 game_title_code 欄位
+
+    以 (路徑, 修改時間) 作為快取鍵：同一份檔案只解析一次，檔案變更後自動重新讀取。
+    使用 csv.reader 加欄位索引，避免 DictReader 每列建立 dict。
+    """
+    codes: List[str] = []
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header or "game_title_code" not in header:
+            return ()
+        col = header.index("game_title_code")
+        for row in reader:
+            if col < len(row):
+                code = row[col].strip()
+                if code:  # 只添加非空值
+                    codes.append(code)
+    return tuple(codes)
+
+
+def _read_codes_cached(base_dir: Path) -> Tuple[str, ...]:
+    """讀取 game_title_codes.csv（帶快取）；檔案不存在時拋出 FileNotFoundError"""
+    csv_path = base_dir / "game_title_codes.csv"
+    return _parse_csv_codes(str(csv_path), csv_path.stat().st_mtime_ns)
+
+
 def load_csv_codes(base_dir: Path) -> List[str]:
     """
     讀取 game_title_codes.csv，返回所有機器號列表
@@ -71,38 +101,29 @@ def load_csv_codes(base_dir: Path) -> List[str]:
     Returns:
         機器號列表，例如 ["873-JJBX-0004", "873-JJBX-0005", ...]
     """
-    csv_path = base_dir / "game_title_codes.csv"
-    codes: List[str] = []
-    
-    if not csv_path.exists():
+    if not (base_dir / "game_title_codes.csv").exists():
         logging.warning(f"[Config] game_title_codes.csv 不存在")
-        return codes
+        return []
     
     try:
-        with csv_path.open("r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                code = row.get("game_title_code", "").strip()
-                if code:
-                    codes.append(code)
+        codes = list(_read_codes_cached(base_dir))
         logging.info(f"[Config] 讀取 game_title_codes.csv 成功，共 {len(codes)} 個機器號")
+        return codes
     except Exception as e:
         logging.warning(f"[Config] 讀取 game_title_codes.csv 失敗: {e}")
-    
-    return codes
+        return []
 
 
-def load_actions(base_dir: Path) -> Tuple[Dict[str, List[str]], Dict[str, Tuple[List[str], bool]]]:
+def load_actions(base_dir: Path) -> Tuple[Dict[str, List[str]], Dict[str, MachineAction]]:
     """
     讀取 actions.json，返回 keyword_actions 和 machine_actions
     """
-    with (base_dir / "actions.json").open("r", encoding="utf-8") as f:
-        actions = json.load(f)
+    actions = read_json(base_dir / "actions.json")
     
     keyword_actions: Dict[str, List[str]] = actions.get("keyword_actions", {})
-    # 將 {"kw": {"positions":[...], "click_take":true}} 轉成 {"kw": ([...], True)}
-    machine_actions: Dict[str, Tuple[List[str], bool]] = {
-        kw: (info.get("positions", []), bool(info.get("click_take", False)))
+    # 將 {"kw": {"positions":[...], "click_take":true}} 轉成 {"kw": MachineAction((...), True)}
+    machine_actions: Dict[str, MachineAction] = {
+        kw: MachineAction(tuple(info.get("positions", ())), bool(info.get("click_take", False)))
         for kw, info in actions.get("machine_actions", {}).items()
     }
     
@@ -117,8 +138,7 @@ def load_test_service_config(base_dir: Path) -> Dict[str, Any]:
         return {}
     
     try:
-        with test_config_path.open("r", encoding="utf-8") as f:
-            raw = json.load(f)
+        raw = read_json(test_config_path)
         return raw.get("test_service", {})
     except Exception as e:
         logging.warning(f"[Config] 讀取測試服務配置失敗: {e}")
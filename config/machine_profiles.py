@@ -1,10 +1,26 @@
 """機器類型配置模組 - 從文件夾結構載入不同機器類型的測試流程"""
-import json
+import re
 import logging
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Optional, List, Any
+from typing import Dict, Optional, List, Tuple, Any
 from dataclasses import dataclass, field
 
+from .loader import read_json
+
+# msgspec 可在 C 層直接解析成有型別的結構；未安裝時退回 read_json + dict 取值
+try:
+    import msgspec
+    from . import schemas
+except ImportError:
+    msgspec = None
+    schemas = None
+
+# game_title_code 無法以 "-" 分割時，用於去除開頭/結尾數字
+_LEAD_DIGITS = re.compile(r'^\d+-?')
+_TRAIL_DIGITS = re.compile(r'-?\d+$')
+
 
 @dataclass
 class MachineTestFlow:
@@ -15,6 +31,7 @@ class MachineTestFlow:
     timeout: float = 10.0
     retry_count: int = 3
     config: Dict[str, Any] = field(default_factory=dict)
+    mutates: bool = True  # False 表示只觀察頁面狀態（不點擊），可與相鄰的觀察流程並行執行
 
 
 @dataclass
@@ -55,6 +72,148 @@ class MachineProfiles:
     profiles: Dict[str, MachineProfile] = field(default_factory=dict)
     default_profile: Optional[str] = None
     profiles_dir: Optional[Path] = None
+    
+    # 匹配用索引（由 build_index 建立，僅包含 enabled 的配置）
+    by_keyword: Dict[str, MachineProfile] = field(default_factory=dict, repr=False)
+    by_gameid: Dict[str, MachineProfile] = field(default_factory=dict, repr=False)
+    title_code_patterns: List[Tuple[str, MachineProfile]] = field(default_factory=list, repr=False)
+    url_patterns: List[Tuple[str, MachineProfile]] = field(default_factory=list, repr=False)
+    
+    # match_machine_profile 的結果快取（結果只取決於參數，索引重建時清空）
+    match_cache: Dict[Tuple[Any, ...], Optional[MachineProfile]] = field(default_factory=dict, repr=False)
+    
+    def __post_init__(self):
+        self.build_index()
+    
+    def build_index(self):
+        """
+        依 profiles 建立匹配索引，讓 match_machine_profile 不必每次掃描所有配置
+        
+        修改 profiles 後需重新呼叫。同一個 gameid 出現在多個配置時，以先載入者為準。
+        """
+        self.match_cache = {}
+        self.by_keyword = {}
+        self.by_gameid = {}
+        self.title_code_patterns = []
+        self.url_patterns = []
+        
+        for key, profile in self.profiles.items():
+            if not profile.enabled:
+                continue
+            
+            self.by_keyword.setdefault(key.upper(), profile)
+            
+            match_rules = profile.match_rules
+            patterns = match_rules.get("game_title_code_pattern")
+            if isinstance(patterns, list):
+                self.title_code_patterns.extend((pattern, profile) for pattern in patterns)
+            
+            gameid_list = match_rules.get("gameid")
+            if isinstance(gameid_list, list):
+                for gameid in gameid_list:
+                    self.by_gameid.setdefault(gameid, profile)
+            
+            patterns = match_rules.get("url_pattern")
+            if isinstance(patterns, list):
+                self.url_patterns.extend((pattern, profile) for pattern in patterns)
+
+
+def _decode_profile(profile_dir: Path, config_file: Path, flows_file: Path) -> MachineProfile:
+    """以 msgspec 結構一次完成解析與型別驗證，建立 MachineProfile"""
+    data = msgspec.json.decode(config_file.read_bytes(), type=schemas.MachineProfileSchema)
+    
+    # 解析測試流程（有 test_flows.json 時優先使用）
+    flow_items = data.test_flows
+    if flows_file.exists():
+        flows_data = msgspec.json.decode(flows_file.read_bytes(), type=schemas.TestFlowsFileSchema)
+        flow_items = flows_data.test_flows if flows_data.test_flows is not None else flows_data.flows
+    
+    test_flows = []
+    for item in flow_items:
+        flow_config = item.config
+        # 如果 image_comparison 在頂層（不在 config 內），合併進 config
+        if item.image_comparison is not None and "image_comparison" not in flow_config:
+            flow_config["image_comparison"] = item.image_comparison
+        test_flows.append(MachineTestFlow(
+            name=item.name,
+            description=item.description,
+            enabled=item.enabled,
+            timeout=item.timeout,
+            retry_count=item.retry_count,
+            config=flow_config,
+            mutates=item.mutates
+        ))
+    
+    return MachineProfile(
+        name=data.name if data.name is not None else profile_dir.name,
+        description=data.description,
+        enabled=data.enabled,
+        match_rules=data.match_rules,
+        test_flows=test_flows,
+        button_selectors=data.button_selectors,
+        button_test_config=data.button_test_config,
+        video_detection=data.video_detection,
+        special_config=data.special_config,
+        folder_path=profile_dir
+    )
+
+
+def _parse_profile(profile_dir: Path, config_file: Path, flows_file: Path) -> MachineProfile:
+    """未安裝 msgspec 時：讀取 JSON 後逐欄位取值建立 MachineProfile"""
+    profile_data = read_json(config_file)
+    
+    # 解析測試流程
+    test_flows = []
+    if flows_file.exists():
+        flows_data = read_json(flows_file)
+        for flow_data in flows_data.get("test_flows", flows_data.get("flows", [])):
+            # 取得 config，若不存在則建立空 dict
+            flow_config = flow_data.get("config", {})
+            
+            # 如果 image_comparison 在頂層（不在 config 內），合併進 config
+            if "image_comparison" in flow_data and "image_comparison" not in flow_config:
+                flow_config["image_comparison"] = flow_data["image_comparison"]
+            
+            flow = MachineTestFlow(
+                name=flow_data.get("name", ""),
+                description=flow_data.get("description", ""),
+                enabled=flow_data.get("enabled", True),
+                timeout=flow_data.get("timeout", 10.0),
+                retry_count=flow_data.get("retry_count", 3),
+                config=flow_config,
+                mutates=flow_data.get("mutates", True)
+            )
+            test_flows.append(flow)
+    else:
+        # 如果沒有 test_flows.json，從 config.json 讀取
+        for flow_data in profile_data.get("test_flows", []):
+            flow_config = flow_data.get("config", {})
+            if "image_comparison" in flow_data and "image_comparison" not in flow_config:
+                flow_config["image_comparison"] = flow_data["image_comparison"]
+            
+            flow = MachineTestFlow(
+                name=flow_data.get("name", ""),
+                description=flow_data.get("description", ""),
+                enabled=flow_data.get("enabled", True),
+                timeout=flow_data.get("timeout", 10.0),
+                retry_count=flow_data.get("retry_count", 3),
+                config=flow_config,
+                mutates=flow_data.get("mutates", True)
+            )
+            test_flows.append(flow)
+    
+    return MachineProfile(
+        name=profile_data.get("name", profile_dir.name),
+        description=profile_data.get("description", ""),
+        enabled=profile_data.get("enabled", True),
+        match_rules=profile_data.get("match_rules", {}),
+        test_flows=test_flows,
+        button_selectors=profile_data.get("button_selectors", {}),
+        button_test_config=profile_data.get("button_test_config", {}),
+        video_detection=profile_data.get("video_detection", {}),
+        special_config=profile_data.get("special_config", {}),
+        folder_path=profile_dir
+    )
 
 
 def load_machine_profile_from_folder(profile_dir: Path) -> Optional[MachineProfile]:
@@ -74,61 +233,11 @@ def load_machine_profile_from_folder(profile_dir: Path) -> Optional[MachineProfi
         return None
     
     try:
-        with config_file.open("r", encoding="utf-8") as f:
-            profile_data = json.load(f)
-        
-        # 解析測試流程
-        test_flows = []
         flows_file = profile_dir / "test_flows.json"
-        if flows_file.exists():
-            with flows_file.open("r", encoding="utf-8") as f:
-                flows_data = json.load(f)
-                for flow_data in flows_data.get("test_flows", flows_data.get("flows", [])):
-                    # 取得 config，若不存在則建立空 dict
-                    flow_config = flow_data.get("config", {})
-                    
-                    # 如果 image_comparison 在頂層（不在 config 內），合併進 config
-                    if "image_comparison" in flow_data and "image_comparison" not in flow_config:
-                        flow_config["image_comparison"] = flow_data["image_comparison"]
-                    
-                    flow = MachineTestFlow(
-                        name=flow_data.get("name", ""),
-                        description=flow_data.get("description", ""),
-                        enabled=flow_data.get("enabled", True),
-                        timeout=flow_data.get("timeout", 10.0),
-                        retry_count=flow_data.get("retry_count", 3),
-                        config=flow_config
-                    )
-                    test_flows.append(flow)
+        if schemas is not None:
+            profile = _decode_profile(profile_dir, config_file, flows_file)
         else:
-            # 如果沒有 test_flows.json，從 config.json 讀取
-            for flow_data in profile_data.get("test_flows", []):
-                flow_config = flow_data.get("config", {})
-                if "image_comparison" in flow_data and "image_comparison" not in flow_config:
-                    flow_config["image_comparison"] = flow_data["image_comparison"]
-                
-                flow = MachineTestFlow(
-                    name=flow_data.get("name", ""),
-                    description=flow_data.get("description", ""),
-                    enabled=flow_data.get("enabled", True),
-                    timeout=flow_data.get("timeout", 10.0),
-                    retry_count=flow_data.get("retry_count", 3),
-                    config=flow_config
-                )
-                test_flows.append(flow)
-        
-        profile = MachineProfile(
-            name=profile_data.get("name", profile_dir.name),
-            description=profile_data.get("description", ""),
-            enabled=profile_data.get("enabled", True),
-            match_rules=profile_data.get("match_rules", {}),
-            test_flows=test_flows,
-            button_selectors=profile_data.get("button_selectors", {}),
-            button_test_config=profile_data.get("button_test_config", {}),
-            video_detection=profile_data.get("video_detection", {}),
-            special_config=profile_data.get("special_config", {}),
-            folder_path=profile_dir
-        )
+            profile = _parse_profile(profile_dir, config_file, flows_file)
         
         logging.info(f"[MachineProfiles] 載入機器類型配置: {profile.name} (來自 {profile_dir.name})")
         return profile
@@ -166,16 +275,19 @@ def load_machine_profiles(base_dir: Path) -> MachineProfiles:
     profiles = {}
     default_profile = None
     
-    # 遍歷所有子文件夾
-    for profile_dir in profiles_dir.iterdir():
-        if not profile_dir.is_dir():
-            continue
-        
-        # 跳過隱藏文件夾
-        if profile_dir.name.startswith("."):
-            continue
-        
-        profile = load_machine_profile_from_folder(profile_dir)
+    # 收集所有子文件夾（跳過隱藏文件夾）
+    profile_dirs = [
+        p for p in profiles_dir.iterdir()
+        if p.is_dir() and not p.name.startswith(".")
+    ]
+    
+    # 各配置的讀取互不相依（純 I/O），以執行緒池並行載入；map 保持原順序
+    loaded: List[Optional[MachineProfile]] = []
+    if profile_dirs:
+        with ThreadPoolExecutor(max_workers=min(8, len(profile_dirs))) as executor:
+            loaded = list(executor.map(load_machine_profile_from_folder, profile_dirs))
+    
+    for profile_dir, profile in zip(profile_dirs, loaded):
         if profile:
             profiles[profile_dir.name.upper()] = profile
             
@@ -198,6 +310,7 @@ def load_machine_profiles(base_dir: Path) -> MachineProfiles:
     return result
 
 
+@lru_cache(maxsize=4096)
 def extract_keyword_from_game_title_code(game_title_code: str) -> Optional[str]:
     """
     從 game_title_code 中提取關鍵字
@@ -223,10 +336,9 @@ def extract_keyword_from_game_title_code(game_title_code: str) -> Optional[str]:
             return keyword
     
     # 如果分割失敗，嘗試直接使用整個字符串（去除數字）
-    import re
     # 移除開頭和結尾的數字
-    keyword = re.sub(r'^\d+-?', '', game_title_code)
-    keyword = re.sub(r'-?\d+$', '', keyword)
+    keyword = _LEAD_DIGITS.sub('', game_title_code)
+    keyword = _TRAIL_DIGITS.sub('', keyword)
     keyword = keyword.strip('-').strip().upper()
     
     if keyword:
@@ -242,6 +354,32 @@ def match_machine_profile(
     gameid: Optional[str] = None,
     machine_type: Optional[str] = None,
     require_game_title_code: bool = True
+) -> Optional[MachineProfile]:
+    """
+    根據 URL、game_title_code、gameid 或 machine_type 匹配機器類型配置（結果快取於 profiles）
+    
+    匹配規則見 _match_machine_profile；相同參數重複呼叫時直接回傳上次的結果。
+    """
+    cache_key = (url, game_title_code, gameid, machine_type, require_game_title_code)
+    try:
+        return profiles.match_cache[cache_key]
+    except KeyError:
+        pass
+    
+    profile = _match_machine_profile(
+        profiles, url, game_title_code, gameid, machine_type, require_game_title_code
+    )
+    profiles.match_cache[cache_key] = profile
+    return profile
+
+
+def _match_machine_profile(
+    profiles: MachineProfiles,
+    url: str,
+    game_title_code: Optional[str] = None,
+    gameid: Optional[str] = None,
+    machine_type: Optional[str] = None,
+    require_game_title_code: bool = True
 ) -> Optional[MachineProfile]:
     """
     根據 URL、game_title_code、gameid 或 machine_type 匹配機器類型配置
@@ -282,25 +420,17 @@ def match_machine_profile(
     if game_title_code:
         keyword = extract_keyword_from_game_title_code(game_title_code)
         if keyword:
-            # 直接匹配文件夾名稱（不區分大小寫）
-            for key, profile in profiles.profiles.items():
-                if key.upper() == keyword.upper() and profile.enabled:
-                    logging.info(f"[MachineProfiles] 從 game_title_code 匹配到機器類型: {key} (關鍵字: {keyword})")
-                    return profile
+            # 直接匹配文件夾名稱（索引鍵已轉為大寫）
+            profile = profiles.by_keyword.get(keyword)
+            if profile:
+                logging.info(f"[MachineProfiles] 從 game_title_code 匹配到機器類型: {keyword} (關鍵字: {keyword})")
+                return profile
         
         # 優先級 3: 檢查 game_title_code 模式匹配
-        for key, profile in profiles.profiles.items():
-            if not profile.enabled:
-                continue
-            
-            match_rules = profile.match_rules
-            if "game_title_code_pattern" in match_rules:
-                patterns = match_rules["game_title_code_pattern"]
-                if isinstance(patterns, list):
-                    for pattern in patterns:
-                        if pattern in game_title_code:
-                            logging.info(f"[MachineProfiles] 匹配到機器類型: {key} (pattern: {pattern})")
-                            return profile
+        for pattern, profile in profiles.title_code_patterns:
+            if pattern in game_title_code:
+                logging.info(f"[MachineProfiles] 匹配到機器類型: {profile.name} (pattern: {pattern})")
+                return profile
     
     # 如果要求必須有 game_title_code，則不進行後續匹配
     if require_game_title_code:
@@ -318,30 +448,16 @@ def match_machine_profile(
     
     # 優先級 4: 檢查 gameid 匹配（僅當不要求 game_title_code 時）
     if gameid:
-        for key, profile in profiles.profiles.items():
-            if not profile.enabled:
-                continue
-            
-            match_rules = profile.match_rules
-            if "gameid" in match_rules:
-                gameid_list = match_rules["gameid"]
-                if isinstance(gameid_list, list) and gameid in gameid_list:
-                    logging.info(f"[MachineProfiles] 匹配到機器類型: {key} (gameid: {gameid})")
-                    return profile
+        profile = profiles.by_gameid.get(gameid)
+        if profile:
+            logging.info(f"[MachineProfiles] 匹配到機器類型: {profile.name} (gameid: {gameid})")
+            return profile
     
     # 優先級 5: 檢查 URL 模式匹配（僅當不要求 game_title_code 時）
-    for key, profile in profiles.profiles.items():
-        if not profile.enabled:
-            continue
-        
-        match_rules = profile.match_rules
-        if "url_pattern" in match_rules:
-            patterns = match_rules["url_pattern"]
-            if isinstance(patterns, list):
-                for pattern in patterns:
-                    if pattern in url:
-                        logging.info(f"[MachineProfiles] 匹配到機器類型: {key} (url_pattern: {pattern})")
-                        return profile
+    for pattern, profile in profiles.url_patterns:
+        if pattern in url:
+            logging.info(f"[MachineProfiles] 匹配到機器類型: {profile.name} (url_pattern: {pattern})")
+            return profile
     
     # 如果沒有匹配，返回 None
     logging.warning(f"[MachineProfiles] 未找到匹配的機器類型配置")
@@ -1,6 +1,6 @@
 """配置數據模型"""
 from dataclasses import dataclass
-from typing import Optional
+from typing import NamedTuple, Optional, Tuple
 
 
 @dataclass
@@ -15,3 +15,9 @@ class GameConfig:
     # 一般開關
     enabled: bool = True
 
+
+class MachineAction(NamedTuple):
+    """連續無變化時觸發的特殊點擊流程（來自 actions.json 的 machine_actions 一筆）"""
+
+    positions: Tuple[str, ...]  # 依序點擊的座標文字，例如 ("X1", "X2")
+    click_take: bool = False    # 點擊完後是否補點 Take 按鈕
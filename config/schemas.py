@@ -0,0 +1,65 @@
+"""配置檔 JSON 結構定義（msgspec）- 在 C 層一次完成解析與型別驗證
+
+需要安裝 msgspec；未安裝時匯入本模組會拋出 ImportError，呼叫端應退回 read_json + dict 解析。
+"""
+from typing import Any, Dict, List, Optional
+
+import msgspec
+
+
+class TestFlowSchema(msgspec.Struct):
+    """test_flows.json / config.json 中的單一測試流程"""
+    name: str = ""
+    description: str = ""
+    enabled: bool = True
+    timeout: float = 10.0
+    retry_count: int = 3
+    config: Dict[str, Any] = {}
+    mutates: bool = True
+    # 允許寫在頂層，載入時合併進 config
+    image_comparison: Optional[Dict[str, Any]] = None
+
+
+class TestFlowsFileSchema(msgspec.Struct):
+    """test_flows.json（相容舊欄位名稱 flows）"""
+    test_flows: Optional[List[TestFlowSchema]] = None
+    flows: List[TestFlowSchema] = []
+
+
+class MachineProfileSchema(msgspec.Struct):
+    """machine_profiles/<類型>/config.json"""
+    name: Optional[str] = None  # 未設定時使用文件夾名稱
+    description: str = ""
+    enabled: bool = True
+    match_rules: Dict[str, Any] = {}
+    test_flows: List[TestFlowSchema] = []
+    button_selectors: Dict[str, str] = {}
+    button_test_config: Dict[str, Any] = {}
+    video_detection: Dict[str, Any] = {}
+    special_config: Dict[str, Any] = {}
+
+
+class TestFeaturesSchema(msgspec.Struct):
+    """test_config.json 的 features 區塊"""
+    enable_exit_flow: bool = True
+    enable_special_actions: bool = True
+
+
+class TestScenarioSchema(msgspec.Struct):
+    """test_config.json 的單一測試場景"""
+    name: Optional[str] = None  # 未設定時使用場景鍵名
+    description: str = ""
+    enabled: bool = True
+    features: TestFeaturesSchema = msgspec.field(default_factory=TestFeaturesSchema)
+    spin_count: Optional[int] = None
+    spin_interval: float = 1.0
+    balance_threshold: int = 20000
+    test_exit_after_spins: Optional[int] = None
+    test_flows: Optional[List[str]] = None
+
+
+class TestConfigSchema(msgspec.Struct):
+    """test_config.json（只解析測試模式相關欄位，其餘欄位忽略）"""
+    test_mode: bool = False
+    active_scenario: Optional[str] = None
+    test_scenarios: Dict[str, TestScenarioSchema] = {}
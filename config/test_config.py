@@ -1,10 +1,19 @@
 """測試配置模型和加載器"""
-import json
 import logging
 from pathlib import Path
 from typing import Dict, Optional
 from dataclasses import dataclass, field
 
+from .loader import read_json
+
+# msgspec 可在 C 層直接解析成有型別的結構；未安裝時退回 read_json + dict 取值
+try:
+    import msgspec
+    from . import schemas
+except ImportError:
+    msgspec = None
+    schemas = None
+
 
 @dataclass
 class TestFeatures:
@@ -35,6 +44,69 @@ class TestConfig:
     scenarios: Dict[str, TestScenario] = field(default_factory=dict)
 
 
+def _decode_test_config(test_config_path: Path) -> TestConfig:
+    """以 msgspec 結構一次完成解析與型別驗證，建立 TestConfig"""
+    raw = msgspec.json.decode(test_config_path.read_bytes(), type=schemas.TestConfigSchema)
+    
+    scenarios = {}
+    for key, data in raw.test_scenarios.items():
+        scenarios[key] = TestScenario(
+            name=data.name if data.name is not None else key,
+            description=data.description,
+            enabled=data.enabled,
+            features=TestFeatures(
+                enable_exit_flow=data.features.enable_exit_flow,
+                enable_special_actions=data.features.enable_special_actions,
+            ),
+            spin_count=data.spin_count,
+            spin_interval=data.spin_interval,
+            balance_threshold=data.balance_threshold,
+            test_exit_after_spins=data.test_exit_after_spins,
+            test_flows=data.test_flows,
+        )
+    
+    return TestConfig(
+        test_mode=raw.test_mode,
+        active_scenario=raw.active_scenario,
+        scenarios=scenarios,
+    )
+
+
+def _parse_test_config(test_config_path: Path) -> TestConfig:
+    """未安裝 msgspec 時：讀取 JSON 後逐欄位取值建立 TestConfig"""
+    raw = read_json(test_config_path)
+    
+    test_mode = raw.get("test_mode", False)
+    active_scenario = raw.get("active_scenario")
+    
+    scenarios = {}
+    for key, scenario_data in raw.get("test_scenarios", {}).items():
+        features_data = scenario_data.get("features", {})
+        features = TestFeatures(
+            enable_exit_flow=features_data.get("enable_exit_flow", True),
+            enable_special_actions=features_data.get("enable_special_actions", True),
+        )
+        
+        scenario = TestScenario(
+            name=scenario_data.get("name", key),
+            description=scenario_data.get("description", ""),
+            enabled=scenario_data.get("enabled", True),
+            features=features,
+            spin_count=scenario_data.get("spin_count"),
+            spin_interval=scenario_data.get("spin_interval", 1.0),
+            balance_threshold=scenario_data.get("balance_threshold", 20000),
+            test_exit_after_spins=scenario_data.get("test_exit_after_spins"),
+            test_flows=scenario_data.get("test_flows"),
+        )
+        scenarios[key] = scenario
+    
+    return TestConfig(
+        test_mode=test_mode,
+        active_scenario=active_scenario,
+        scenarios=scenarios,
+    )
+
+
 def load_test_config(base_dir: Path) -> TestConfig:
     """讀取測試配置文件"""
     test_config_path = base_dir / "test_config.json"
@@ -44,38 +116,14 @@ def load_test_config(base_dir: Path) -> TestConfig:
         return TestConfig()
     
     try:
-        with test_config_path.open("r", encoding="utf-8") as f:
-            raw = json.load(f)
+        if schemas is not None:
+            config = _decode_test_config(test_config_path)
+        else:
+            config = _parse_test_config(test_config_path)
         
-        test_mode = raw.get("test_mode", False)
-        active_scenario = raw.get("active_scenario")
-        
-        scenarios = {}
-        for key, scenario_data in raw.get("test_scenarios", {}).items():
-            features_data = scenario_data.get("features", {})
-            features = TestFeatures(
-                enable_exit_flow=features_data.get("enable_exit_flow", True),
-                enable_special_actions=features_data.get("enable_special_actions", True),
-            )
-            
-            scenario = TestScenario(
-                name=scenario_data.get("name", key),
-                description=scenario_data.get("description", ""),
-                enabled=scenario_data.get("enabled", True),
-                features=features,
-                spin_count=scenario_data.get("spin_count"),
-                spin_interval=scenario_data.get("spin_interval", 1.0),
-                balance_threshold=scenario_data.get("balance_threshold", 20000),
-                test_exit_after_spins=scenario_data.get("test_exit_after_spins"),
-                test_flows=scenario_data.get("test_flows"),
-            )
-            scenarios[key] = scenario
-        
-        config = TestConfig(
-            test_mode=test_mode,
-            active_scenario=active_scenario,
-            scenarios=scenarios,
-        )
+        test_mode = config.test_mode
+        active_scenario = config.active_scenario
+        scenarios = config.scenarios
         
         if test_mode and active_scenario:
             logging.info(f"[TestConfig] 測試模式已啟用，使用場景: {active_scenario}")
@@ -92,4 +140,3 @@ def load_test_config(base_dir: Path) -> TestConfig:
     except Exception as e:
         logging.error(f"[TestConfig] 讀取測試配置失敗: {e}")
         return TestConfig()
-
@@ -1,5 +1,5 @@
 """瀏覽器工具函數"""
-import asyncio
+import re
 import logging
 from playwright.async_api import Page, TimeoutError as PWTimeoutError
 
@@ -28,7 +28,6 @@ async def safe_click(page: Page, selector: str, timeout: float = 5.0) -> bool:
                 await element.scroll_into_view_if_needed()
             except Exception:
                 pass
-            await asyncio.sleep(0.15)  # 很短暫的穩定延遲
             # 使用 JavaScript 強制點擊（可點擊 hidden 元素）
             await page.evaluate("(el) => el.click()", element)
             return True
@@ -38,27 +37,42 @@ async def safe_click(page: Page, selector: str, timeout: float = 5.0) -> bool:
         return False
 
 
+# 404 檢測只需要標題、URL 與 body 開頭文字
+_404_PROBE_JS = """
+() => ({
+    title: document.title,
+    url: location.href,
+    bodyHead: ((document.body && document.body.innerText) || '').slice(0, 512)
+})
+"""
+
+# 各來源的 404 關鍵字預先編譯成單一正則（IGNORECASE 免去 lower() 複製）
+_404_TITLE_RE = re.compile(r"404|not found", re.IGNORECASE)
+_404_BODY_RE = re.compile(r"404 not found|nginx/1\.20\.1", re.IGNORECASE)
+_404_URL_RE = re.compile(r"404")
+
+
 async def is_404_page(page: Page) -> bool:
     """
     檢測當前頁面是否為 404 錯誤頁面
     回傳 True 如果是 404 頁面，False 如果不是
     """
     try:
+        # 一次 evaluate 取回標題、URL 與頁面開頭文字，避免 page.content() 序列化整個 DOM
+        probe = await page.evaluate(_404_PROBE_JS)
+        
         # 檢查頁面標題
-        page_title = (await page.title()).lower()
-        if "404" in page_title or "not found" in page_title:
+        if _404_TITLE_RE.search(probe.get("title") or ""):
             logging.warning("🚨 檢測到 404 頁面（通過標題）")
             return True
         
-        # 檢查頁面內容
-        page_content = (await page.content()).lower()
-        if "404 not found" in page_content or "nginx/1.20.1" in page_content:
+        # 檢查頁面內容（404 頁面的提示文字都在 body 開頭）
+        if _404_BODY_RE.search(probe.get("bodyHead") or ""):
             logging.warning("🚨 檢測到 404 頁面（通過內容）")
             return True
         
         # 檢查 URL
-        current_url = page.url.lower()
-        if "404" in current_url:
+        if _404_URL_RE.search(probe.get("url") or page.url):
             logging.warning("🚨 檢測到 404 頁面（通過 URL）")
             return True
         
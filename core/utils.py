@@ -1,13 +1,38 @@
 """通用工具函數"""
+import os
+import mmap
 import hashlib
 from pathlib import Path
 
+# 逐塊讀取時每次讀取的大小（1 MB，減少系統呼叫與 Python 迴圈次數）
+_CHUNK_SIZE = 1024 * 1024
+# 小於此大小的檔案直接整檔讀取，省去 mmap 建立成本
+_MMAP_THRESHOLD = 64 * 1024
+
 
 def file_md5(path: Path) -> str:
-    """計算檔案 MD5（逐塊讀取，避免占用過多記憶體）"""
+    """計算檔案 MD5（大檔使用 mmap，避免複製到 Python bytes 及占用過多記憶體）"""
     h = hashlib.md5()
     with path.open("rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
+        size = os.fstat(f.fileno()).st_size
+        if size < _MMAP_THRESHOLD:
+            h.update(f.read())
+            return h.hexdigest()
+
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # Windows 等平台可能不支援 madvise
+                if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                h.update(mm)
+            return h.hexdigest()
+        except (OSError, ValueError):
+            # 無法映射（例如特殊檔案系統）時退回逐塊讀取
+            f.seek(0)
+
+        # Python 3.11+：由 C 層逐塊讀取並計算
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "md5").hexdigest()
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
             h.update(chunk)
     return h.hexdigest()
-
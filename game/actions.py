@@ -1,10 +1,26 @@
 """遊戲動作相關功能"""
 import asyncio
 import logging
-from typing import List, Optional
-from playwright.async_api import Page, TimeoutError as PWTimeoutError
+from functools import lru_cache
+from typing import Dict, Optional, Sequence
+from weakref import WeakKeyDictionary
+from playwright.async_api import Page, Locator, TimeoutError as PWTimeoutError
 
-from core.browser import wait_for_selector
+
+# Spin 按鈕 selector，依 is_special 取用：(一般機台, 特殊機台)
+_SPIN_SEL = (".my-button.btn_spin", ".btn_spin .my-button")
+
+# 每個頁面快取的 Spin 按鈕 Locator（依是否為特殊機台區分），頁面關閉後自動釋放
+_SPIN_CACHE: "WeakKeyDictionary[Page, Dict[bool, Locator]]" = WeakKeyDictionary()
+
+
+def _spin_locator(page: Page, spin_selector: str, is_special: bool) -> Locator:
+    """取得（或建立並快取）此頁面的 Spin 按鈕 Locator"""
+    per_page = _SPIN_CACHE.setdefault(page, {})
+    loc = per_page.get(is_special)
+    if loc is None:
+        loc = per_page[is_special] = page.locator(spin_selector).first
+    return loc
 
 
 async def click_spin(page: Page, is_special: bool) -> bool:
@@ -14,76 +30,203 @@ async def click_spin(page: Page, is_special: bool) -> bool:
     if not page:
         return False
         
-    spin_selector = ".btn_spin .my-button" if is_special else ".my-button.btn_spin"
+    spin_selector = _SPIN_SEL[is_special]
     try:
-        btn = await wait_for_selector(page, spin_selector, timeout=8)
-        if btn:
-            # 使用 JavaScript 強制點擊
-            await page.evaluate("(el) => el.click()", btn)
-            return True
-        return False
+        # Locator 會自動等待元素出現（最多 8 秒），直接派發 click 事件（可點擊 hidden 元素，不等待導航）
+        await _spin_locator(page, spin_selector, is_special).dispatch_event("click", timeout=8000)
+        return True
     except PWTimeoutError:
         # 元素不存在或超時
-        current_url = page.url if page else "未知"
-        current_title = await page.title() if page else "未知"
-        logging.warning(
-            f"[Spin] 找不到 Spin 按鈕（選擇器: {spin_selector}, 特殊機台: {is_special}）\n"
-            f"  當前 URL: {current_url}\n"
-            f"  頁面標題: {current_title}"
-        )
+        if logging.getLogger().isEnabledFor(logging.WARNING):
+            logging.warning(
+                "[Spin] 找不到 Spin 按鈕（選擇器: %s, 特殊機台: %s）\n"
+                "  當前 URL: %s\n"
+                "  頁面標題: %s",
+                spin_selector, is_special, page.url, await _safe_title(page),
+            )
         return False
     except Exception as e:
         # 其他異常
-        current_url = page.url if page else "未知"
-        current_title = await page.title() if page else "未知"
-        logging.warning(
-            f"[Spin] 點擊 Spin 按鈕時發生錯誤（選擇器: {spin_selector}, 特殊機台: {is_special}）\n"
-            f"  錯誤: {e}\n"
-            f"  當前 URL: {current_url}\n"
-            f"  頁面標題: {current_title}"
-        )
+        if logging.getLogger().isEnabledFor(logging.WARNING):
+            logging.warning(
+                "[Spin] 點擊 Spin 按鈕時發生錯誤（選擇器: %s, 特殊機台: %s）\n"
+                "  錯誤: %s\n"
+                "  當前 URL: %s\n"
+                "  頁面標題: %s",
+                spin_selector, is_special, e, page.url, await _safe_title(page),
+            )
         return False
 
 
-async def click_multiple_positions(page: Page, positions: List[str], click_take: bool = False):
+# 日誌用頁面標題的最長等待秒數（頁面卡住時不拖慢錯誤處理）
+_TITLE_TIMEOUT = 0.5
+
+
+async def _safe_title(page: Page) -> str:
+    """取得頁面標題（僅供日誌使用），逾時或失敗時回傳「未知」"""
+    try:
+        return await asyncio.wait_for(page.title(), _TITLE_TIMEOUT)
+    except Exception:
+        return "未知"
+
+
+# 在頁面內依序點擊所有座標，回傳已點擊的座標
+# - 先走訪一次所有 span，依文字（同 normalize-space(text())）建立座標 → 節點對照表
+# - 對照表中沒有、或點擊前一個座標後節點已被移除時，改以 XPath 短暫輪詢（最多 timeoutMs）
+_CLICK_POSITIONS_JS = """
+async ({positions, xpaths, timeoutMs}) => {
+    const find = (xpath) => document.evaluate(
+        xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+    ).singleNodeValue;
+    const firstText = (n) => {
+        for (const c of n.childNodes) if (c.nodeType === Node.TEXT_NODE) return c.data;
+        return '';
+    };
+    const want = new Set(positions);
+    const byText = new Map();
+    for (const n of document.getElementsByTagName('span')) {
+        const t = firstText(n).replace(/[ \\t\\n\\r]+/g, ' ').trim();
+        if (want.has(t) && !byText.has(t)) byText.set(t, n);
+    }
+    const clicked = [];
+    for (let i = 0; i < positions.length; i++) {
+        const pos = positions[i];
+        let node = byText.get(pos);
+        if (!node || !node.isConnected) {
+            node = find(xpaths[i]);
+            const deadline = Date.now() + timeoutMs;
+            while (!node && Date.now() < deadline) {
+                await new Promise((resolve) => setTimeout(resolve, 50));
+                node = find(xpaths[i]);
+            }
+        }
+        if (node) {
+            node.click();
+            clicked.push(pos);
+        }
+    }
+    return clicked;
+}
+"""
+
+
+def _xpath_lit(s: str) -> str:
+    """將字串轉為 XPath 字面值（同時含單、雙引號時使用 concat()）"""
+    if "'" not in s:
+        return f"'{s}'"
+    if '"' not in s:
+        return f'"{s}"'
+    parts = s.split("'")
+    return "concat(" + ", \"'\", ".join(f"'{p}'" for p in parts) + ")"
+
+
+@lru_cache(maxsize=256)
+def _position_xpath(pos: str) -> str:
+    """座標文字對應的 span XPath（結果快取，同一座標只組一次）"""
+    return f"//span[normalize-space(text())={_xpath_lit(pos)}]"
+
+
+async def _click_positions_with_settle(
+    page: Page,
+    positions: Sequence[str],
+    settle_predicate: str,
+    settle_timeout: float,
+) -> List[str]:
+    """逐一點擊座標，每次點擊後等待 settle_predicate 成立；回傳未點擊到的座標"""
+    missing: List[str] = []
+    for pos in positions:
+        try:
+            # 直接查詢元素（不等待，因為元素可能已經存在但 hidden）
+            elem = await page.query_selector(f"xpath={_position_xpath(pos)}")
+            if elem:
+                # 統一使用 JavaScript 強制點擊（不需要滾動，因為是 hidden 元素）
+                await page.evaluate("(el) => el.click()", elem)
+                logging.info("已點擊座標位: %s", pos)
+                try:
+                    await page.wait_for_function(settle_predicate, timeout=settle_timeout * 1000)
+                except PWTimeoutError:
+                    await asyncio.sleep(0.05)
+            else:
+                logging.warning("找不到座標位 %s 的元素", pos)
+                missing.append(pos)
+        except Exception as e:
+            logging.warning("點擊座標位 %s 時發生錯誤: %s", pos, e)
+            missing.append(pos)
+    return missing
+
+
+async def click_multiple_positions(
+    page: Page,
+    positions: Sequence[str],
+    click_take: bool = False,
+    settle_predicate: Optional[str] = None,
+    settle_timeout: float = 1.0,
+    take_timeout: float = 0.0,
+) -> Tuple[int, List[str]]:
     """
     依序點擊由文字（span 的可見文字）定位的節點；必要時補點 Take 按鈕
     - positions：["X1","X2",...]
     - click_take：True 時，額外點 .my-button.btn_take
+    - settle_predicate：每次點擊後等待此 JS 條件成立（傳給 page.wait_for_function）；
+      未提供時所有座標在頁面內以單一 evaluate 依序點擊，元素尚未出現時最多等待 settle_timeout
+    - settle_timeout：等待就緒的逾時秒數，逾時只短暫等待後繼續
+    - take_timeout：等待 Take 按鈕出現的秒數；0 表示只檢查當下是否存在，不等待
     - 統一使用 JavaScript 強制點擊（可點擊 hidden 元素）
     - 快速連續點擊所有座標，不等待元素可見
+    - 回傳 (已點擊的座標數, 未點擊到的座標)；有座標但一個都沒點到時不再處理 Take 按鈕
     """
     if not page:
-        return
+        return 0, list(positions)
     
-    logging.info(f"開始連續點擊 {len(positions)} 個座標點: {positions}")
-        
-    for pos in positions:
+    logging.info("開始連續點擊 %d 個座標點: %s", len(positions), positions)
+    
+    if settle_predicate:
+        missing = await _click_positions_with_settle(page, positions, settle_predicate, settle_timeout)
+    else:
+        # 沒有自訂就緒條件時，整串座標在頁面內一次點完（單一 CDP 往返）
         try:
-            # 直接查詢元素（不等待，因為元素可能已經存在但 hidden）
-            elems = await page.query_selector_all(f"//span[normalize-space(text())='{pos}']")
-            
-            if elems and len(elems) > 0:
-                elem = elems[0]
-                # 統一使用 JavaScript 強制點擊（不需要滾動，因為是 hidden 元素）
-                await page.evaluate("(el) => el.click()", elem)
-                logging.info(f"已點擊座標位: {pos}")
-                await asyncio.sleep(1.0)  # 減少延遲時間，加快點擊速度
-            else:
-                logging.warning(f"找不到座標位 {pos} 的元素")
+            clicked = await page.evaluate(
+                _CLICK_POSITIONS_JS,
+                {
+                    "positions": list(positions),
+                    "xpaths": [_position_xpath(pos) for pos in positions],
+                    "timeoutMs": int(settle_timeout * 1000),
+                },
+            )
+            missing = []
+            for pos in positions:
+                if pos in clicked:
+                    logging.info("已點擊座標位: %s", pos)
+                else:
+                    logging.warning("找不到座標位 %s 的元素", pos)
+                    missing.append(pos)
         except Exception as e:
-            logging.warning(f"點擊座標位 {pos} 時發生錯誤: {e}")
+            logging.warning("批次點擊座標位時發生錯誤: %s", e)
+            missing = list(positions)
 
-    if click_take:
+    clicked_count = len(positions) - len(missing)
+    if click_take and positions and not clicked_count:
+        logging.warning("沒有任何座標點擊成功，略過 Take 按鈕")
+    elif click_take:
         try:
-            take_btn = await wait_for_selector(page, ".my-button.btn_take", timeout=3, state="attached")
-            if take_btn:
-                # 統一使用 JavaScript 強制點擊
-                await page.evaluate("(el) => el.click()", take_btn)
+            if take_timeout > 0:
+                # 等待 Take 按鈕出現後直接派發 click 事件（單一 CDP 呼叫）
+                await page.locator(".my-button.btn_take").first.dispatch_event(
+                    "click", timeout=take_timeout * 1000
+                )
                 logging.info("已點擊 Take 按鈕")
+            else:
+                take_btn = await page.query_selector(".my-button.btn_take")
+                if take_btn:
+                    # 統一使用 JavaScript 強制點擊
+                    await page.evaluate("(el) => el.click()", take_btn)
+                    logging.info("已點擊 Take 按鈕")
+                else:
+                    logging.info("Take 按鈕不存在，略過")
         except Exception as e:
-            logging.warning(f"找不到 Take 按鈕: {e}")
+            logging.warning("找不到 Take 按鈕: %s", e)
     
-    logging.info(f"完成連續點擊 {len(positions)} 個座標點")
+    logging.info("完成連續點擊 %d/%d 個座標點", clicked_count, len(positions))
+    return clicked_count, missing
 
 
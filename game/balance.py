@@ -1,29 +1,68 @@
 """餘額相關功能"""
+import sys
+import time
 import logging
-from typing import Optional
+from typing import Dict, Optional, Tuple
+from weakref import WeakKeyDictionary
 from playwright.async_api import Page
 
-# 特殊機台集合：影響餘額 selector 與 spin 按鈕 selector 的選擇
-SPECIAL_GAMES = {"BULLBLITZ", "ALLABOARD"}
+# 特殊機台集合：影響餘額 selector 與 spin 按鈕 selector 的選擇（不可變，可安全跨執行緒共用）
+SPECIAL_GAMES = frozenset(map(sys.intern, ("BULLBLITZ", "ALLABOARD")))
 
+# 一般機台 / 特殊機台的餘額 selector
+BALANCE_SELECTOR = ".balance-bg.hand_balance .text2"
+SPECIAL_BALANCE_SELECTOR = ".h-balance.hand_balance .text2"
 
-async def parse_balance(page: Page, is_special: bool) -> Optional[int]:
+# 查詢元素、讀取文字並只保留數字，全部在頁面內一次完成；元素不存在回傳 null
+# 以字串回傳數字，避免超過 JS 安全整數範圍時失去精度
+# 第一次讀取時在元素上掛 MutationObserver；之後文字未變動則回傳 true，省去 innerText 的版面計算與資料傳輸
+_READ_BALANCE_JS = """
+({sel, force}) => {
+    const el = document.querySelector(sel);
+    if (!el) return null;
+    if (!el.__balObserver) {
+        el.__balObserver = new MutationObserver(() => { el.__balDirty = true; });
+        el.__balObserver.observe(el, {childList: true, subtree: true, characterData: true});
+    } else if (!force && !el.__balDirty) {
+        return true;
+    }
+    el.__balDirty = false;
+    return (el.innerText || '').replace(/[^0-9]/g, '');
+}
+"""
+
+# 同一頁面在此秒數內重複讀取時直接回傳上次結果，不再往返瀏覽器
+BALANCE_CACHE_TTL = 0.1
+
+# 每個頁面最後一次讀到的餘額：{selector: (讀取時間 monotonic, 餘額)}，頁面關閉後自動釋放
+_LAST_BALANCE: "WeakKeyDictionary[Page, Dict[str, Tuple[float, Optional[int]]]]" = WeakKeyDictionary()
+
+
+async def parse_balance(page: Page, is_special: bool, max_age: float = BALANCE_CACHE_TTL) -> Optional[int]:
     """
     擷取餘額文字並轉換為 int；若格式異常回傳 None
     - 特殊機台與一般機台使用不同的 selector
+    - max_age 秒內讀過則直接回傳上次的值（傳 0 強制重新讀取）
+    - 餘額元素內容未變動時直接回傳上次的值
     """
     if not page:
         return None
         
-    sel = ".h-balance.hand_balance .text2" if is_special else ".balance-bg.hand_balance .text2"
+    sel = SPECIAL_BALANCE_SELECTOR if is_special else BALANCE_SELECTOR
+    last = _LAST_BALANCE.setdefault(page, {})
+    hit = last.get(sel)
+    now = time.monotonic()
+    if hit and now - hit[0] < max_age:
+        return hit[1]
     try:
-        el = await page.query_selector(sel)
-        if el:
-            txt = (await el.inner_text() or "").replace(",", "").strip()
+        nums = await page.evaluate(_READ_BALANCE_JS, {"sel": sel, "force": hit is None})
+        if nums is True:
+            value = hit[1]
+        else:
             # 容錯：只保留數字
-            nums = "".join(ch for ch in txt if ch.isdigit())
-            return int(nums) if nums else None
+            value = int(nums) if nums else None
+        last[sel] = (now, value)
+        return value
     except Exception:
         pass
     return None
-
@@ -11,44 +11,82 @@
 注意：根目錄的 app.py 是主執行程序，會創建多個 GameRunner 實例
 """
 import asyncio
+import hashlib
+import re
 import time
 import logging
 import traceback
-from typing import Dict, List, Optional, Tuple, Any
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+from io import BytesIO
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Pattern, Tuple
 from pathlib import Path
+from urllib.parse import parse_qs, urlparse
 
-from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, TimeoutError as PWTimeoutError
 
-from config.models import GameConfig
+from config.models import GameConfig, MachineAction
 from config.test_config import TestScenario
 from notification.lark import LarkClient
 from core.browser import is_404_page
 from core.utils import file_md5
 from game.balance import parse_balance, SPECIAL_GAMES
+from game.report import ButtonResult, TestReport
 from game.actions import click_spin, click_multiple_positions
 from game.navigation import (
+    invalidate_page_state,
     is_in_game,
+    probe_balance_and_in_game,
     scroll_and_click_game,
     low_balance_exit_and_reenter,
     exit_game_to_lobby,
+    wait_until_in_game,
+    wait_until_in_lobby,
 )
-from hotkey import stop_event, pause_event
+from hotkey import stop_event, pause_event, wait_while
 
-# 測試相關導入
+# 測試相關導入（音頻監控只依賴標準庫，且每個頁面都要注入，直接導入）
 try:
-    from qa.test_manager import TestTaskManager
-    from qa.video_detector import VideoDetector
-    from qa.test_service import TestServiceClient
-    from qa.image_comparator import ImageComparator
     from qa.audio_detector import AudioDetector, load_audio_config
 except ImportError:
-    TestTaskManager = None
-    VideoDetector = None
-    TestServiceClient = None
-    ImageComparator = None
     AudioDetector = None
     load_audio_config = None
 
+
+# 影片檢測 / 圖片比對依賴 numpy、Pillow、OpenCV 等較重的套件，第一次用到時才導入
+@lru_cache(maxsize=None)
+def _load_video_detector():
+    try:
+        from qa.video_detector import VideoDetector
+    except ImportError:
+        return None
+    return VideoDetector
+
+
+@lru_cache(maxsize=None)
+def _load_image_comparator():
+    try:
+        from qa.image_comparator import ImageComparator
+    except ImportError:
+        return None
+    return ImageComparator
+
+# xxhash 的 xxh3 遠快於標準庫雜湊，未安裝時退回 blake2b
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+def _hash64(data: bytes) -> int:
+    """64 位元內容雜湊（優先使用 xxh3）"""
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(data)
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
 # 機器類型配置導入
 try:
     from config.machine_profiles import MachineProfile, match_machine_profile
@@ -57,6 +95,306 @@ except ImportError:
     match_machine_profile = None
 
 
+def _button_entry(btn_config: Dict[str, Any]) -> Tuple[str, str, Tuple[str, ...], bool]:
+    """將單一按鈕配置整理為 (名稱, selector, 候選 selector 清單, 是否檢測高亮)"""
+    btn_name = btn_config.get("name", "Unknown")
+    selector = btn_config.get("selector", f"button:has-text('{btn_name}')")
+    return btn_name, selector, _split_selectors(selector), btn_config.get("highlight_check", False)
+
+
+class HighlightSpec(NamedTuple):
+    """整理後的按鈕高亮檢測配置（每台機器只解析一次）"""
+    method: str
+    classes: Tuple[str, ...]           # 類名需包含的字串
+    class_substrings: Tuple[str, ...]  # 由 [class*='xxx'] 取出的部分匹配字串
+    colors: Tuple[str, ...]            # 小寫的高亮顏色
+    check_style: bool                  # 是否檢查背景 / 邊框顏色
+    config: Dict[str, Any]             # 原始配置（截圖比對參數等）
+    class_re: Optional[Pattern[str]]         # 元素類名的單一比對（classes + class_substrings）
+    parent_class_re: Optional[Pattern[str]]  # 父元素類名的單一比對（classes）
+    color_set: frozenset                     # 可解析為 (r, g, b) 的高亮顏色
+    color_re: Optional[Pattern[str]]         # 無法解析的顏色，以字串比對
+    probe_checks: Tuple[Callable[[Dict[str, str], "HighlightSpec"], bool], ...]  # 以 _HIGHLIGHT_PROBE_JS 結果判斷的檢測
+
+
+def _alternation(needles: Tuple[str, ...]) -> Optional[Pattern[str]]:
+    """將多個字串組成單一 regex alternation（一次掃描即可判斷是否包含任一字串）"""
+    needles = tuple(n for n in needles if n)
+    if not needles:
+        return None
+    return re.compile("|".join(map(re.escape, needles)))
+
+
+# 常用的 CSS 顏色名稱 → (r, g, b)（高亮顏色配置可直接寫名稱）
+_NAMED_COLORS = {
+    "black": (0, 0, 0),
+    "white": (255, 255, 255),
+    "red": (255, 0, 0),
+    "lime": (0, 255, 0),
+    "green": (0, 128, 0),
+    "blue": (0, 0, 255),
+    "yellow": (255, 255, 0),
+    "gold": (255, 215, 0),
+    "orange": (255, 165, 0),
+    "cyan": (0, 255, 255),
+    "aqua": (0, 255, 255),
+    "magenta": (255, 0, 255),
+    "fuchsia": (255, 0, 255),
+    "purple": (128, 0, 128),
+    "gray": (128, 128, 128),
+    "grey": (128, 128, 128),
+}
+
+
+def _parse_css_color(color: str) -> Optional[Tuple[int, int, int]]:
+    """將 #RGB / #RRGGBB / 顏色名稱轉為 (r, g, b)；無法解析時回傳 None"""
+    if color.startswith("#"):
+        hex_digits = color[1:]
+        if len(hex_digits) == 3:
+            hex_digits = "".join(c * 2 for c in hex_digits)
+        if len(hex_digits) == 6:
+            try:
+                value = int(hex_digits, 16)
+            except ValueError:
+                return None
+            return value >> 16, (value >> 8) & 0xFF, value & 0xFF
+        return None
+    return _NAMED_COLORS.get(color)
+
+
+# 高亮類名配置中 [class*='xxx'] 形式的部分匹配
+_CLASS_CONTAINS_RE = re.compile(r"\[class\*='([^']+)'\]")
+
+
+def _parse_highlight_cfg(cfg: Optional[Dict[str, Any]]) -> Optional[HighlightSpec]:
+    """將 highlight_detection 配置解析為 HighlightSpec；未配置時回傳 None"""
+    if not cfg:
+        return None
+    method = cfg.get("method", "css_class")
+    entries = [c.strip() for c in cfg.get("css_class", "active, selected, highlight").split(",")]
+    classes = tuple(c for c in entries if c and "class*" not in c)
+    class_substrings = tuple(m for c in entries for m in _CLASS_CONTAINS_RE.findall(c))
+    colors = tuple(c.strip().lower() for c in cfg.get("background_color", "#FFD700, yellow").split(","))
+    parsed_colors = {c: _parse_css_color(c) for c in colors}
+    check_style = method == "background_color" or bool(cfg.get("check_style", False))
+    # 只執行配置的檢測方式；check_style 時另外組合背景顏色檢測（去除重複）
+    probe_checks = tuple(dict.fromkeys(
+        check for check in (_PROBE_HIGHLIGHT_CHECKS.get(method), check_style and _highlight_by_style) if check
+    ))
+    return HighlightSpec(
+        method=method,
+        classes=classes,
+        class_substrings=class_substrings,
+        colors=colors,
+        check_style=check_style,
+        config=cfg,
+        class_re=_alternation(classes + class_substrings),
+        parent_class_re=_alternation(classes),
+        color_set=frozenset(rgb for rgb in parsed_colors.values() if rgb),
+        color_re=_alternation(tuple(c for c, rgb in parsed_colors.items() if rgb is None)),
+        probe_checks=probe_checks,
+    )
+
+
+def _highlight_by_class(probe: Dict[str, str], highlight: HighlightSpec) -> bool:
+    """檢查元素與父元素的 CSS 類名（支持完整匹配和 [class*='xxx'] 部分匹配）"""
+    match = highlight.class_re and highlight.class_re.search(probe.get("cls", ""))
+    if match:
+        logging.debug(f"[Test] 檢測到高亮類名: {match.group(0)}")
+        return True
+    
+    # 檢查父元素
+    match = highlight.parent_class_re and highlight.parent_class_re.search(probe.get("pcls", ""))
+    if match:
+        logging.debug(f"[Test] 在父元素檢測到高亮類名: {match.group(0)}")
+        return True
+    return False
+
+
+def _highlight_by_style(probe: Dict[str, Any], highlight: HighlightSpec) -> bool:
+    """檢查元素的背景 / 邊框顏色與父元素的背景顏色"""
+    # 可解析的顏色：以 (r, g, b) 在集合中查找
+    color_set = highlight.color_set
+    if color_set:
+        for key, where in (("bgRgb", "檢測到高亮顏色"), ("bcRgb", "檢測到高亮顏色"), ("pbgRgb", "在父元素檢測到高亮顏色")):
+            rgb = probe.get(key)
+            if rgb and tuple(rgb) in color_set:
+                logging.debug(f"[Test] {where}: rgb{tuple(rgb)}")
+                return True
+    
+    # 無法解析的顏色：以字串比對計算後的樣式
+    color_re = highlight.color_re
+    if color_re is None:
+        return False
+    match = color_re.search(probe.get("bg", "").lower()) or color_re.search(probe.get("bc", "").lower())
+    if match:
+        logging.debug(f"[Test] 檢測到高亮顏色: {match.group(0)}")
+        return True
+    
+    # 檢查父元素
+    match = color_re.search(probe.get("pbg", "").lower())
+    if match:
+        logging.debug(f"[Test] 在父元素檢測到高亮顏色: {match.group(0)}")
+        return True
+    return False
+
+
+# 高亮檢測方式 → 以 _HIGHLIGHT_PROBE_JS 結果判斷的函式（screenshot 另由截圖比對處理）
+_PROBE_HIGHLIGHT_CHECKS = {
+    "css_class": _highlight_by_class,
+    "background_color": _highlight_by_style,
+}
+
+
+def _prepare_button_configs(
+    profile: Optional[Any],
+) -> Tuple[List[Tuple[str, str, Tuple[str, ...], bool]], Optional[HighlightSpec]]:
+    """從機器類型配置取出按鈕測試清單與高亮檢測配置（每台機器只整理一次）"""
+    button_test_config = getattr(profile, "button_test_config", None) if profile else None
+    if button_test_config is None:
+        return [], None
+    buttons = [_button_entry(b) for b in button_test_config.get("buttons", [])]
+    return buttons, _parse_highlight_cfg(button_test_config.get("highlight_detection"))
+
+
+@lru_cache(maxsize=256)
+def _split_selectors(selector: str) -> Tuple[str, ...]:
+    """將逗號分隔的 selector 拆成候選清單（同一 selector 只拆一次）"""
+    return tuple(s.strip() for s in selector.split(",") if s.strip())
+
+
+@lru_cache(maxsize=None)
+def _load_pil_image():
+    """按鈕截圖比對用的 Pillow Image 模組（第一次用到時才導入）"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+# 按鈕截圖比對的截圖選項：凍結 CSS 動畫 / 轉場並隱藏游標，避免動畫造成的誤判
+_SCREENSHOT_OPTIONS = {"animations": "disabled", "caret": "hide"}
+
+
+def _crop_box(image: Any, box: Optional[Dict[str, float]]) -> Optional[Any]:
+    """從整頁截圖裁出元素所在區域（Pillow Image，用於點擊前後比對）"""
+    if image is None or not box:
+        return None
+    x, y = box["x"], box["y"]
+    return image.crop((int(x), int(y), int(x + box["width"]), int(y + box["height"])))
+
+
+def _image_fingerprint(image: Any) -> Tuple[Any, int]:
+    """截圖指紋（尺寸 + 內容雜湊）：點擊前後指紋相同代表畫面未變化，可略過像素比對"""
+    if isinstance(image, (bytes, bytearray)):
+        return len(image), _hash64(image)
+    return image.size, _hash64(image.tobytes())
+
+
+def _parse_gameid(url: str) -> Optional[str]:
+    """從 URL query string 取出 gameid，沒有時回傳 None"""
+    try:
+        return parse_qs(urlparse(url).query).get("gameid", [None])[0]
+    except ValueError:
+        return None
+
+
+# 每個 Worker 的 BrowserContext 使用的手機視窗大小與 User-Agent
+_MOBILE_VIEWPORT = {"width": 500, "height": 859}
+_MOBILE_UA = (
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/85.0.4183.127 Mobile Safari/537.36"
+)
+
+# 進入機器後檢查的錯誤提示窗
+ERROR_DIALOG_SELECTOR = "div[class*='error'], div[class*='Error'], .alert-error, .error-message, [class*='alert']"
+# 回傳所有符合元素的非空文字
+_ERROR_TEXTS_JS = "(els) => els.map((e) => (e.innerText || '').trim()).filter(Boolean)"
+
+# 按鈕高亮檢測：一次取回元素與父元素的類名、計算後的背景 / 邊框顏色
+# 顏色另外解析為 [r, g, b]（完全透明時為 null），供 Python 端以集合查找
+_HIGHLIGHT_PROBE_JS = """
+(el) => {
+    const rgb = (c) => {
+        const m = (c || '').match(/[\\d.]+/g);
+        if (!m || m.length < 3 || (m.length > 3 && Number(m[3]) === 0)) return null;
+        return m.slice(0, 3).map((v) => Math.round(Number(v)));
+    };
+    const p = el.parentElement;
+    const s = getComputedStyle(el);
+    const pbg = p ? getComputedStyle(p).backgroundColor : '';
+    return {
+        cls: el.getAttribute('class') || '',
+        pcls: p ? (p.getAttribute('class') || '') : '',
+        bg: s.backgroundColor,
+        bc: s.borderColor,
+        pbg,
+        bgRgb: rgb(s.backgroundColor),
+        bcRgb: rgb(s.borderColor),
+        pbgRgb: rgb(pbg)
+    };
+}
+"""
+
+# 預設按鈕測試：一次找出所有按鈕（依序嘗試文字、類名、通用類名），
+# 找到的元素在 data-mt-test-btn 加上按鈕索引（同一元素可對應多個按鈕，以空白分隔）供之後以 ~= 點擊，
+# 回傳每個按鈕命中的選擇器（找不到為 null）；先清除同頁面先前留下的標記
+_FIND_TEST_BUTTONS_JS = """
+(names) => {
+    for (const el of document.querySelectorAll('[data-mt-test-btn]')) el.removeAttribute('data-mt-test-btn');
+    const visible = (e) => {
+        const r = e.getBoundingClientRect();
+        return r.width > 0 && r.height > 0 && getComputedStyle(e).visibility !== 'hidden';
+    };
+    const first = (sel) => Array.from(document.querySelectorAll(sel)).find(visible);
+    const buttons = Array.from(document.querySelectorAll('button')).filter(visible);
+    const generic = "[class*='spin'], [class*='bet'], [class*='play']";
+    return names.map((name, i) => {
+        const lower = name.toLowerCase();
+        const candidates = [
+            [`button:has-text('${name}')`, () => buttons.find((b) => (b.textContent || '').toLowerCase().includes(lower))],
+            [`button[class*='${lower}']`, () => first(`button[class*='${CSS.escape(lower)}']`)],
+            [generic, () => first(generic)],
+        ];
+        for (const [selector, find] of candidates) {
+            const el = find();
+            if (el) {
+                const tags = el.getAttribute('data-mt-test-btn');
+                el.setAttribute('data-mt-test-btn', tags ? `${tags} ${i}` : `${i}`);
+                return selector;
+            }
+        }
+        return null;
+    });
+}
+"""
+_TEST_BUTTONS_READY_JS = f"(names) => ({_FIND_TEST_BUTTONS_JS})(names).every(Boolean)"
+
+
+# 「進入機器」流程的名稱（完成後不需流程間延遲）
+ENTRY_FLOW_NAMES = ("進入機器", "entry")
+
+# 每個 Worker 保留的 console 訊息 / 錯誤數量上限
+CONSOLE_LOG_LIMIT = 2000
+CONSOLE_ERROR_LIMIT = 500
+
+# 404 檢測間隔（秒）：頁面正常時從最短間隔逐步拉長到最長間隔
+MIN_404_CHECK_INTERVAL = 30.0
+MAX_404_CHECK_INTERVAL = 180.0
+# 自動暫停期間檢查是否恢復的間隔（秒）；全域暫停由事件喚醒
+PAUSE_POLL_INTERVAL = 1.0
+
+# 共享佇列模式下，每個 Worker 每測試幾台機器就換一個新頁面（0 表示不回收）
+PAGE_RECYCLE_EVERY = 20
+
+# 大廳元素出現後保留的渲染緩衝（秒）
+LOBBY_SETTLE_DELAY = 0.3
+
+# 階段圖片比對進程池的進程數
+IMAGE_COMPARE_WORKERS = 2
+
+
 class GameRunner:
     """
     掌管單一機台的整個流程：
@@ -65,17 +403,29 @@ class GameRunner:
     - 迴圈地：檢查餘額 -> 點擊 Spin -> 特殊流程
     """
 
+    # 所有 GameRunner 共用同一個 Playwright / Browser（見 _acquire_shared_browser）
+    _shared_playwright = None
+    _shared_browser: Optional[Browser] = None
+    _shared_lock = asyncio.Lock()
+    _shared_users = 0
+    # 階段圖片比對用的進程池（所有 Worker 共用，第一次比對時建立，最後一個 Worker 結束時關閉）
+    _img_pool: Optional[ProcessPoolExecutor] = None
+    # 進程池曾失效（例如打包環境無法啟動子進程）後，本次執行都改用執行緒比對
+    _img_pool_broken = False
+
     def __init__(
         self,
         config: GameConfig,
         lark: LarkClient,
         keyword_actions: Dict[str, List[str]],
-        machine_actions: Dict[str, Tuple[List[str], bool]],
+        machine_actions: Dict[str, MachineAction],
         test_scenario: Optional[TestScenario] = None,
         test_service: Optional[Any] = None,
         task_manager: Optional[Any] = None,
         machine_profile: Optional[Any] = None,
         machine_profiles: Optional[Any] = None,  # 所有機器類型配置（用於動態匹配）
+        start_barrier: Optional[asyncio.Barrier] = None,  # 所有 Worker 就緒後才開始測試
+        worker_id: Optional[str] = None,  # 對應 TaskManager 的本地佇列
     ):
         self.cfg = config
         self.lark = lark
@@ -90,8 +440,9 @@ class GameRunner:
         self._no_change_count = 0
         self._check_interval = 10
         self._spin_count = 0
-        self._last_404_check_time = 0.0
-        self._404_check_interval = 30.0
+        self._last_404_check_time = float("-inf")  # time.monotonic() 基準，確保第一次呼叫即檢查
+        self._404_check_interval = MIN_404_CHECK_INTERVAL  # 頁面持續正常時逐步拉長（見 _check_and_refresh_if_404）
+        self._main_status: Optional[int] = None  # 主框架最近一次導航回應的 HTTP 狀態（由 response 事件更新）
         
         # 測試模式相關
         self._test_spin_count = 0  # 測試模式下的 Spin 計數器
@@ -101,9 +452,28 @@ class GameRunner:
         self.task_manager = task_manager
         self.machine_profile = machine_profile  # 當前機器類型配置
         self.machine_profiles = machine_profiles  # 所有機器類型配置（用於動態匹配新機器號）
-        self.console_logs: List[Dict[str, Any]] = []
-        self._worker_id = f"URL-{config.url[-20:]}"  # 用於 TaskManager 日誌
+        self._button_cfgs, self._highlight_cfg = _prepare_button_configs(machine_profile)  # 按鈕測試清單與高亮配置
+        self.start_barrier = start_barrier
+        # console 訊息只保留最近的部分；錯誤另外累積，報告時不必重新掃描全部訊息
+        self.console_logs: Deque[Dict[str, Any]] = deque(maxlen=CONSOLE_LOG_LIMIT)
+        self._console_errors: Deque[Dict[str, Any]] = deque(maxlen=CONSOLE_ERROR_LIMIT)
+        self._worker_id = worker_id or f"URL-{config.url[-20:]}"  # TaskManager 佇列標識與日誌
+        self._gameid = _parse_gameid(config.url)  # URL 不變，只解析一次
         self.test_report = self._create_test_report(config.game_title_code, machine_profile)
+        self._pending_comparisons: List[asyncio.Task] = []  # 背景進行中的階段圖片比對（發送報告前等待）
+        
+        # 測試流程名稱 → (執行函式, 之後圖片比對的階段名稱)
+        self._flow_dispatch = {
+            "進入機器": (self._run_entry_flow, None),
+            "entry": (self._run_entry_flow, None),
+            "視頻檢測": (self._test_video_display, "video"),
+            "按鈕測試": (self._test_buttons_with_config, "buttons"),
+            "下注測試": (self._test_betting, "betting"),
+            "特殊功能測試": (self._test_special_features, "special"),
+            "Grand功能測試": (self._test_grand_features, "grand"),
+            "音頻檢測": (self._test_audio, None),
+            "audio": (self._test_audio, None),
+        }
         
         # 如果沒有明確指定機器類型配置，且非共享佇列模式，記錄警告
         if not machine_profile and not task_manager:
@@ -115,20 +485,14 @@ class GameRunner:
             logging.info(f"[TestMode] 描述: {test_scenario.description}")
             logging.info(f"[TestMode] Spin 次數限制: {test_scenario.spin_count or '無限制'}")
 
-    def _create_test_report(self, game_title_code: Optional[str], machine_profile: Optional[Any]) -> Dict[str, Any]:
-        """建立測試報告結構"""
-        return {
-            "url": self.cfg.url,
-            "csv_data": game_title_code or "N/A",
-            "machine_type": self.cfg.machine_type or (machine_profile.name if machine_profile else "unknown"),
-            "entry_status": "pending",
-            "console_errors": [],
-            "video_status": "unknown",
-            "video_message": "",
-            "button_tests": [],
-            "bet_results": [],
-            "image_comparisons": []
-        }
+    def _create_test_report(self, game_title_code: Optional[str], machine_profile: Optional[Any]) -> TestReport:
+        """建立測試報告"""
+        return TestReport(
+            url=self.cfg.url,
+            csv_data=game_title_code or "N/A",
+            machine_type=self.cfg.machine_type or (machine_profile.name if machine_profile else "unknown"),
+            console_errors=self._console_errors,  # 與 console 監聽器共用同一個 deque
+        )
 
     def _reset_for_new_machine(self, new_code: str, new_profile: Optional[Any]):
         """
@@ -141,13 +505,15 @@ class GameRunner:
         self.cfg.game_title_code = new_code
         self.machine_profile = new_profile
         self.cfg.machine_type = new_profile.name if new_profile else None
+        self._button_cfgs, self._highlight_cfg = _prepare_button_configs(new_profile)
         
         # 重置測試狀態
         self._test_spin_count = 0
         self._last_balance = None
         self._no_change_count = 0
         self._spin_count = 0
-        self.console_logs = []
+        self.console_logs = deque(maxlen=CONSOLE_LOG_LIMIT)
+        self._console_errors = deque(maxlen=CONSOLE_ERROR_LIMIT)
         self.test_report = self._create_test_report(new_code, new_profile)
         
         logging.info(f"[GameRunner] 已切換到新機器: {new_code} (類型: {new_profile.name if new_profile else 'unknown'})")
@@ -157,30 +523,30 @@ class GameRunner:
         if not self.machine_profiles or not match_machine_profile:
             return None
         
-        # 從 URL 提取 gameid
-        gameid = None
-        if "gameid=" in self.cfg.url:
-            try:
-                gameid = self.cfg.url.split("gameid=")[1].split("&")[0]
-            except:
-                pass
-        
+        # 匹配結果由 MachineProfiles.match_cache 快取（所有 Worker 共用）
         return match_machine_profile(
             self.machine_profiles,
             self.cfg.url,
             code,
-            gameid,
+            self._gameid,
             require_game_title_code=True
         )
 
     async def _check_and_refresh_if_404(self):
-        """定時檢測 404 頁面並刷新，每 30 秒檢查一次"""
+        """
+        檢測 404 頁面並刷新
+        - 主框架導航回應正常（< 400）時略過 DOM 檢測
+        - 回應為錯誤狀態（>= 400）或尚未收到回應時，依檢查間隔以 DOM 檢測（持續 404 / 5xx 時不會每輪都刷新）
+        - 檢查間隔從 MIN_404_CHECK_INTERVAL 起，每次正常 ×1.5，最長 MAX_404_CHECK_INTERVAL；偵測到 404 時重設
+        """
         try:
-            if not self.page:
+            # 快速路徑：沒有頁面，或主框架最近一次導航回應正常時，不需檢查 DOM（也不需讀取時間）
+            status = self._main_status
+            if not self.page or (status is not None and status < 400):
                 return False
-                
-            current_time = time.time()
             
+            # 主框架回應錯誤狀態或狀態未知時，都依檢查間隔以 DOM 檢測
+            current_time = time.monotonic()
             if current_time - self._last_404_check_time < self._404_check_interval:
                 return False
             
@@ -189,8 +555,11 @@ class GameRunner:
             if await is_404_page(self.page):
                 game_name = self.cfg.game_title_code or 'Unknown'
                 logging.warning(f"🚨 [{game_name}] 檢測到 404 頁面，準備刷新...")
+                # 偵測到 404 後恢復最短檢查間隔
+                self._404_check_interval = MIN_404_CHECK_INTERVAL
                 
                 try:
+                    invalidate_page_state(self.page)
                     await self.page.reload()
                     logging.info(f"✅ [{game_name}] 頁面已刷新")
                     await asyncio.sleep(3.0)
@@ -198,6 +567,7 @@ class GameRunner:
                     if await is_404_page(self.page):
                         logging.error(f"❌ [{game_name}] 刷新後仍然是 404 頁面")
                         logging.info(f"🔄 [{game_name}] 嘗試重新加載原始 URL...")
+                        invalidate_page_state(self.page)
                         await self.page.goto(self.cfg.url)
                         await asyncio.sleep(3.0)
                         
@@ -214,109 +584,184 @@ class GameRunner:
                     return False
             else:
                 game_name = self.cfg.game_title_code or 'Unknown'
-                logging.debug(f"✅ [{game_name}] 頁面正常，無需刷新")
+                # 頁面正常則逐步拉長檢查間隔
+                self._404_check_interval = min(self._404_check_interval * 1.5, MAX_404_CHECK_INTERVAL)
+                logging.debug(f"✅ [{game_name}] 頁面正常，無需刷新（下次檢查間隔 {self._404_check_interval:.0f}s）")
                 return False
         except Exception as e:
             game_name = self.cfg.game_title_code or 'Unknown'
             logging.error(f"❌ [{game_name}] 檢測 404 頁面時發生錯誤: {e}")
             return False
 
-    async def _build_browser(self, playwright):
-        """建立與回傳 Playwright Browser 和 Context"""
-        self.browser = await playwright.chromium.launch(headless=False)
-        self.context = await self.browser.new_context(
-            viewport={"width": 500, "height": 859},
-            user_agent=(
-                "Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/85.0.4183.127 Mobile Safari/537.36"
-            ),
-        )
-        self.page = await self.context.new_page()
+    @classmethod
+    async def _acquire_shared_browser(cls) -> Browser:
+        """
+        取得所有 GameRunner 共用的 Browser（第一次呼叫時啟動），每個 Worker 只建立自己的 Context
+        - 以 Lock 保證只啟動一次；以引用計數決定何時關閉
+        """
+        async with cls._shared_lock:
+            if cls._shared_browser is None or not cls._shared_browser.is_connected():
+                if cls._shared_playwright is None:
+                    cls._shared_playwright = await async_playwright().start()
+                cls._shared_browser = await cls._shared_playwright.chromium.launch(headless=False)
+                logging.info("[Browser] 已啟動共用瀏覽器")
+            cls._shared_users += 1
+            return cls._shared_browser
+
+    @classmethod
+    async def _release_shared_browser(cls):
+        """釋放共用 Browser；最後一個 Worker 結束時關閉瀏覽器並停止 Playwright"""
+        async with cls._shared_lock:
+            cls._shared_users -= 1
+            if cls._shared_users > 0:
+                return
+            cls._shared_users = 0
+            browser, cls._shared_browser = cls._shared_browser, None
+            playwright, cls._shared_playwright = cls._shared_playwright, None
+            pool, cls._img_pool = cls._img_pool, None
+            if pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+            if browser:
+                try:
+                    await browser.close()
+                except Exception:
+                    pass
+            if playwright:
+                try:
+                    await playwright.stop()
+                except Exception:
+                    pass
+
+    async def _build_browser(self):
+        """在共用 Browser 上建立此 Worker 的 Context 與 Page，並進入機器"""
+        self.context = await self.browser.new_context(viewport=_MOBILE_VIEWPORT, user_agent=_MOBILE_UA)
+        self.page = await self._new_page()
+        
+        # 測試進入機器
+        try:
+            await self.page.goto(self.cfg.url, timeout=30000)
+            await self.page.wait_for_load_state("networkidle", timeout=10000)
+            
+            # 檢查是否有錯誤提示窗
+            # 一次在頁面內取出所有提示窗的非空文字（單一 CDP 往返）
+            error_texts = await self.page.eval_on_selector_all(ERROR_DIALOG_SELECTOR, _ERROR_TEXTS_JS)
+            if error_texts:
+                self.test_report.entry_status = "failed"
+                self.test_report.console_errors.append({
+                    "type": "dialog",
+                    "text": "; ".join(error_texts),
+                    "timestamp": time.time()
+                })
+                logging.error(f"[Entry] 檢測到錯誤提示窗: {error_texts}")
+                if self.test_service:
+                    await asyncio.to_thread(self.test_service.log_entry_status, self.cfg.url, "failed", "; ".join(error_texts))
+                return self.browser, self.context, self.page
+            
+            # 檢查console是否有錯誤（錯誤已在監聽器中即時累積，不需再掃描全部 console 訊息）
+            # test_service 為同步 HTTP 請求，放到執行緒中執行，避免阻塞所有 Worker 共用的事件迴圈
+            if self.test_service and self._console_errors:
+                errors = list(self._console_errors)
+                await asyncio.to_thread(lambda: [
+                    self.test_service.log_entry_status(self.cfg.url, "failed", error.get("text", ""))
+                    for error in errors
+                ])
+            
+            self.test_report.entry_status = "success"
+            if self.test_service:
+                await asyncio.to_thread(self.test_service.log_entry_status, self.cfg.url, "success")
+            
+        except Exception as e:
+            self.test_report.entry_status = "failed"
+            error_msg = f"進入機器失敗: {str(e)}"
+            self.test_report.console_errors.append({
+                "type": "exception",
+                "text": error_msg,
+                "timestamp": time.time()
+            })
+            logging.error(f"[Entry] {error_msg}")
+            if self.test_service:
+                await asyncio.to_thread(self.test_service.log_entry_status, self.cfg.url, "failed", error_msg)
+        
+        return self.browser, self.context, self.page
+
+    async def _new_page(self) -> Page:
+        """在目前的 Context 開新頁面，註冊音頻監控與 console 監聽（尚未導航）"""
+        page = await self.context.new_page()
         
         # 注入音頻監控腳本（必須在頁面導航前）
         if AudioDetector:
             try:
-                await AudioDetector.inject_monitor(self.page)
+                await AudioDetector.inject_monitor(page)
             except Exception as e:
                 logging.warning(f"[AudioDetector] 注入失敗，音頻檢測將跳過: {e}")
         
         # 監聽 console 訊息
         def on_console(msg):
-            self.console_logs.append({
+            entry = {
                 "type": msg.type,
                 "text": msg.text,
                 "timestamp": time.time()
-            })
+            }
+            self.console_logs.append(entry)
             if msg.type == "error":
+                self._console_errors.append(entry)
                 logging.warning(f"[Console] {msg.type}: {msg.text}")
         
         def on_pageerror(error):
-            self.console_logs.append({
+            entry = {
                 "type": "pageerror",
                 "text": str(error),
                 "timestamp": time.time()
-            })
+            }
+            self.console_logs.append(entry)
+            self._console_errors.append(entry)
             logging.error(f"[PageError] {error}")
         
-        self.page.on("console", on_console)
-        self.page.on("pageerror", on_pageerror)
+        # 記錄主框架導航回應的 HTTP 狀態，供 404 檢測判斷是否需要檢查 DOM
+        def on_response(response):
+            try:
+                if response.frame == page.main_frame and response.request.is_navigation_request():
+                    self._main_status = response.status
+            except Exception:
+                pass
         
-        # 測試進入機器
+        page.on("console", on_console)
+        page.on("pageerror", on_pageerror)
+        page.on("response", on_response)
+        return page
+
+    async def _recycle_page(self):
+        """
+        以新頁面替換長時間使用的頁面，限制 Chromium 記憶體持續成長
+        - 新頁面先導航到大廳並就緒，再關閉舊頁面；失敗時繼續使用舊頁面
+        """
+        logging.info(f"[Browser] {self._worker_id} 已測試 {PAGE_RECYCLE_EVERY} 台機器，回收頁面")
+        new_page = None
         try:
-            await self.page.goto(self.cfg.url, timeout=30000)
-            await self.page.wait_for_load_state("networkidle", timeout=10000)
-            
-            # 檢查是否有錯誤提示窗
-            error_dialogs = await self.page.query_selector_all(
-                "div[class*='error'], div[class*='Error'], .alert-error, .error-message, [class*='alert']"
-            )
-            if error_dialogs:
-                error_texts = []
-                for dialog in error_dialogs:
-                    try:
-                        text = await dialog.inner_text()
-                        if text and text.strip():
-                            error_texts.append(text.strip())
-                    except:
-                        pass
-                
-                if error_texts:
-                    self.test_report["entry_status"] = "failed"
-                    self.test_report["console_errors"].append({
-                        "type": "dialog",
-                        "text": "; ".join(error_texts),
-                        "timestamp": time.time()
-                    })
-                    logging.error(f"[Entry] 檢測到錯誤提示窗: {error_texts}")
-                    if self.test_service:
-                        self.test_service.log_entry_status(self.cfg.url, "failed", "; ".join(error_texts))
-                    return self.browser, self.context, self.page
-            
-            # 檢查console是否有錯誤
-            console_errors = [log for log in self.console_logs if log.get("type") in ["error", "pageerror"]]
-            if console_errors:
-                self.test_report["console_errors"] = console_errors
-                if self.test_service:
-                    for error in console_errors:
-                        self.test_service.log_entry_status(self.cfg.url, "failed", error.get("text", ""))
-            
-            self.test_report["entry_status"] = "success"
-            if self.test_service:
-                self.test_service.log_entry_status(self.cfg.url, "success")
-            
+            new_page = await self._new_page()
+            await new_page.goto(self.cfg.url, timeout=30000)
+            await new_page.wait_for_load_state("networkidle", timeout=10000)
         except Exception as e:
-            self.test_report["entry_status"] = "failed"
-            error_msg = f"進入機器失敗: {str(e)}"
-            self.test_report["console_errors"].append({
-                "type": "exception",
-                "text": error_msg,
-                "timestamp": time.time()
-            })
-            logging.error(f"[Entry] {error_msg}")
-            if self.test_service:
-                self.test_service.log_entry_status(self.cfg.url, "failed", error_msg)
-        
-        return self.browser, self.context, self.page
+            logging.warning(f"[Browser] 建立新頁面失敗，繼續使用原頁面: {e}")
+            if new_page:
+                try:
+                    await new_page.close()
+                except Exception:
+                    pass
+            return
+        old_page, self.page = self.page, new_page
+        try:
+            await old_page.close()
+        except Exception:
+            pass
+
+    def _match_machine_action(self, game_code: str) -> Tuple[Optional[str], Optional[MachineAction]]:
+        """依 machine_actions 順序找出第一個包含於機器號中的關鍵字，回傳 (關鍵字, 動作)"""
+        if game_code:
+            for kw, action in self.machine_actions.items():
+                if kw in game_code:
+                    return kw, action
+        return None, None
 
     async def spin_forever(self):
         """主要工作迴圈"""
@@ -325,6 +770,8 @@ class GameRunner:
             
         game_code = self.cfg.game_title_code or ""
         is_special_game = any(k in game_code for k in SPECIAL_GAMES)
+        # 機器號在整個 Spin 迴圈中不變，特殊流程動作只需匹配一次（依 actions.json 順序取第一個）
+        special_kw, special_action = self._match_machine_action(game_code)
         
         # Spin 次數與退出次數設定
         test_mode = self.test_scenario is not None
@@ -336,21 +783,21 @@ class GameRunner:
             if max_spins is not None and self._test_spin_count >= max_spins:
                 logging.info(f"已達到最大 Spin 次數 ({max_spins})，結束當前機器")
                 break
-            while pause_event.is_set() and not stop_event.is_set():
+            if pause_event.is_set() and not stop_event.is_set():
                 logging.info("[Loop] 已暫停，等待恢復（Space 解除暫停）")
-                await asyncio.sleep(0.3)
+                await wait_while(lambda: pause_event.is_set() and not stop_event.is_set())
             try:
-                loop_start_time = time.time()
+                loop_start_time = time.monotonic()
                 
                 await self._check_and_refresh_if_404()
                 
-                # 1) Balance 檢查（Spin 前）
-                bal_before = await parse_balance(self.page, is_special=is_special_game)
+                # 1) Balance 檢查（Spin 前）與是否在遊戲中，一次 evaluate 取回
+                bal_before, in_game = await probe_balance_and_in_game(self.page, is_special_game)
                 if bal_before is not None:
                     logging.info(f"當前餘額: {bal_before:,}")
 
                 # 檢查是否在遊戲中
-                if not await is_in_game(self.page):
+                if not in_game:
                     logging.warning(f"{game_code} 檢測到在大廳，先嘗試進入遊戲")
                     if game_code:
                         if await scroll_and_click_game(self.page, game_code, self.keyword_actions):
@@ -422,18 +869,20 @@ class GameRunner:
                 # 4) 特殊機台 Spin 後流程 - 根據測試配置決定是否執行
                 if should_trigger_special:
                     if not test_mode or (test_mode and self.test_scenario.features.enable_special_actions):
-                        for kw, (positions, do_take) in self.machine_actions.items():
-                            if game_code and kw in game_code:
-                                logging.info(f"連續{self._check_interval}次無變化觸發特殊流程: {kw} -> {positions}, take={do_take}")
-                                await click_multiple_positions(self.page, positions, click_take=do_take)
-                                break
+                        if special_action:
+                            logging.info(f"連續{self._check_interval}次無變化觸發特殊流程: {special_kw} -> {list(special_action.positions)}, take={special_action.click_take}")
+                            clicked, missing = await click_multiple_positions(
+                                self.page, special_action.positions, click_take=special_action.click_take
+                            )
+                            if missing and not clicked:
+                                logging.warning(f"特殊流程 {special_kw} 沒有任何座標點擊成功: {missing}")
                 elif balance_changed:
                     logging.info("餘額有變化，重置計數器，繼續 Spin")
                 else:
                     logging.info(f"餘額無變化，累積計數: {self._no_change_count}/{self._check_interval}，繼續 Spin")
 
                 # 5) 動態 sleep - 扣除循環耗時，使總週期 = 設定間隔
-                loop_elapsed = time.time() - loop_start_time
+                loop_elapsed = time.monotonic() - loop_start_time
                 target_interval = self.test_scenario.spin_interval if test_mode else 5.0
                 actual_sleep = max(0, target_interval - loop_elapsed)
                 logging.info(f"循環耗時: {loop_elapsed:.3f}s | 目標間隔: {target_interval:.3f}s | 實際等待: {actual_sleep:.3f}s")
@@ -444,13 +893,17 @@ class GameRunner:
                 logging.error(f"spin_forever 例外: {e}\n{traceback.format_exc()}")
                 await asyncio.sleep(1.0)
 
-        while (pause_event.is_set() or self._auto_pause) and not stop_event.is_set():
+        if (pause_event.is_set() or self._auto_pause) and not stop_event.is_set():
             logging.info("[Loop] 已暫停（%s）", "Global" if pause_event.is_set() else "Auto")
-            await asyncio.sleep(0.2)
+            # 全域暫停由事件喚醒；自動暫停沒有事件通知，仍定時檢查
+            await wait_while(
+                lambda: (pause_event.is_set() or self._auto_pause) and not stop_event.is_set(),
+                poll_interval=PAUSE_POLL_INTERVAL if self._auto_pause else None,
+            )
 
     async def run_full_test(self):
         """執行完整測試流程（根據機器類型配置）"""
-        machine_type = self.test_report.get("machine_type", "unknown")
+        machine_type = self.test_report.machine_type
         logging.info(f"[Test] 開始完整測試: {self.cfg.url} (機器類型: {machine_type})")
         
         # 1. 進入機器（已在 _build_browser 中完成）
@@ -462,11 +915,7 @@ class GameRunner:
             # 使用默認測試流程
             await self._run_default_tests()
         
-        # 3. 更新 console 錯誤列表（報告發送由 _send_lark_report 統一處理）
-        self.test_report["console_errors"] = [
-            log for log in self.console_logs 
-            if log.get("type") in ["error", "pageerror"]
-        ]
+        # console 錯誤已由監聽器直接寫入 test_report.console_errors（報告發送由 _send_lark_report 統一處理）
     
     async def _run_machine_specific_tests(self):
         """執行機器類型專屬測試流程（必須在進入遊戲後執行）"""
@@ -486,6 +935,8 @@ class GameRunner:
             allowed_flows = self.test_scenario.test_flows
             logging.info(f"[Test] 測試場景限制只執行: {allowed_flows}")
         
+        # 依序篩選要執行的流程
+        flows = []
         for flow in self.machine_profile.test_flows:
             if not flow.enabled:
                 logging.debug(f"[Test] 跳過已禁用的測試流程: {flow.name}")
@@ -495,74 +946,83 @@ class GameRunner:
             if allowed_flows is not None and flow.name not in allowed_flows:
                 logging.info(f"[Test] 跳過非白名單流程: {flow.name} (允許: {allowed_flows})")
                 continue
-            
-            logging.info(f"[Test] 執行測試流程: {flow.name} - {flow.description}")
-            
-            try:
-                if flow.name in ("進入機器", "entry"):
-                    # 進入機器已在 run_async 中完成，這裡執行圖片比對
-                    await self._compare_stage_image("entry", flow.config)
-                    
-                    # Entry 測試完成後，執行 keyword_actions（如果有的話）
-                    if self.cfg.game_title_code:
-                        for kw, positions in self.keyword_actions.items():
-                            if kw in self.cfg.game_title_code:
-                                logging.info(f"[Test] Entry 測試完成，執行 keyword_actions: {kw} -> {positions}")
-                                try:
-                                    # 等待一下確保頁面穩定
-                                    await asyncio.sleep(1.0)
-                                    await click_multiple_positions(self.page, positions)
-                                    logging.info(f"[Test] ✅ keyword_actions 執行成功: {kw} -> {positions}")
-                                    await asyncio.sleep(1.0)
-                                except Exception as kw_err:
-                                    logging.warning(f"[Test] 執行 keyword_actions 時發生錯誤: {kw_err}")
-                                    self.test_report["console_errors"].append({
-                                        "type": "keyword_actions_error",
-                                        "text": f"執行 keyword_actions 失敗: {str(kw_err)}",
-                                        "timestamp": time.time()
-                                    })
-                                break  # 只執行第一個匹配的關鍵字
-                    
-                    logging.info("[Test] 進入機器流程已完成")
-                    continue
-                elif flow.name == "視頻檢測":
-                    await self._test_video_display(flow.config)
-                    # 視頻檢測後執行圖片比對
-                    await self._compare_stage_image("video", flow.config)
-                elif flow.name == "按鈕測試":
-                    await self._test_buttons_with_config(flow.config)
-                    # 按鈕測試後執行圖片比對
-                    await self._compare_stage_image("buttons", flow.config)
-                elif flow.name == "下注測試":
-                    await self._test_betting(flow.config)
-                    # 下注測試後執行圖片比對
-                    await self._compare_stage_image("betting", flow.config)
-                elif flow.name == "特殊功能測試":
-                    await self._test_special_features(flow.config)
-                    # 特殊功能測試後執行圖片比對
-                    await self._compare_stage_image("special", flow.config)
-                elif flow.name == "Grand功能測試":
-                    await self._test_grand_features(flow.config)
-                    # Grand功能測試後執行圖片比對
-                    await self._compare_stage_image("grand", flow.config)
-                elif flow.name in ("音頻檢測", "audio"):
-                    await self._test_audio(flow.config)
+            flows.append(flow)
+        
+        # 相鄰的觀察型流程（mutates=False）以 asyncio.gather 並行執行；會操作頁面的流程依序執行
+        observers = []
+        for flow in flows + [None]:
+            if flow is not None and not flow.mutates:
+                observers.append(flow)
+                continue
+            if observers:
+                if len(observers) == 1:
+                    delay = await self._run_flow(observers[0])
                 else:
-                    logging.warning(f"[Test] 未知的測試流程: {flow.name}")
-                    # 未知流程也可以執行圖片比對（如果配置了）
-                    if flow.config.get("image_comparison"):
-                        await self._compare_stage_image(flow.name.lower().replace(" ", "_"), flow.config)
-                
+                    logging.info(f"[Test] 並行執行觀察型流程: {[f.name for f in observers]}")
+                    delay = any(await asyncio.gather(*(self._run_flow(f) for f in observers)))
+                observers = []
+                if delay:
+                    await asyncio.sleep(0.5)  # 流程間短暫延遲
+            if flow is not None and await self._run_flow(flow):
                 await asyncio.sleep(0.5)  # 流程間短暫延遲
-                
-            except Exception as e:
-                logging.error(f"[Test] 測試流程 {flow.name} 執行失敗: {e}")
-                self.test_report["console_errors"].append({
-                    "type": "test_flow_error",
-                    "text": f"測試流程 {flow.name} 失敗: {str(e)}",
-                    "timestamp": time.time()
-                })
     
+    async def _run_flow(self, flow) -> bool:
+        """執行單一測試流程（含之後的圖片比對）；回傳之後是否需要流程間延遲"""
+        logging.info(f"[Test] 執行測試流程: {flow.name} - {flow.description}")
+        
+        try:
+            handler, stage = self._flow_dispatch.get(flow.name, (None, None))
+            if handler is None:
+                logging.warning(f"[Test] 未知的測試流程: {flow.name}")
+                # 未知流程也可以執行圖片比對（如果配置並啟用了）
+                if (flow.config.get("image_comparison") or {}).get("enabled", False):
+                    await self._compare_stage_image(flow.name.lower().replace(" ", "_"), flow.config)
+            else:
+                await handler(flow.config)
+                # 測試後執行該階段的圖片比對
+                if stage:
+                    await self._compare_stage_image(stage, flow.config)
+                if flow.name in ENTRY_FLOW_NAMES:
+                    return False
+            return True
+            
+        except Exception as e:
+            logging.error(f"[Test] 測試流程 {flow.name} 執行失敗: {e}")
+            self.test_report.console_errors.append({
+                "type": "test_flow_error",
+                "text": f"測試流程 {flow.name} 失敗: {str(e)}",
+                "timestamp": time.time()
+            })
+            return False
+    
+    async def _run_entry_flow(self, config: Dict[str, Any]):
+        """「進入機器」流程：進入機器已在 run_async 中完成，這裡執行圖片比對與 keyword_actions"""
+        await self._compare_stage_image("entry", config)
+        
+        # Entry 測試完成後，執行 keyword_actions（如果有的話）
+        if self.cfg.game_title_code:
+            for kw, positions in self.keyword_actions.items():
+                if kw in self.cfg.game_title_code:
+                    logging.info(f"[Test] Entry 測試完成，執行 keyword_actions: {kw} -> {positions}")
+                    try:
+                        # 等待一下確保頁面穩定
+                        await asyncio.sleep(1.0)
+                        clicked, missing = await click_multiple_positions(self.page, positions)
+                        if missing:
+                            logging.warning(f"[Test] keyword_actions {kw} 有座標未點擊到: {missing}")
+                        logging.info(f"[Test] ✅ keyword_actions 執行成功: {kw} -> {positions} ({clicked}/{len(positions)})")
+                        await asyncio.sleep(1.0)
+                    except Exception as kw_err:
+                        logging.warning(f"[Test] 執行 keyword_actions 時發生錯誤: {kw_err}")
+                        self.test_report.console_errors.append({
+                            "type": "keyword_actions_error",
+                            "text": f"執行 keyword_actions 失敗: {str(kw_err)}",
+                            "timestamp": time.time()
+                        })
+                    break  # 只執行第一個匹配的關鍵字
+        
+        logging.info("[Test] 進入機器流程已完成")
+
     async def _run_default_tests(self):
         """執行默認測試流程（必須在進入遊戲後執行）"""
         # 確認已進入遊戲
@@ -573,7 +1033,7 @@ class GameRunner:
         logging.info("[Test] 執行默認測試流程")
         
         # 檢查視頻顯示
-        if self.test_report["entry_status"] == "success" and VideoDetector:
+        if self.test_report.entry_status == "success" and _load_video_detector():
             await self._test_video_display({})
         
         # 測試按鈕
@@ -609,26 +1069,27 @@ class GameRunner:
             
             # 寫入報告
             audio_report = result.to_dict()
-            self.test_report["audio_status"] = "pass" if result.passed else "fail"
-            self.test_report["audio_result"] = audio_report
+            self.test_report.audio_status = "pass" if result.passed else "fail"
+            self.test_report.audio_result = audio_report
             
             if result.passed:
                 logging.info("[Test] 音頻檢測通過")
             else:
                 for issue in result.issues:
                     logging.warning(f"[Test] 音頻問題: {issue}")
-                    self.test_report["console_errors"].append({
+                    self.test_report.console_errors.append({
                         "type": "audio_issue",
                         "text": issue,
                         "timestamp": time.time()
                     })
         except Exception as e:
             logging.error(f"[Test] 音頻檢測發生錯誤: {e}")
-            self.test_report["audio_status"] = "error"
-            self.test_report["audio_result"] = {"error": str(e)}
+            self.test_report.audio_status = "error"
+            self.test_report.audio_result = {"error": str(e)}
     
     async def _test_video_display(self, config: Dict[str, Any]):
         """測試視頻顯示"""
+        VideoDetector = _load_video_detector()
         if not VideoDetector:
             return
         
@@ -644,106 +1105,110 @@ class GameRunner:
                 monochrome_threshold=threshold.get("monochrome", 5.0)
             )
             if video_ok:
-                self.test_report["video_status"] = "normal"
+                self.test_report.video_status = "normal"
             else:
-                self.test_report["video_status"] = "error"
-                self.test_report["video_message"] = video_msg
+                self.test_report.video_status = "error"
+                self.test_report.video_message = video_msg
                 logging.warning(f"[Test] 視頻檢測失敗: {video_msg}")
         except Exception as e:
             logging.error(f"[Test] 視頻檢測過程發生錯誤: {e}")
-            self.test_report["video_status"] = "error"
-            self.test_report["video_message"] = f"檢測過程發生錯誤: {str(e)}"
+            self.test_report.video_status = "error"
+            self.test_report.video_message = f"檢測過程發生錯誤: {str(e)}"
     
     async def _test_buttons_with_config(self, config: Dict[str, Any]):
         """根據配置測試按鈕，支持高亮檢測"""
-        # 優先使用機器類型配置的按鈕列表
-        button_configs = []
-        if self.machine_profile and hasattr(self.machine_profile, 'button_test_config'):
-            button_test_config = getattr(self.machine_profile, 'button_test_config', {})
-            button_configs = button_test_config.get("buttons", [])
+        # 優先使用機器類型配置的按鈕列表（切換機器時已整理好）
+        button_configs = self._button_cfgs
         
         # 如果沒有機器類型配置，使用流程配置中的按鈕列表
         if not button_configs:
-            buttons = config.get("buttons", ["SPIN", "BET", "PLAY"])
-            # 轉換為按鈕配置格式
-            for btn in buttons:
-                button_configs.append({
-                    "name": btn,
-                    "selector": f"button:has-text('{btn}')",
-                    "highlight_check": config.get("check_highlight", False)
-                })
+            check = config.get("check_highlight", False)
+            button_configs = [
+                _button_entry({"name": btn, "highlight_check": check})
+                for btn in config.get("buttons", ["SPIN", "BET", "PLAY"])
+            ]
         
-        # 獲取高亮檢測配置
-        highlight_config = None
-        if self.machine_profile and hasattr(self.machine_profile, 'button_test_config'):
-            highlight_config = getattr(self.machine_profile, 'button_test_config', {}).get("highlight_detection", {})
+        # 高亮檢測配置（切換機器時已解析好）
+        highlight = self._highlight_cfg
         
-        for btn_config in button_configs:
-            btn_name = btn_config.get("name", "Unknown")
-            selector = btn_config.get("selector", f"button:has-text('{btn_name}')")
-            check_highlight = btn_config.get("highlight_check", False)
-            
+        # 截圖比對時各按鈕依 bounding_box 從整頁截圖在本地裁切；
+        # 上一個按鈕點擊後的截圖即為下一個按鈕點擊前的畫面，只有沒有可沿用的截圖時才重新截取
+        page_image = None
+        screenshot_check = bool(highlight and highlight.method == "screenshot")
+        
+        for btn_name, selector, selectors, check_highlight in button_configs:
             try:
-                # 嘗試多個選擇器（如果 selector 是逗號分隔的）
-                selectors = [s.strip() for s in selector.split(",")]
+                # 多個候選選擇器合併成單一查詢；先以 count() 即時判斷有無元素，
+                # 不存在時立即略過，不必等滿逾時；存在時才依配置順序找出第一個存在且短暫等待後可見的候選
+                # （合併查詢依 DOM 順序回傳，不保證配置的優先順序）
+                # 可見的元素固定為 ElementHandle：點擊後按鈕隱藏或 DOM 變動時，高亮檢測仍作用在同一個元素上
                 element = None
                 used_selector = None
-                
-                for sel in selectors:
-                    try:
-                        element = await self.page.wait_for_selector(sel, timeout=2000, state="visible")
-                        if element:
+                try:
+                    if await self.page.locator(", ".join(selectors)).count():
+                        for sel in selectors:
+                            if not await self.page.locator(sel).count():
+                                continue
+                            try:
+                                element = await self.page.locator(f"{sel} >> visible=true").first.element_handle(
+                                    timeout=500
+                                )
+                            except Exception:
+                                continue
                             used_selector = sel
                             break
-                    except:
-                        continue
+                except Exception:
+                    element = None
                 
                 if not element:
-                    self.test_report["button_tests"].append({
-                        "button": btn_name,
-                        "status": "failed",
-                        "reason": "元素未找到",
-                        "selector": selector
-                    })
+                    self.test_report.button_tests.append(
+                        ButtonResult(btn_name, "failed", selector, reason="元素未找到")
+                    )
                     continue
                 
-                # 點擊前截圖（用於比對）
+                # 點擊前截圖（用於比對）；bounding_box 只查一次，點擊後的截圖沿用
                 before_screenshot = None
-                if check_highlight:
+                box = None
+                if check_highlight and screenshot_check:
                     try:
-                        before_screenshot = await element.screenshot()
+                        box = await element.bounding_box()
+                        if page_image is None:
+                            page_image = await self._page_image()
+                        if page_image is not None:
+                            before_screenshot = _crop_box(page_image, box)
+                        elif box:
+                            before_screenshot = await self.page.screenshot(clip=box, **_SCREENSHOT_OPTIONS)
                     except:
                         pass
                 
-                # 點擊按鈕
+                # 點擊按鈕（點擊後畫面可能改變，先前的整頁截圖不再沿用）
+                page_image = None
                 await element.click()
                 await asyncio.sleep(0.3)  # 等待高亮效果出現
                 
-                # 檢測高亮
+                # 檢測高亮（截圖比對時同時取回點擊後的整頁截圖，供下一個按鈕作為點擊前畫面）
                 highlight_detected = False
-                if check_highlight and highlight_config:
-                    highlight_detected = await self._check_button_highlight(
+                if check_highlight and highlight:
+                    highlight_detected, page_image = await self._check_button_highlight(
                         element, 
-                        highlight_config,
-                        before_screenshot
+                        highlight,
+                        before_screenshot,
+                        box
                     )
                 
                 # 記錄結果
                 if self.test_service:
-                    self.test_service.test_button_response(used_selector or selector, self.cfg.url, btn_name)
-                
-                test_result = {
-                    "button": btn_name,
-                    "status": "success" if (not check_highlight or highlight_detected) else "failed",
-                    "selector": used_selector or selector
-                }
-                
-                if check_highlight:
-                    test_result["highlight_detected"] = highlight_detected
-                    if not highlight_detected:
-                        test_result["reason"] = "未檢測到高亮效果"
+                    await asyncio.to_thread(
+                        self.test_service.test_button_response, used_selector or selector, self.cfg.url, btn_name
+                    )
                 
-                self.test_report["button_tests"].append(test_result)
+                self.test_report.button_tests.append(ButtonResult(
+                    btn_name,
+                    "success" if (not check_highlight or highlight_detected) else "failed",
+                    used_selector or selector,
+                    highlight_detected=highlight_detected if check_highlight else None,
+                    reason="未檢測到高亮效果" if check_highlight and not highlight_detected else None,
+                ))
                 
                 if highlight_detected:
                     logging.info(f"[Test] 按鈕 {btn_name} 測試成功，已檢測到高亮")
@@ -754,116 +1219,112 @@ class GameRunner:
                 
             except Exception as e:
                 logging.warning(f"[Test] 測試按鈕 {btn_name} 時發生錯誤: {e}")
-                self.test_report["button_tests"].append({
-                    "button": btn_name,
-                    "status": "error",
-                    "error": str(e),
-                    "selector": selector
-                })
+                page_image = None
+                self.test_report.button_tests.append(
+                    ButtonResult(btn_name, "error", selector, error=str(e))
+                )
+    
+    async def _page_image(self) -> Optional[Any]:
+        """截取目前視窗並解碼為 Pillow Image；沒有 Pillow 或截圖失敗時回傳 None"""
+        Image = _load_pil_image()
+        if Image is None or not self.page:
+            return None
+        try:
+            png = await self.page.screenshot(full_page=False, **_SCREENSHOT_OPTIONS)
+            return Image.open(BytesIO(png)).convert("RGB")
+        except Exception as e:
+            logging.debug(f"[Test] 整頁截圖失敗: {e}")
+            return None
     
     async def _check_button_highlight(
         self, 
         element, 
-        highlight_config: Dict[str, Any],
-        before_screenshot: Optional[bytes] = None
-    ) -> bool:
+        highlight: HighlightSpec,
+        before_screenshot: Optional[Any] = None,
+        box: Optional[Dict[str, float]] = None
+    ) -> Tuple[bool, Optional[Any]]:
         """
         檢測按鈕是否有高亮效果
         
         Args:
             element: 按鈕元素
-            highlight_config: 高亮檢測配置
-            before_screenshot: 點擊前的截圖（可選，用於比對）
+            highlight: 解析後的高亮檢測配置
+            before_screenshot: 點擊前的截圖（PNG bytes 或 Pillow Image，可選，用於比對）
+            box: 點擊前取得的按鈕 bounding_box（截圖比對時沿用）
             
         Returns:
-            是否檢測到高亮
+            (是否檢測到高亮, 點擊後的整頁截圖)；沒有截取整頁截圖時後者為 None
         """
-        method = highlight_config.get("method", "css_class")
-        
         try:
-            if method == "css_class":
-                # 檢查 CSS 類名
-                css_classes = highlight_config.get("css_class", "active, selected, highlight")
-                class_list = [c.strip() for c in css_classes.split(",")]
-                
-                class_name = await element.get_attribute("class") or ""
-                for check_class in class_list:
-                    # 支持完整匹配和部分匹配
-                    if check_class in class_name or any(
-                        check_class.replace("[class*='", "").replace("']", "") in class_name
-                        for check_class in class_list if "class*" in check_class
-                    ):
-                        logging.debug(f"[Test] 檢測到高亮類名: {check_class}")
-                        return True
-                
-                # 檢查父元素
-                parent = await element.evaluate_handle("el => el.parentElement")
-                if parent:
-                    parent_class = await parent.get_attribute("class") or ""
-                    for check_class in class_list:
-                        if check_class in parent_class:
-                            logging.debug(f"[Test] 在父元素檢測到高亮類名: {check_class}")
-                            return True
+            if highlight.probe_checks:
+                # 類名與樣式一次取回（單一 CDP 往返），只執行配置的檢測方式
+                probe = await element.evaluate(_HIGHLIGHT_PROBE_JS)
+                if any(check(probe, highlight) for check in highlight.probe_checks):
+                    return True, None
             
-            if method == "background_color" or highlight_config.get("check_style", False):
-                # 檢查背景顏色
-                bg_colors = highlight_config.get("background_color", "#FFD700, yellow")
-                color_list = [c.strip().lower() for c in bg_colors.split(",")]
-                
-                # 獲取計算樣式
-                computed_style = await element.evaluate("""
-                    el => {
-                        const style = window.getComputedStyle(el);
-                        return {
-                            backgroundColor: style.backgroundColor,
-                            borderColor: style.borderColor,
-                            color: style.color
-                        };
-                    }
-                """)
-                
-                bg_color = computed_style.get("backgroundColor", "").lower()
-                border_color = computed_style.get("borderColor", "").lower()
-                
-                for check_color in color_list:
-                    if check_color in bg_color or check_color in border_color:
-                        logging.debug(f"[Test] 檢測到高亮顏色: {check_color}")
-                        return True
-                
-                # 檢查父元素
-                parent_bg = await element.evaluate("""
-                    el => {
-                        const parent = el.parentElement;
-                        if (parent) {
-                            return window.getComputedStyle(parent).backgroundColor;
-                        }
-                        return '';
-                    }
-                """)
-                
-                if parent_bg:
-                    for check_color in color_list:
-                        if check_color in parent_bg.lower():
-                            logging.debug(f"[Test] 在父元素檢測到高亮顏色: {check_color}")
-                            return True
+            if highlight.method == "screenshot" and before_screenshot is not None:
+                return await self._highlight_by_screenshot(element, highlight, before_screenshot, box)
             
-            if method == "screenshot" and before_screenshot:
-                # 使用截圖比對（如果提供了點擊前的截圖）
-                try:
-                    after_screenshot = await element.screenshot()
-                    # 簡單的像素差異檢測
-                    # 這裡可以使用更複雜的圖片比對邏輯
-                    if before_screenshot != after_screenshot:
-                        logging.debug(f"[Test] 截圖比對檢測到變化")
-                        return True
-                except:
-                    pass
-            
-            return False
+            return False, None
             
         except Exception as e:
             logging.warning(f"[Test] 檢測高亮時發生錯誤: {e}")
-            return False
+            return False, None
+    
+    async def _highlight_by_screenshot(
+        self,
+        element,
+        highlight: HighlightSpec,
+        before_screenshot: Any,
+        box: Optional[Dict[str, float]] = None
+    ) -> Tuple[bool, Optional[Any]]:
+        """以點擊前後的截圖比對判斷是否高亮，回傳 (是否高亮, 點擊後的整頁截圖或 None)"""
+        after_image = None
+        try:
+            if box is None:
+                box = await element.bounding_box()
+            if not box:
+                return False, None
+            # 與點擊前相同的取得方式（整頁截圖裁切，或無 Pillow 時直接以 clip 截取按鈕區域）
+            after_image = await self._page_image()
+            if after_image is not None:
+                after_screenshot = _crop_box(after_image, box)
+            else:
+                after_screenshot = await self.page.screenshot(clip=box, **_SCREENSHOT_OPTIONS)
+            if after_screenshot is None:
+                return False, after_image
+            # 指紋相同即畫面完全沒變，不需解碼與逐像素比對
+            if _image_fingerprint(before_screenshot) == _image_fingerprint(after_screenshot):
+                return False, after_image
+            ImageComparator = _load_image_comparator()
+            if ImageComparator and highlight.config.get("tile_diff", False):
+                # 分塊比對：只有外圈區塊變化（外框發光）才算高亮，忽略按鈕內部的動畫
+                tiles = ImageComparator.tile_changes(
+                    ImageComparator.to_rgb_array(before_screenshot),
+                    ImageComparator.to_rgb_array(after_screenshot),
+                    highlight.config.get("tile_size", 32),
+                    highlight.config.get("tile_delta", 32),
+                )
+                ratio = None if tiles is None else float(tiles.mean())
+                changed = tiles is None or ImageComparator.border_only_change(tiles)
+            elif ImageComparator:
+                # pixelmatch 式 YIQ 感知差異：超過像素閾值的比例達 pixel_ratio 才算有變化
+                ratio = ImageComparator.pixel_diff_ratio(
+                    ImageComparator.to_rgb_array(before_screenshot),
+                    ImageComparator.to_rgb_array(after_screenshot),
+                    highlight.config.get("pixel_threshold", 0.1),
+                )
+                changed = ratio > highlight.config.get("pixel_ratio", 0.01)
+            else:
+                # 沒有比對模組時退回逐位元比較
+                ratio = None
+                changed = before_screenshot != after_screenshot
+            if changed:
+                logging.debug(f"[Test] 截圖比對檢測到變化（差異比例: {ratio}）")
+                return True, after_image
+        except Exception:
+            pass
+        return False, after_image
     
     async def _test_betting(self, config: Dict[str, Any]):
         """測試下注功能"""
@@ -874,7 +1335,7 @@ class GameRunner:
         # 這裡可以實現具體的下注測試邏輯
         # 暫時記錄到報告中
         for amount in bet_amounts:
-            self.test_report["bet_results"].append({
+            self.test_report.bet_results.append({
                 "bet_amount": amount,
                 "success": True,  # 實際應該測試下注是否成功
                 "timestamp": time.time()
@@ -898,32 +1359,49 @@ class GameRunner:
             stage_name: 階段名稱（例如 "entry", "video", "buttons"）
             flow_config: 測試流程配置（包含圖片比對配置）
         """
-        if not ImageComparator or not self.machine_profile:
+        # 未啟用圖片比對時直接返回（不導入比對模組、不組參考圖片路徑）
+        image_comparison_config = flow_config.get("image_comparison")
+        if not (
+            image_comparison_config
+            and image_comparison_config.get("enabled", False)
+            and self.machine_profile
+        ):
             return
         
-        # 檢查是否啟用圖片比對
-        image_comparison_config = flow_config.get("image_comparison")
-        if not image_comparison_config or not image_comparison_config.get("enabled", False):
+        ImageComparator = _load_image_comparator()
+        if not ImageComparator:
             return
         
+        # 獲取參考圖片目錄
+        if not self.machine_profile.folder_path:
+            logging.warning("[Test] 無法獲取機器類型文件夾路徑，跳過圖片比對")
+            return
+        reference_images_dir = self.machine_profile.folder_path / "reference_images"
+        
         try:
-            # 獲取參考圖片目錄
-            if self.machine_profile.folder_path:
-                reference_images_dir = self.machine_profile.folder_path / "reference_images"
-            else:
-                logging.warning("[Test] 無法獲取機器類型文件夾路徑，跳過圖片比對")
-                return
-            
-            # 執行圖片比對
-            is_match, comparison_result = await ImageComparator.compare_stage(
+            # 截圖在當下完成（必須反映此階段的畫面），比對在背景進行，與後續頁面操作重疊
+            capture = await ImageComparator.capture_stage(
                 self.page,
                 stage_name,
                 reference_images_dir,
                 image_comparison_config
             )
+        except Exception as e:
+            self._record_stage_comparison_error(self.test_report, stage_name, e)
+            return
+        
+        self._pending_comparisons.append(
+            asyncio.create_task(self._finish_stage_comparison(self.test_report, capture))
+        )
+    
+    async def _finish_stage_comparison(self, report: TestReport, capture: Any):
+        """在背景完成階段圖片比對，並將結果寫入截圖當時的報告"""
+        stage_name = capture.stage_name
+        try:
+            is_match, comparison_result = await self._run_compare(capture)
             
             # 記錄比對結果
-            self.test_report["image_comparisons"].append({
+            report.image_comparisons.append({
                 "stage": stage_name,
                 "match": is_match,
                 "result": comparison_result,
@@ -934,64 +1412,90 @@ class GameRunner:
                 logging.info(f"[Test] 階段 {stage_name} 圖片比對成功")
             else:
                 logging.warning(f"[Test] 階段 {stage_name} 圖片比對失敗")
-                self.test_report["console_errors"].append({
+                report.console_errors.append({
                     "type": "image_comparison_failed",
                     "text": f"階段 {stage_name} 圖片比對失敗: {comparison_result}",
                     "timestamp": time.time()
                 })
                 
         except Exception as e:
-            logging.error(f"[Test] 階段 {stage_name} 圖片比對過程發生錯誤: {e}")
-            self.test_report["image_comparisons"].append({
-                "stage": stage_name,
-                "match": False,
-                "error": str(e),
-                "timestamp": time.time()
-            })
+            self._record_stage_comparison_error(report, stage_name, e)
+    
+    @classmethod
+    async def _run_compare(cls, capture: Any) -> Tuple[bool, Dict[str, Any]]:
+        """在進程池中執行像素比對（不佔用事件迴圈所在進程的 GIL）；進程池不可用時改用執行緒"""
+        compare = _load_image_comparator().compare_captured
+        if cls._img_pool_broken:
+            return await asyncio.to_thread(compare, capture)
+        loop = asyncio.get_running_loop()
+        if cls._img_pool is None:
+            cls._img_pool = ProcessPoolExecutor(max_workers=IMAGE_COMPARE_WORKERS)
+        try:
+            return await loop.run_in_executor(cls._img_pool, compare, capture)
+        except BrokenProcessPool:
+            logging.warning("[Test] 圖片比對進程池已失效，之後改用執行緒比對")
+            cls._img_pool_broken = True
+            pool, cls._img_pool = cls._img_pool, None
+            if pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+            return await asyncio.to_thread(compare, capture)
+    
+    @staticmethod
+    def _record_stage_comparison_error(report: TestReport, stage_name: str, e: Exception):
+        logging.error(f"[Test] 階段 {stage_name} 圖片比對過程發生錯誤: {e}")
+        report.image_comparisons.append({
+            "stage": stage_name,
+            "match": False,
+            "error": str(e),
+            "timestamp": time.time()
+        })
+    
+    async def _join_pending_comparisons(self):
+        """等待背景中尚未完成的圖片比對"""
+        if self._pending_comparisons:
+            pending, self._pending_comparisons = self._pending_comparisons, []
+            await asyncio.gather(*pending, return_exceptions=True)
 
     async def _test_buttons(self):
         """測試按鈕反應"""
         # 從配置或預設按鈕列表
         buttons = ["SPIN", "BET", "PLAY"]  # 可以從配置讀取
         
-        for btn in buttons:
+        # 單一 evaluate 找出所有按鈕；有按鈕還沒出現時，最多再等待 2 秒後重新查找一次
+        try:
+            probes = await self.page.evaluate(_FIND_TEST_BUTTONS_JS, buttons)
+            if not all(probes):
+                try:
+                    await self.page.wait_for_function(_TEST_BUTTONS_READY_JS, arg=buttons, timeout=2000)
+                except PWTimeoutError:
+                    pass
+                probes = await self.page.evaluate(_FIND_TEST_BUTTONS_JS, buttons)
+        except Exception as e:
+            logging.warning(f"[Test] 查找測試按鈕時發生錯誤: {e}")
+            for btn in buttons:
+                self.test_report.button_tests.append(ButtonResult(btn, "error", error=str(e)))
+            return
+        
+        # 依序點擊（避免同時點擊互相干擾）
+        for i, (btn, selector) in enumerate(zip(buttons, probes)):
             try:
-                # 嘗試多種選擇器
-                selectors = [
-                    f"button:has-text('{btn}')",
-                    f"button[class*='{btn.lower()}']",
-                    f"[class*='spin'], [class*='bet'], [class*='play']"
-                ]
-                
                 clicked = False
-                used_selector = None
-                for selector in selectors:
+                if selector is not None:
                     try:
-                        element = await self.page.wait_for_selector(selector, timeout=2000, state="visible")
-                        if element:
-                            await element.click()
-                            clicked = True
-                            used_selector = selector
-                            await asyncio.sleep(0.5)  # 等待反應
-                            break
-                    except:
-                        continue
+                        await self.page.locator(f'[data-mt-test-btn~="{i}"]').first.click(timeout=2000)
+                        clicked = True
+                        await asyncio.sleep(0.5)  # 等待反應
+                    except Exception:
+                        pass
                 
                 if clicked and self.test_service:
-                    self.test_service.test_button_response(used_selector or selectors[0], self.cfg.url, btn)
+                    await asyncio.to_thread(self.test_service.test_button_response, selector, self.cfg.url, btn)
                 
-                self.test_report["button_tests"].append({
-                    "button": btn,
-                    "status": "success" if clicked else "failed"
-                })
+                self.test_report.button_tests.append(ButtonResult(btn, "success" if clicked else "failed"))
                 
             except Exception as e:
                 logging.warning(f"[Test] 測試按鈕 {btn} 時發生錯誤: {e}")
-                self.test_report["button_tests"].append({
-                    "button": btn,
-                    "status": "error",
-                    "error": str(e)
-                })
+                self.test_report.button_tests.append(ButtonResult(btn, "error", error=str(e)))
 
     async def _run_single_machine(self, code: str) -> bool:
         """
@@ -1018,27 +1522,25 @@ class GameRunner:
         if await is_in_game(self.page):
             logging.info(f"[Runner] 當前在遊戲中，先退出到大廳")
             await exit_game_to_lobby(self.page)
-            await asyncio.sleep(2.0)
+            await self._settle_in_lobby()
         
         logging.info(f"[Runner] 準備進入遊戲: {code}")
         if not await scroll_and_click_game(self.page, code, self.keyword_actions):
             logging.warning(f"[Runner] 無法找到遊戲 {code}，跳過")
-            self.test_report["entry_status"] = "failed"
-            self._send_lark_report()
+            self.test_report.entry_status = "failed"
+            await self._send_lark_report()
             return True
         
-        await asyncio.sleep(3.0)
-        
-        # 4. 確認進入遊戲
-        if not await is_in_game(self.page):
+        # 4. 確認進入遊戲（遊戲指標元素一出現就繼續，最多等待 GAME_ENTER_TIMEOUT 秒）
+        if not await wait_until_in_game(self.page):
             logging.warning(f"[Runner] 無法確認進入遊戲 {code}，跳過")
-            self.test_report["entry_status"] = "failed"
-            self.test_report["console_errors"].append({
+            self.test_report.entry_status = "failed"
+            self.test_report.console_errors.append({
                 "type": "entry_error",
                 "text": f"無法確認進入遊戲: {code}",
                 "timestamp": time.time()
             })
-            self._send_lark_report()
+            await self._send_lark_report()
             return True
         
         # 5. 執行測試流程
@@ -1050,23 +1552,28 @@ class GameRunner:
             await self.spin_forever()
         
         # 7. Spin 結束後發送 Lark 報告
-        self._send_lark_report()
+        await self._send_lark_report()
         
         # 8. 退出遊戲回到大廳（準備下一台）
         logging.info(f"[Runner] 機器 {code} 測試完畢，退出到大廳")
         await exit_game_to_lobby(self.page)
-        await asyncio.sleep(2.0)
+        await self._settle_in_lobby()
         
         logging.info(f"[Runner] === 機器 {code} 測試完成 ===")
         return True
 
-    def _send_lark_report(self):
-        """彙整並發送 Lark 測試報告"""
-        self.test_report["console_errors"] = [
-            log for log in self.console_logs 
-            if log.get("type") in ["error", "pageerror"]
-        ]
-        self.lark.send_test_report(self.test_report)
+    async def _settle_in_lobby(self):
+        """退出遊戲後等待大廳元素出現，再保留短暫的渲染緩衝"""
+        if not await wait_until_in_lobby(self.page):
+            logging.warning("[Runner] 等待大廳逾時，繼續執行")
+        await asyncio.sleep(LOBBY_SETTLE_DELAY)
+
+    async def _send_lark_report(self):
+        """彙整 Lark 測試報告（先等待背景圖片比對完成），放入 Lark 背景佇列發送，不阻塞退出與下一台機器"""
+        await self._join_pending_comparisons()
+        if not self.lark.enabled:
+            return
+        self.lark.enqueue_test_report(self.test_report.to_dict())
 
     async def run_async(self):
         """
@@ -1079,10 +1586,21 @@ class GameRunner:
         4. 佇列空了就結束
         """
         logging.info(f"初始化遊戲測試: {self.cfg}")
-        async with async_playwright() as playwright:
-            await self._build_browser(playwright)
+        self.browser = await self._acquire_shared_browser()
+        try:
+            await self._build_browser()
             
             try:
+                # 等待其他 Worker 也完成瀏覽器初始化，讓所有 Worker 同時開始測試
+                if self.start_barrier:
+                    logging.info(f"[Runner] {self._worker_id} 瀏覽器已就緒，等待其他 Worker")
+                    try:
+                        await self.start_barrier.wait()
+                    except asyncio.BrokenBarrierError:
+                        # 已要求停止或其他 Worker 啟動失敗，不再進入測試流程
+                        logging.warning(f"[Runner] {self._worker_id} 啟動已中止，結束 Worker")
+                        return
+                
                 if self.task_manager:
                     # === 共享佇列模式：循環處理多台機器 ===
                     machine_count = 0
@@ -1100,6 +1618,10 @@ class GameRunner:
                             f"(佇列剩餘: {remaining})"
                         )
                         
+                        # 每測試 PAGE_RECYCLE_EVERY 台機器換一個新頁面
+                        if PAGE_RECYCLE_EVERY and machine_count > 1 and (machine_count - 1) % PAGE_RECYCLE_EVERY == 0:
+                            await self._recycle_page()
+                        
                         # 執行單台機器的完整流程
                         success = await self._run_single_machine(code)
                         if not success:
@@ -1118,18 +1640,18 @@ class GameRunner:
             except KeyboardInterrupt:
                 logging.info("手動中止")
                 # 手動中止時也發送報告
-                self._send_lark_report()
+                await self._send_lark_report()
             finally:
                 if self.context:
                     try:
                         await self.context.close()
                     except Exception:
                         pass
-                if self.browser:
-                    try:
-                        await self.browser.close()
-                    except Exception:
-                        pass
+        finally:
+            # 等待 Lark 背景佇列中的報告發送完成
+            if self.lark.enabled:
+                await asyncio.to_thread(self.lark.flush)
+            await self._release_shared_browser()
 
     def run(self):
         """同步包裝器，用於線程啟動"""
@@ -1,47 +1,193 @@
 """遊戲導航相關功能（進入/離開遊戲）"""
 import asyncio
+import atexit
+import json
 import logging
+import os
+import tempfile
+import time
 import traceback
-from typing import Optional, Dict, List
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional, Dict, List, Tuple
+from weakref import WeakKeyDictionary
 from playwright.async_api import Page, TimeoutError as PWTimeoutError
 
-from core.browser import wait_for_selector, wait_for_all_selectors
 from game.actions import click_multiple_positions
+from game.balance import BALANCE_SELECTOR, SPECIAL_BALANCE_SELECTOR
 
+# 遊戲中的指標元素：Spin 按鈕、餘額顯示、特殊機台餘額顯示
+GAME_INDICATORS = (".my-button.btn_spin", ".balance-bg.hand_balance", ".h-balance.hand_balance")
 
-async def is_in_game(page: Page) -> bool:
+# 一次取回餘額數字與是否在遊戲中（判斷規則同 is_in_game：大廳元素可見 → 不在遊戲中）
+_PRESPIN_PROBE_JS = """
+({balanceSel, indicators}) => {
+    const visible = (e) => {
+        const r = e.getBoundingClientRect();
+        return r.width > 0 && r.height > 0 && getComputedStyle(e).visibility !== 'hidden';
+    };
+    const bal = document.querySelector(balanceSel);
+    const digits = bal ? (bal.innerText || '').replace(/[^0-9]/g, '') : '';
+    const lobby = document.querySelector('#grid_gm_item');
+    let inGame = false;
+    if (!(lobby && visible(lobby))) {
+        inGame = indicators.some((sel) => Array.from(document.querySelectorAll(sel)).some(visible));
+    }
+    return {digits, inGame};
+}
+"""
+
+# 頁面狀態：大廳元素可見 → "lobby"；任一遊戲指標元素可見 → "game"；都沒有 → "unknown"
+_PAGE_STATE_JS = """
+(indicators) => {
+    const visible = (e) => {
+        const r = e.getBoundingClientRect();
+        return r.width > 0 && r.height > 0 && getComputedStyle(e).visibility !== 'hidden';
+    };
+    const lobby = document.querySelector('#grid_gm_item');
+    if (lobby && visible(lobby)) return 'lobby';
+    return indicators.some((sel) => Array.from(document.querySelectorAll(sel)).some(visible)) ? 'game' : 'unknown';
+}
+"""
+# 供 wait_for_function 輪詢是否已在遊戲中（規則同 is_in_game）
+_IN_GAME_JS = f"(indicators) => ({_PAGE_STATE_JS})(indicators) === 'game'"
+# 供 wait_for_function 輪詢大廳或遊戲其一出現，回傳 'lobby' / 'game'
+_PAGE_STATE_KNOWN_JS = f"""
+(indicators) => {{
+    const state = ({_PAGE_STATE_JS})(indicators);
+    return state !== 'unknown' && state;
+}}
+"""
+_IN_LOBBY_JS = """
+() => {
+    const lobby = document.querySelector('#grid_gm_item');
+    if (!lobby) return false;
+    const r = lobby.getBoundingClientRect();
+    return r.width > 0 && r.height > 0 && getComputedStyle(lobby).visibility !== 'hidden';
+}
+"""
+
+# 點擊遊戲後等待進入遊戲、退出後等待回到大廳的最長秒數
+GAME_ENTER_TIMEOUT = 10.0
+LOBBY_RETURN_TIMEOUT = 5.0
+
+# 點擊遊戲卡片後出現的下一個狀態：資訊框（含 Join）或直接進入遊戲
+_CARD_OPENED_SELECTOR = "div.gm-info-box, .my-button.btn_spin"
+# Join 按鈕不一定是卡片內部 DOM；改抓全局 gm-info-box
+_JOIN_BUTTON_XPATH = "//div[contains(@class, 'gm-info-box')]//span[normalize-space(text())='Join']"
+# 退出流程的按鈕：Exit / Exit To Lobby、Confirm
+EXIT_BUTTON_SELECTOR = ".function-btn .reserve-btn-gray"
+CONFIRM_BUTTON_XPATH = "//button[.//div[normalize-space(text())='Confirm']]"
+
+
+async def _wait_or_sleep(page: Page, selector: str, timeout: float, fallback: float, state: str = "attached") -> bool:
+    """等待 selector 出現（出現即返回 True）；逾時只短暫等待 fallback 秒後回傳 False"""
+    try:
+        await page.wait_for_selector(selector, timeout=timeout * 1000, state=state)
+        return True
+    except PWTimeoutError:
+        await asyncio.sleep(fallback)
+        return False
+
+
+# 頁面狀態快取的有效秒數：期間內重複的 is_in_game 直接沿用最近一次觀察到的狀態
+PAGE_STATE_TTL = 0.5
+
+
+@dataclass(slots=True)
+class PageState:
+    """最近一次觀察到的頁面狀態（"lobby" / "game" / "unknown"）與觀察時間（monotonic）"""
+    state: str
+    ts: float
+
+
+# 每個頁面的狀態快取（頁面關閉後自動釋放）；點擊會改變頁面狀態的按鈕前清除
+_PAGE_STATES: "WeakKeyDictionary[Page, PageState]" = WeakKeyDictionary()
+
+
+def _remember_state(page: Page, state: str) -> None:
+    _PAGE_STATES[page] = PageState(state, time.monotonic())
+
+
+def invalidate_page_state(page: Page) -> None:
+    """清除頁面狀態快取（進入 / 離開遊戲、重新載入頁面等操作前呼叫）"""
+    _PAGE_STATES.pop(page, None)
+
+
+async def wait_until_in_game(page: Page, timeout: float = GAME_ENTER_TIMEOUT) -> bool:
+    """等待頁面進入遊戲（遊戲指標元素出現即返回），逾時回傳 False"""
+    if not page:
+        return False
+    try:
+        await page.wait_for_function(_IN_GAME_JS, arg=list(GAME_INDICATORS), timeout=timeout * 1000)
+        _remember_state(page, "game")
+        return True
+    except PWTimeoutError:
+        return False
+    except Exception as e:
+        logging.warning(f"等待進入遊戲時發生錯誤: {e}")
+        return False
+
+
+async def wait_until_in_lobby(page: Page, timeout: float = LOBBY_RETURN_TIMEOUT) -> bool:
+    """等待大廳元素出現（出現即返回），逾時回傳 False"""
+    if not page:
+        return False
+    try:
+        await page.wait_for_function(_IN_LOBBY_JS, timeout=timeout * 1000)
+        _remember_state(page, "lobby")
+        return True
+    except PWTimeoutError:
+        return False
+    except Exception as e:
+        logging.warning(f"等待回到大廳時發生錯誤: {e}")
+        return False
+
+
+async def wait_for_page_state(page: Page, timeout: float) -> str:
+    """
+    等待大廳或遊戲其一出現（先出現者即返回），回傳 "lobby" / "game"；逾時或失敗回傳 "unknown"
+    - 同時取代「先檢查是否在遊戲中、再等待大廳元素」兩個依序的探測
+    """
+    if not page:
+        return "unknown"
+    try:
+        handle = await page.wait_for_function(
+            _PAGE_STATE_KNOWN_JS, arg=list(GAME_INDICATORS), timeout=timeout * 1000
+        )
+        state = await handle.json_value()
+        _remember_state(page, state)
+        return state
+    except PWTimeoutError:
+        return "unknown"
+    except Exception as e:
+        logging.warning(f"等待頁面狀態時發生錯誤: {e}")
+        return "unknown"
+
+
+async def is_in_game(page: Page, ttl: float = PAGE_STATE_TTL) -> bool:
     """
     檢查是否在遊戲中（而非大廳）
     回傳 True 如果在遊戲中，False 如果在大廳
+    - ttl 秒內已觀察過頁面狀態（本函式或各 wait_* 函式）時直接沿用，不再查詢頁面
     """
     if not page:
         return False
         
+    cached = _PAGE_STATES.get(page)
+    if cached is not None and time.monotonic() - cached.ts < ttl:
+        return cached.state == "game"
+
     try:
-        # 先檢查大廳元素（優先判斷）
-        try:
-            lobby_elem = await page.query_selector("#grid_gm_item")
-            if lobby_elem and await lobby_elem.is_visible():
-                logging.info("檢測到大廳元素，當前在大廳")
-                return False
-        except Exception:
-            pass
-        
-        # 檢查遊戲中的指標元素
-        game_indicators = [
-            ".my-button.btn_spin",      # Spin 按鈕
-            ".balance-bg.hand_balance", # 餘額顯示
-            ".h-balance.hand_balance",  # 特殊機台餘額顯示
-        ]
-        
-        for indicator in game_indicators:
-            try:
-                elements = await page.query_selector_all(indicator)
-                for elem in elements:
-                    if await elem.is_visible():
-                        return True
-            except Exception:
-                continue
+        # 大廳元素與所有遊戲指標在頁面內一次判斷（單一 CDP 往返）
+        state = await page.evaluate(_PAGE_STATE_JS, list(GAME_INDICATORS))
+        _remember_state(page, state)
+        if state == "lobby":
+            logging.info("檢測到大廳元素，當前在大廳")
+            return False
+        if state == "game":
+            return True
         
         # 如果都找不到，預設認為不在遊戲中
         logging.debug("無法確定頁面狀態，預設認為不在遊戲中")
@@ -52,6 +198,48 @@ async def is_in_game(page: Page) -> bool:
         return False
 
 
+async def probe_balance_and_in_game(page: Page, is_special: bool) -> Tuple[Optional[int], bool]:
+    """
+    以單一 evaluate 同時取得餘額與是否在遊戲中，回傳 (餘額, 是否在遊戲中)
+    - 餘額規則同 parse_balance；無法取得時為 None
+    - 發生錯誤時回傳 (None, False)
+    """
+    if not page:
+        return None, False
+    try:
+        probe = await page.evaluate(_PRESPIN_PROBE_JS, {
+            "balanceSel": SPECIAL_BALANCE_SELECTOR if is_special else BALANCE_SELECTOR,
+            "indicators": list(GAME_INDICATORS),
+        })
+        digits = probe.get("digits")
+        in_game = bool(probe.get("inGame"))
+        if in_game:
+            _remember_state(page, "game")
+        return (int(digits) if digits else None), in_game
+    except Exception as e:
+        logging.warning(f"檢查餘額與遊戲狀態時發生錯誤: {e}")
+        return None, False
+
+
+# 依序比對大廳卡片的 title，點擊第一張包含遊戲代碼的卡片（點擊失敗則嘗試下一張）
+# 回傳 {count: 卡片數, title: 點擊的卡片 title 或 null}
+_CLICK_GAME_CARD_JS = """
+(code) => {
+    const items = document.querySelectorAll('#grid_gm_item');
+    for (const item of items) {
+        const title = item.getAttribute('title');
+        if (!title || !title.includes(code)) continue;
+        try {
+            item.scrollIntoView({block: 'center'});
+            item.click();
+            return {count: items.length, title};
+        } catch (e) {}
+    }
+    return {count: items.length, title: null};
+}
+"""
+
+
 async def scroll_and_click_game(
     page: Page,
     game_title_code: str,
@@ -65,77 +253,63 @@ async def scroll_and_click_game(
         return False
         
     try:
-        # 先檢查是否已在遊戲中
-        if await is_in_game(page):
+        # 同時等待大廳元素或遊戲指標，先出現者決定流程
+        state = await wait_for_page_state(page, timeout=10)
+        if state == "game":
             logging.info("✅ 已在遊戲內，跳過大廳找卡片流程")
             return True
-        
-        # 嘗試等待大廳元素出現
-        try:
-            items = await wait_for_all_selectors(page, "#grid_gm_item", timeout=10)
-        except PWTimeoutError:
+        if state != "lobby":
             logging.warning(f"⚠️ 等待大廳元素 'grid_gm_item' 超時（10秒），可能不在大廳頁面或頁面未載入完成")
-            # 嘗試檢查當前頁面狀態
+            # 記錄當前頁面狀態（遊戲指標也沒有出現，不必再檢查是否在遊戲中）
             try:
                 current_url = page.url
                 page_title = await page.title()
                 logging.info(f"當前 URL: {current_url[:100]}...")
                 logging.info(f"當前標題: {page_title}")
-                # 檢查是否在遊戲中（可能已經在遊戲內，只是找不到大廳元素）
-                if await is_in_game(page):
-                    logging.info("✅ 檢測到已在遊戲內（雖然找不到大廳元素），返回成功")
-                    return True
             except Exception:
                 pass
             return False
         
-        if not items or len(items) == 0:
+        # 所有卡片的 title 比對、捲動與點擊在頁面內一次完成
+        invalidate_page_state(page)
+        found = await page.evaluate(_CLICK_GAME_CARD_JS, game_title_code)
+        if not found["count"]:
             logging.warning(f"⚠️ 大廳中沒有找到任何遊戲卡片（grid_gm_item 為空）")
             return False
-            
-        for item in items:
-            title = await item.get_attribute("title")
-            if title and game_title_code in title:
+
+        title = found["title"]
+        if title is not None:
+            logging.info(f"點擊遊戲卡片: {title}")
+            await _wait_or_sleep(page, _CARD_OPENED_SELECTOR, timeout=3, fallback=0.3, state="visible")
+
+            # 注意：Join 按鈕可能不會每次出現，這是正常的
+            try:
+                # Locator 只解析第一個符合的節點，不必取回所有 Join 元素
+                join_btn = page.locator(_JOIN_BUTTON_XPATH).first
+                await join_btn.wait_for(state="attached", timeout=3000)  # 縮短超時時間，快速判斷是否存在
                 try:
-                    await item.scroll_into_view_if_needed()
                     # 使用 JavaScript 強制點擊
-                    await page.evaluate("(el) => el.click()", item)
-                    logging.info(f"點擊遊戲卡片: {title}")
-                    await asyncio.sleep(1.2)
-                except Exception:
-                    continue
-
-                # Join 按鈕不一定是卡片內部 DOM；改抓全局 gm-info-box
-                # 注意：Join 按鈕可能不會每次出現，這是正常的
-                try:
-                    join_btns = await wait_for_all_selectors(
-                        page,
-                        "//div[contains(@class, 'gm-info-box')]//span[normalize-space(text())='Join']",
-                        timeout=3,  # 縮短超時時間，快速判斷是否存在
-                    )
-                    for btn in join_btns:
-                        try:
-                            # 使用 JavaScript 強制點擊
-                            await page.evaluate("(el) => el.click()", btn)
-                            logging.info("點擊 Join 進入遊戲")
-                            await asyncio.sleep(3.0)
-                            break
-                        except Exception as e:
-                            # 處理 stale element reference 或其他錯誤，直接跳過
-                            logging.debug(f"點擊 Join 時發生錯誤（已跳過）: {e}")
-                except PWTimeoutError:
-                    # Join 按鈕不存在是正常的，直接跳過
-                    logging.info("Join 按鈕未出現（這是正常的），跳過 Join 步驟")
+                    invalidate_page_state(page)
+                    await join_btn.evaluate("(el) => el.click()", timeout=1000)
+                    logging.info("點擊 Join 進入遊戲")
+                    if not await wait_until_in_game(page, timeout=5):
+                        await asyncio.sleep(0.5)
                 except Exception as e:
-                    # 其他錯誤也直接跳過，不重試
-                    logging.info(f"Join 按鈕查找失敗（已跳過）: {e}")
-                
-                # 不再在這裡執行 keyword_actions
-                # keyword_actions 將在 entry 測試完成後執行
-                
-                # 無論 Join 是否成功，都返回 True 讓流程繼續
-                return True
-                    
+                    # 處理 stale element reference 或其他錯誤，直接跳過
+                    logging.debug(f"點擊 Join 時發生錯誤（已跳過）: {e}")
+            except PWTimeoutError:
+                # Join 按鈕不存在是正常的，直接跳過
+                logging.info("Join 按鈕未出現（這是正常的），跳過 Join 步驟")
+            except Exception as e:
+                # 其他錯誤也直接跳過，不重試
+                logging.info(f"Join 按鈕查找失敗（已跳過）: {e}")
+            
+            # 不再在這裡執行 keyword_actions
+            # keyword_actions 將在 entry 測試完成後執行
+            
+            # 無論 Join 是否成功，都返回 True 讓流程繼續
+            return True
+
         logging.warning(f"大廳找不到遊戲: {game_title_code}")
     except Exception as e:
         logging.error(f"scroll_and_click_game 失敗: {e}")
@@ -143,159 +317,293 @@ async def scroll_and_click_game(
     return False
 
 
+# Cashout 按鈕：優先使用 handle-main 底層的選擇器（避免被 select-main 遮罩層阻擋）
+# 各選擇器彼此不重疊（.btn_cashout 已涵蓋 .my-button.btn_cashout 等組合寫法）
+CASHOUT_HANDLE_MAIN_SELECTORS = (
+    ".handle-main .btn_cashout",
+    ".handle-main div[class*='btn_cashout']",
+    ".handle-main button[class*='cashout']",
+)
+# handle-main 選擇器都找不到時的備用選擇器（// 開頭為 XPath）
+CASHOUT_BACKUP_SELECTORS = (
+    ".btn_cashout",
+    "div[class*='btn_cashout']",
+    "button[class*='cash']",
+    "//button[contains(text(), 'Cash')]",
+)
+
+# 各 Cashout 選擇器歷次命中的次數（由 load_cashout_selector_hits 載入，程序結束時寫回同一個檔案）
+CASHOUT_SELECTOR_HITS_FILE = ".cashout_selector_hits.json"
+_selector_hits: Counter = Counter()
+_selector_hits_path: Optional[Path] = None
+_selector_hits_dirty = False
+
+
+def _by_hit_rate(selectors: Iterable[str]) -> Tuple[str, ...]:
+    """依歷次命中次數由多到少排序（次數相同時保持原順序）"""
+    return tuple(sorted(selectors, key=lambda sel: -_selector_hits[sel]))
+
+
+def load_cashout_selector_hits(base_dir: Path) -> None:
+    """
+    讀取 base_dir 下保存的 Cashout 選擇器命中次數並依此重新排序選擇器，程序結束時寫回
+    （base_dir 由呼叫端傳入，打包成 .exe 時應為可執行檔所在資料夾）
+    """
+    global _selector_hits_path, CASHOUT_HANDLE_MAIN_SELECTORS, CASHOUT_BACKUP_SELECTORS
+    path = base_dir / CASHOUT_SELECTOR_HITS_FILE
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            _selector_hits.update({k: int(v) for k, v in json.load(f).items()})
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, TypeError, AttributeError) as e:
+        logging.warning(f"讀取 Cashout 選擇器命中次數失敗，使用預設順序: {e}")
+    CASHOUT_HANDLE_MAIN_SELECTORS = _by_hit_rate(CASHOUT_HANDLE_MAIN_SELECTORS)
+    CASHOUT_BACKUP_SELECTORS = _by_hit_rate(CASHOUT_BACKUP_SELECTORS)
+    if _selector_hits_path is None:
+        atexit.register(_save_selector_hits)
+    _selector_hits_path = path
+
+
+def _save_selector_hits() -> None:
+    """保存命中次數（本次執行沒有命中時不寫檔）；先寫暫存檔再以 os.replace 原子替換"""
+    if not _selector_hits_dirty or _selector_hits_path is None:
+        return
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=_selector_hits_path.parent,
+            prefix=_selector_hits_path.name, suffix=".tmp", delete=False,
+        ) as f:
+            tmp_path = f.name
+            json.dump(dict(_selector_hits), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, _selector_hits_path)
+    except OSError as e:
+        logging.debug(f"保存 Cashout 選擇器命中次數失敗: {e}")
+        if tmp_path:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+# 在頁面內依序檢查各組 [選擇器列表, 是否須位於 .handle-main 內]，
+# 回傳第一個可見、可用、有尺寸的元素所在的 {sel, idx}；都找不到時回傳 null
+_FIND_CASHOUT_JS = """
+(groups) => {
+    const query = (sel) => {
+        if (!sel.startsWith('//')) return Array.from(document.querySelectorAll(sel));
+        const snap = document.evaluate(sel, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        const out = [];
+        for (let i = 0; i < snap.snapshotLength; i++) out.push(snap.snapshotItem(i));
+        return out;
+    };
+    const usable = (el) => {
+        const r = el.getBoundingClientRect();
+        return r.width > 0 && r.height > 0
+            && getComputedStyle(el).visibility !== 'hidden'
+            && el.disabled !== true;
+    };
+    for (const [selectors, needHandleMain] of groups) {
+        for (const sel of selectors) {
+            let els;
+            try { els = query(sel); } catch (e) { continue; }
+            const idx = els.findIndex((el) => usable(el) && (!needHandleMain || el.closest('.handle-main')));
+            if (idx >= 0) return {sel, idx};
+        }
+    }
+    return null;
+}
+"""
+
+# 每個頁面上次成功的 Cashout 選擇器，下次優先嘗試（頁面關閉後自動釋放）
+_CASHOUT_SELECTOR_CACHE: "WeakKeyDictionary[Page, str]" = WeakKeyDictionary()
+
+
+def _cashout_selector_groups(cached: Optional[str]) -> List[Tuple[List[str], bool]]:
+    """組出傳給 _FIND_CASHOUT_JS 的選擇器分組，上次成功的選擇器單獨一組排在最前面"""
+    groups = [
+        (list(CASHOUT_HANDLE_MAIN_SELECTORS), True),
+        (list(CASHOUT_BACKUP_SELECTORS), False),
+    ]
+    for selectors, need_handle_main in groups:
+        if cached in selectors:
+            selectors.remove(cached)
+            groups.insert(0, ([cached], need_handle_main))
+            break
+    return groups
+
+
+def _record_selector_hit(selector: str) -> None:
+    global _selector_hits_dirty
+    _selector_hits[selector] += 1
+    _selector_hits_dirty = True
+
+
 async def find_cashout_button(page: Page):
     """
     尋找 Cashout 按鈕，直接定位到 handle-main 底層的按鈕
     避免被 select-main 遮罩層阻擋
+    - 所有選擇器的可見 / 可用 / 尺寸檢查在頁面內一次完成，找到後才取回該元素
+    - 記住此頁面上次成功的選擇器並優先嘗試；找不到或發生錯誤時清除
     """
     if not page:
         return None
-        
-    # 優先使用 handle-main 底層的選擇器
-    handle_main_selectors = [
-        ".handle-main .my-button.btn_cashout",
-        ".handle-main .my-button--normal.btn_cashout",
-        ".handle-main .my-button.my-button--normal.btn_cashout",
-        ".handle-main .btn_cashout",
-        ".handle-main div[class*='btn_cashout']",
-        ".handle-main button[class*='cashout']",
-    ]
-    
-    # 嘗試 handle-main 底層的選擇器
-    for selector in handle_main_selectors:
-        try:
-            logging.debug(f"🔍 嘗試 handle-main 選擇器: {selector}")
-            elements = await page.query_selector_all(selector)
-            
-            for elem in elements:
-                try:
-                    is_displayed = await elem.is_visible()
-                    is_enabled = await elem.is_enabled()
-                    box = await elem.bounding_box()
-                    has_size = box and box['width'] > 0 and box['height'] > 0
-                    
-                    # 檢查元素是否在 handle-main 內
-                    in_handle_main = await page.evaluate(
-                        "el => !!el.closest('.handle-main')", elem
-                    )
-                    
-                    logging.debug(f"🔍 handle-main 元素狀態: displayed={is_displayed}, enabled={is_enabled}, has_size={has_size}, in_handle_main={in_handle_main}")
-                    
-                    if is_displayed and is_enabled and has_size and in_handle_main:
-                        logging.info(f"✅ 找到 handle-main 底層 Cashout 按鈕，使用選擇器: {selector}")
-                        return elem
-                except Exception as e:
-                    logging.debug(f"檢查 handle-main 元素狀態時發生錯誤: {e}")
-                    continue
-        except Exception as e:
-            logging.debug(f"handle-main 選擇器 {selector} 失敗: {e}")
-            continue
-    
-    # 如果 handle-main 選擇器都失敗，嘗試其他備用選擇器
-    logging.info("⚠️ handle-main 選擇器都失敗，嘗試備用選擇器...")
     
-    backup_selectors = [
-        ".my-button.btn_cashout",
-        ".btn_cashout",
-        ".my-button--normal.btn_cashout",
-        "div.my-button.btn_cashout",
-        "div[class*='btn_cashout']",
-        ".my-button.my-button--normal.btn_cashout",
-        "button[class*='cashout']",
-        "button[class*='cash']",
-        "//div[contains(@class, 'btn_cashout')]",
-        "//div[contains(@class, 'my-button') and contains(@class, 'btn_cashout')]",
-        "//button[contains(@class, 'cashout')]",
-        "//button[contains(text(), 'Cashout')]",
-        "//button[contains(text(), 'Cash')]",
-    ]
-    
-    for selector in backup_selectors:
-        try:
-            if selector.startswith("//"):
-                elements = await page.query_selector_all(selector)
-            else:
-                elements = await page.query_selector_all(selector)
-            
-            for elem in elements:
-                try:
-                    is_displayed = await elem.is_visible()
-                    is_enabled = await elem.is_enabled()
-                    box = await elem.bounding_box()
-                    has_size = box and box['width'] > 0 and box['height'] > 0
-                    
-                    if is_displayed and is_enabled and has_size:
-                        logging.info(f"✅ 找到 Cashout 按鈕，使用選擇器: {selector}")
-                        return elem
-                except Exception as e:
-                    logging.debug(f"檢查元素狀態時發生錯誤: {e}")
-                    continue
-        except Exception as e:
-            logging.debug(f"選擇器 {selector} 失敗: {e}")
-            continue
+    cached = _CASHOUT_SELECTOR_CACHE.get(page)
+    try:
+        found = await page.evaluate(_FIND_CASHOUT_JS, _cashout_selector_groups(cached))
+        if found:
+            selector = found["sel"]
+            # 只取回命中的那一個元素（Locator 會自動辨識 // 開頭的 XPath）
+            element = await page.locator(selector).nth(found["idx"]).element_handle(timeout=1000)
+            if element:
+                if selector in CASHOUT_HANDLE_MAIN_SELECTORS:
+                    logging.info(f"✅ 找到 handle-main 底層 Cashout 按鈕，使用選擇器: {selector}")
+                else:
+                    logging.info(f"✅ 找到 Cashout 按鈕，使用選擇器: {selector}")
+                _CASHOUT_SELECTOR_CACHE[page] = selector
+                _record_selector_hit(selector)
+                return element
+    except Exception as e:
+        logging.debug(f"尋找 Cashout 按鈕時發生錯誤: {e}")
     
+    _CASHOUT_SELECTOR_CACHE.pop(page, None)
     logging.warning("⚠️ 所有 Cashout 按鈕選擇器都失敗")
     return None
 
 
-async def low_balance_exit_and_reenter(
-    page: Page,
-    bal: int,
-    game_title_code: Optional[str],
-    keyword_actions: Dict[str, List[str]]
-):
-    """標準退出流程"""
-    logging.warning(f"BAL 過低（{bal}），執行退出流程")
+# 在頁面內一次完成 Cashout → Exit → Confirm 點擊序列
+# - 點擊 Cashout 後以 MutationObserver 等待 Exit 或 Confirm 出現（最多 dialogTimeoutMs）
+# - 有 Exit 就點擊，接著等待 Confirm 出現（最多 confirmTimeoutMs）後點擊
+# 回傳 {exit: 是否點擊 Exit, confirm: 是否點擊 Confirm}
+_EXIT_SEQUENCE_JS = """
+async ({cashout, exitSel, confirmXPath, dialogTimeoutMs, confirmTimeoutMs}) => {
+    const findExit = () => document.querySelector(exitSel);
+    const findConfirm = () => document.evaluate(
+        confirmXPath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+    ).singleNodeValue;
+    const waitFor = (find, timeoutMs) => new Promise((resolve) => {
+        const hit = find();
+        if (hit) return resolve(hit);
+        let timer;
+        const obs = new MutationObserver(() => {
+            const el = find();
+            if (el) { obs.disconnect(); clearTimeout(timer); resolve(el); }
+        });
+        timer = setTimeout(() => { obs.disconnect(); resolve(null); }, timeoutMs);
+        obs.observe(document.body, {childList: true, subtree: true, attributes: true});
+    });
+    cashout.click();
+    await waitFor(() => findExit() || findConfirm(), dialogTimeoutMs);
+    const exitBtn = findExit();
+    if (exitBtn) exitBtn.click();
+    const confirmBtn = await waitFor(findConfirm, confirmTimeoutMs);
+    if (confirmBtn) confirmBtn.click();
+    return {exit: !!exitBtn, confirm: !!confirmBtn};
+}
+"""
+
+
+async def _click_exit_sequence(page: Page, quit_btn, tag: str, timeout: float) -> bool:
+    """點擊 Cashout 後依序點擊 Exit / Confirm（單一 evaluate），回傳是否點擊了 Confirm"""
+    invalidate_page_state(page)
+    result = await page.evaluate(_EXIT_SEQUENCE_JS, {
+        "cashout": quit_btn,
+        "exitSel": EXIT_BUTTON_SELECTOR,
+        "confirmXPath": CONFIRM_BUTTON_XPATH,
+        "dialogTimeoutMs": int(timeout * 1000),
+        "confirmTimeoutMs": int(timeout * 1000),
+    })
+    if result["exit"]:
+        logging.info(f"[{tag}] 已點擊 Exit / Exit To Lobby")
+    else:
+        logging.info(f"[{tag}] 找不到 Exit，直接嘗試 Confirm")
+    if not result["confirm"]:
+        logging.warning(f"[{tag}] 找不到 Confirm 按鈕")
+    return result["confirm"]
+
+
+@dataclass(frozen=True)
+class ExitTimings:
+    """退出 / 重新進入流程的等待上限（秒）；各步驟都是條件成立即返回"""
+    dialog_timeout: float       # 點擊 Cashout 後等待 Exit / Confirm 出現
+    lobby_timeout: float        # 點擊 Confirm 後等待回到大廳
+    lobby_retry_timeout: float  # 仍在遊戲中時再等待大廳
+    reenter_timeout: float      # 重新進入後等待遊戲指標出現
+
+
+STANDARD_EXIT = ExitTimings(dialog_timeout=2, lobby_timeout=LOBBY_RETURN_TIMEOUT,
+                            lobby_retry_timeout=2, reenter_timeout=GAME_ENTER_TIMEOUT)
+# 超快頻率流程使用較短的等待上限
+FAST_EXIT = ExitTimings(dialog_timeout=1, lobby_timeout=3, lobby_retry_timeout=1, reenter_timeout=5)
+
+
+async def _exit_flow(page: Page, tag: str, timings: ExitTimings) -> Optional[bool]:
+    """
+    Cashout → Exit → Confirm 後驗證是否回到大廳
+    回傳是否回到大廳；找不到 Cashout 按鈕（無法執行退出）時回傳 None
+    """
     try:
         quit_btn = await find_cashout_button(page)
-        if quit_btn:
-            # 使用 JavaScript 強制點擊
-            await page.evaluate("(el) => el.click()", quit_btn)
-            await asyncio.sleep(1.0)
-        else:
-            logging.error("❌ 找不到 Cashout 按鈕，無法執行退出流程")
-            return False
+        if not quit_btn:
+            logging.error(f"[{tag}] ❌ 找不到 Cashout 按鈕，無法執行退出流程")
+            return None
 
-        try:
-            exit_btn = await wait_for_selector(page, ".function-btn .reserve-btn-gray", timeout=2)
-            if exit_btn:
-                # 使用 JavaScript 強制點擊
-                await page.evaluate("(el) => el.click()", exit_btn)
-                logging.info("[ExitFlow] 已點擊 Exit / Exit To Lobby")
-                await asyncio.sleep(1.0)
-        except PWTimeoutError:
-            logging.info("[ExitFlow] 找不到 Exit，直接嘗試 Confirm")
-
-        confirm_btn = await wait_for_selector(
-            page, "//button[.//div[normalize-space(text())='Confirm']]", timeout=2
-        )
-        if confirm_btn:
-            # 使用 JavaScript 強制點擊
-            await page.evaluate("(el) => el.click()", confirm_btn)
-            await asyncio.sleep(3.0)
-        
-        # ✅ 驗證是否成功回到大廳
-        if not await is_in_game(page):
-            logging.info("[ExitFlow] 已成功回到大廳")
-        else:
-            logging.warning("[ExitFlow] 退出後仍在遊戲中，可能需要額外等待")
-            await asyncio.sleep(2.0)
+        # Cashout → Exit → Confirm 在頁面內一次點完（使用 JavaScript 強制點擊）
+        in_lobby = False
+        if await _click_exit_sequence(page, quit_btn, tag, timings.dialog_timeout):
+            in_lobby = await wait_until_in_lobby(page, timings.lobby_timeout)
+
+        # 驗證是否成功回到大廳（等到大廳元素即已確認，不必再檢查）
+        if in_lobby or not await is_in_game(page):
+            logging.info(f"[{tag}] 已成功回到大廳")
+            return True
+
+        logging.warning(f"[{tag}] 退出後仍在遊戲中，再等待一下")
+        if await wait_until_in_lobby(page, timings.lobby_retry_timeout) or not await is_in_game(page):
+            logging.info(f"[{tag}] 延遲後成功回到大廳")
+            return True
+        logging.warning(f"[{tag}] 仍無法回到大廳")
+        return False
     except Exception as e:
-        logging.error(f"退出流程失敗: {e}")
+        logging.error(f"[{tag}] 退出流程失敗: {e}")
+        return False
+
+
+async def _exit_and_reenter(
+    page: Page,
+    tag: str,
+    game_title_code: Optional[str],
+    keyword_actions: Dict[str, List[str]],
+    timings: ExitTimings,
+):
+    """退出到大廳後重新進入同一台遊戲；找不到 Cashout 按鈕時回傳 False"""
+    if await _exit_flow(page, tag, timings) is None:
+        return False
 
     # ✅ 重新進入遊戲，並驗證是否成功進入
     if game_title_code:
-        logging.info(f"[ExitFlow] 準備重新進入遊戲: {game_title_code}")
+        logging.info(f"[{tag}] 準備重新進入遊戲: {game_title_code}")
         if await scroll_and_click_game(page, game_title_code, keyword_actions):
-            # 等待遊戲加載並驗證是否成功進入
-            await asyncio.sleep(3.0)
-            if await is_in_game(page):
-                logging.info("[ExitFlow] 成功重新進入遊戲")
+            # 等待遊戲加載並驗證是否成功進入（遊戲指標元素出現即返回）
+            if await wait_until_in_game(page, timings.reenter_timeout):
+                logging.info(f"[{tag}] 成功重新進入遊戲")
             else:
-                logging.warning("[ExitFlow] 重新進入遊戲後仍在大廳，可能需要額外等待")
-                await asyncio.sleep(2.0)
+                logging.warning(f"[{tag}] 重新進入遊戲後仍在大廳，可能需要額外等待")
+                await asyncio.sleep(0.5)
         else:
-            logging.warning("[ExitFlow] 重新進入遊戲失敗")
+            logging.warning(f"[{tag}] 重新進入遊戲失敗")
+
+
+async def low_balance_exit_and_reenter(
+    page: Page,
+    bal: int,
+    game_title_code: Optional[str],
+    keyword_actions: Dict[str, List[str]]
+):
+    """標準退出流程"""
+    logging.warning(f"BAL 過低（{bal}），執行退出流程")
+    return await _exit_and_reenter(page, "ExitFlow", game_title_code, keyword_actions, STANDARD_EXIT)
 
 
 async def exit_game_to_lobby(page: Page) -> bool:
@@ -307,56 +615,11 @@ async def exit_game_to_lobby(page: Page) -> bool:
     Returns:
         True 如果成功回到大廳，False 如果失敗
     """
-    try:
-        # 如果已在大廳，直接返回
-        if not await is_in_game(page):
-            logging.info("[ExitToLobby] 已在大廳中")
-            return True
-        
-        # 點擊 Cashout 按鈕
-        quit_btn = await find_cashout_button(page)
-        if quit_btn:
-            await page.evaluate("(el) => el.click()", quit_btn)
-            await asyncio.sleep(1.0)
-        else:
-            logging.error("[ExitToLobby] 找不到 Cashout 按鈕")
-            return False
-        
-        # 嘗試點擊 Exit
-        try:
-            exit_btn = await wait_for_selector(page, ".function-btn .reserve-btn-gray", timeout=2)
-            if exit_btn:
-                await page.evaluate("(el) => el.click()", exit_btn)
-                logging.info("[ExitToLobby] 已點擊 Exit / Exit To Lobby")
-                await asyncio.sleep(1.0)
-        except PWTimeoutError:
-            logging.info("[ExitToLobby] 找不到 Exit，直接嘗試 Confirm")
-        
-        # 嘗試點擊 Confirm
-        confirm_btn = await wait_for_selector(
-            page, "//button[.//div[normalize-space(text())='Confirm']]", timeout=2
-        )
-        if confirm_btn:
-            await page.evaluate("(el) => el.click()", confirm_btn)
-            await asyncio.sleep(3.0)
-        
-        # 驗證是否成功回到大廳
-        if not await is_in_game(page):
-            logging.info("[ExitToLobby] 已成功回到大廳")
-            return True
-        else:
-            logging.warning("[ExitToLobby] 退出後仍在遊戲中，再等待一下")
-            await asyncio.sleep(2.0)
-            result = not await is_in_game(page)
-            if result:
-                logging.info("[ExitToLobby] 延遲後成功回到大廳")
-            else:
-                logging.warning("[ExitToLobby] 仍無法回到大廳")
-            return result
-            
-    except Exception as e:
-        logging.error(f"[ExitToLobby] 退出流程失敗: {e}")
-        return False
+    # 如果已在大廳，直接返回
+    if not await is_in_game(page):
+        logging.info("[ExitToLobby] 已在大廳中")
+        return True
+    return bool(await _exit_flow(page, "ExitToLobby", STANDARD_EXIT))
 
 
 async def fast_low_balance_exit_and_reenter(
@@ -367,54 +630,4 @@ async def fast_low_balance_exit_and_reenter(
 ):
     """超快頻率的快速退出流程"""
     logging.warning(f"BAL 過低（{bal}），執行快速退出流程")
-    try:
-        quit_btn = await find_cashout_button(page)
-        if quit_btn:
-            # 使用 JavaScript 強制點擊
-            await page.evaluate("(el) => el.click()", quit_btn)
-            await asyncio.sleep(0.5)  # 減少等待時間
-        else:
-            logging.error("❌ 找不到 Cashout 按鈕，無法執行快速退出流程")
-            return False
-
-        try:
-            exit_btn = await wait_for_selector(page, ".function-btn .reserve-btn-gray", timeout=1)
-            if exit_btn:
-                # 使用 JavaScript 強制點擊
-                await page.evaluate("(el) => el.click()", exit_btn)
-                logging.info("[FastExitFlow] 已點擊 Exit / Exit To Lobby")
-                await asyncio.sleep(0.5)  # 減少等待時間
-        except PWTimeoutError:
-            logging.info("[FastExitFlow] 找不到 Exit，直接嘗試 Confirm")
-
-        confirm_btn = await wait_for_selector(
-            page, "//button[.//div[normalize-space(text())='Confirm']]", timeout=1
-        )
-        if confirm_btn:
-            # 使用 JavaScript 強制點擊
-            await page.evaluate("(el) => el.click()", confirm_btn)
-            await asyncio.sleep(1.5)  # 減少等待時間
-        
-        # ✅ 驗證是否成功回到大廳
-        if not await is_in_game(page):
-            logging.info("[FastExitFlow] 已成功回到大廳")
-        else:
-            logging.warning("[FastExitFlow] 退出後仍在遊戲中，可能需要額外等待")
-            await asyncio.sleep(1.0)
-    except Exception as e:
-        logging.error(f"快速退出流程失敗: {e}")
-
-    # ✅ 重新進入遊戲，並驗證是否成功進入
-    if game_title_code:
-        logging.info(f"[FastExitFlow] 準備重新進入遊戲: {game_title_code}")
-        if await scroll_and_click_game(page, game_title_code, keyword_actions):
-            # 等待遊戲加載並驗證是否成功進入
-            await asyncio.sleep(2.0)  # 快速流程使用較短等待時間
-            if await is_in_game(page):
-                logging.info("[FastExitFlow] 成功重新進入遊戲")
-            else:
-                logging.warning("[FastExitFlow] 重新進入遊戲後仍在大廳，可能需要額外等待")
-                await asyncio.sleep(1.0)
-        else:
-            logging.warning("[FastExitFlow] 重新進入遊戲失敗")
-
+    return await _exit_and_reenter(page, "FastExitFlow", game_title_code, keyword_actions, FAST_EXIT)
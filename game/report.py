@@ -0,0 +1,45 @@
+"""單台機器的測試報告"""
+from dataclasses import dataclass, field, fields
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Union
+
+
+class ButtonResult(NamedTuple):
+    """單一按鈕的測試結果（發送報告時轉為 dict，值為 None 的欄位省略）"""
+
+    button: str
+    status: str                               # success / failed / error
+    selector: Optional[str] = None
+    highlight_detected: Optional[bool] = None  # 未啟用高亮檢測時為 None
+    reason: Optional[str] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: v for k, v in zip(self._fields, self) if v is not None}
+
+
+@dataclass(slots=True)
+class TestReport:
+    """單台機器的測試結果（每台機器建立一份，發送報告時轉為 dict）"""
+
+    url: str
+    csv_data: str = "N/A"
+    machine_type: str = "unknown"
+    entry_status: str = "pending"
+    # 與 console 監聽器共用同一個 deque
+    console_errors: Union[Deque[Dict[str, Any]], List[Dict[str, Any]]] = field(default_factory=list)
+    video_status: str = "unknown"
+    video_message: str = ""
+    audio_status: Optional[str] = None
+    audio_result: Optional[Dict[str, Any]] = None
+    button_tests: List[ButtonResult] = field(default_factory=list)
+    bet_results: List[Dict[str, Any]] = field(default_factory=list)
+    image_comparisons: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """轉為 send_test_report 使用的 dict（console 錯誤取快照，發送期間監聽器仍可能寫入）"""
+        data = {f.name: getattr(self, f.name) for f in fields(self)}
+        data["console_errors"] = list(self.console_errors)
+        data["button_tests"] = [r.to_dict() for r in self.button_tests]
+        if self.audio_status is None:
+            del data["audio_status"], data["audio_result"]
+        return data
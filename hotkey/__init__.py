@@ -3,10 +3,12 @@ from .listener import (
     start_hotkey_listener,
     stop_event,
     pause_event,
+    wait_while,
 )
 
 __all__ = [
     "start_hotkey_listener",
     "stop_event",
     "pause_event",
+    "wait_while",
 ]
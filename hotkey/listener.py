@@ -1,16 +1,67 @@
 """熱鍵監聽 - Pause/Resume 和 Stop"""
+import asyncio
 import logging
 import threading
+from typing import Callable, List, Optional, Tuple
 from pynput import keyboard
 
+# 等待暫停/停止狀態變化的協程：(事件迴圈, asyncio.Event)
+_state_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+_state_waiters_lock = threading.Lock()
+
+
+def _notify_state_change():
+    """喚醒所有等待狀態變化的協程（可從任何執行緒呼叫）"""
+    with _state_waiters_lock:
+        waiters = list(_state_waiters)
+    for loop, event in waiters:
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            # 事件迴圈已關閉
+            pass
+
+
+class _NotifyingEvent(threading.Event):
+    """set/clear 時同時喚醒 asyncio 端等待者的 threading.Event"""
+
+    def set(self):
+        super().set()
+        _notify_state_change()
+
+    def clear(self):
+        super().clear()
+        _notify_state_change()
+
+
 # 全域停止旗標：Ctrl+C 或外部觸發可讓迴圈收斂退出
-stop_event = threading.Event()
-pause_event = threading.Event()   # 置位時代表「暫停」
+stop_event = _NotifyingEvent()
+pause_event = _NotifyingEvent()   # 置位時代表「暫停」
 
-# ---- 全域熱鍵監聽：Space 切換暫停/恢復；Esc 結束 ----
-pressed_keys = set()
+
+async def wait_while(condition: Callable[[], bool], poll_interval: Optional[float] = None):
+    """
+    在 condition() 為 True 期間等待，stop_event / pause_event 狀態變化時立即重新檢查，期間不佔用事件迴圈
+    - poll_interval：condition 依賴其他沒有事件通知的狀態時，定時重新檢查的間隔（秒）
+    """
+    event = asyncio.Event()
+    entry = (asyncio.get_running_loop(), event)
+    with _state_waiters_lock:
+        _state_waiters.append(entry)
+    try:
+        # 先登記再檢查，避免檢查與等待之間的狀態變化被漏掉
+        while condition():
+            try:
+                await asyncio.wait_for(event.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            event.clear()
+    finally:
+        with _state_waiters_lock:
+            _state_waiters.remove(entry)
 
 
+# ---- 全域熱鍵監聽：Ctrl+Space 切換暫停/恢復；Ctrl+Esc 結束 ----
 def _toggle_pause():
     if pause_event.is_set():
         pause_event.clear()
@@ -22,32 +73,32 @@ def _toggle_pause():
         print("⏸️  Paused")
 
 
-def _on_press(key):
-    try:
-        pressed_keys.add(key)
-        # 偵測 Ctrl + Space
-        if key == keyboard.Key.space and keyboard.Key.ctrl_l in pressed_keys:
-            _toggle_pause()
-        elif key == keyboard.Key.esc and keyboard.Key.ctrl_l in pressed_keys:
-            logging.info("[Hotkey] ESC 被按下，停止所有執行緒")
-            print("🛑 Stop requested (ESC)")
-            stop_event.set()
-    except Exception as e:
-        logging.warning(f"[Hotkey] 監聽例外：{e}")
-
-
-def _on_release(key):
-    try:
-        # 放開的時候從集合中移除
-        if key in pressed_keys:
-            pressed_keys.remove(key)
-    except Exception:
-        pass
+def _request_stop():
+    logging.info("[Hotkey] ESC 被按下，停止所有執行緒")
+    print("🛑 Stop requested (ESC)")
+    stop_event.set()
+
+
+def _safe(callback: Callable[[], None]) -> Callable[[], None]:
+    """熱鍵回呼的例外只記錄，不讓監聽執行緒中止"""
+    def wrapper():
+        try:
+            callback()
+        except Exception as e:
+            logging.warning(f"[Hotkey] 監聽例外：{e}")
+    return wrapper
+
+
+# 註冊的組合鍵（由 GlobalHotKeys 比對按鍵狀態，只有組合鍵成立時才呼叫回呼）
+_HOTKEYS = {
+    "<ctrl>+<space>": _safe(_toggle_pause),
+    "<ctrl>+<esc>": _safe(_request_stop),
+}
 
 
 def start_hotkey_listener():
     logging.info("[Hotkey] 啟動全域熱鍵監聽（Ctrl+Space=Pause/Resume, Ctrl+Esc=Stop）")
     print("🔧 Hotkeys: Ctrl+Space = Pause/Resume | Ctrl+Esc = Stop")
-    listener = keyboard.Listener(on_press=_on_press, on_release=_on_release)
+    listener = keyboard.GlobalHotKeys(_HOTKEYS)
     listener.daemon = True
     listener.start()
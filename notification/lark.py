@@ -1,6 +1,9 @@
 """Lark 通知客戶端"""
 import time
+import queue
 import logging
+import threading
+from itertools import islice
 import requests
 from typing import Optional, Dict, Any, List
 
@@ -11,8 +14,19 @@ except ImportError:
         return "unknown"
 
 
+# 報告中固定不變的部分（版本字串在程序內不會改變，只取一次）
+_REPORT_TITLE = f"📊 **測試報告** ({get_version_string()})"
+_BUTTON_TESTS_HEADER = ("", "🔘 **按鈕測試:**")
+_BET_RESULTS_HEADER = ("", "💰 **下注結果:**")
+_IMAGE_COMPARISONS_HEADER = ("", "🖼️ **圖片比對結果:**")
+
+
 class LarkClient:
-    """極簡 Lark 文本通知客戶端，內建重試機制與明確日誌"""
+    """
+    極簡 Lark 文本通知客戶端，內建重試機制與明確日誌
+    - send_text / send_test_report：同步發送，回傳是否成功
+    - enqueue / enqueue_test_report：放入佇列由背景執行緒依序發送，立即返回；flush 等待佇列清空
+    """
 
     def __init__(self, webhook: Optional[str]):
         self.webhook = (webhook or "").strip()
@@ -21,6 +35,17 @@ class LarkClient:
             logging.warning("[Lark] LARK_WEBHOOK_URL 未設定，推播停用")
         else:
             logging.info(f"[Lark] Webhook 已載入（長度={len(self.webhook)}）")
+        # 共用 HTTP 連線（keep-alive），第一次發送時建立
+        self._session: Optional[requests.Session] = None
+        # 背景發送佇列與執行緒（第一次 enqueue 時啟動）
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+    def _get_session(self) -> requests.Session:
+        if self._session is None:
+            self._session = requests.Session()
+        return self._session
 
     def send_text(self, text: str, retries: int = 2, timeout: float = 6.0):
         """發送文本訊息；未設定 webhook 則略過並記錄"""
@@ -32,7 +57,7 @@ class LarkClient:
         last_err = None
         for i in range(retries + 1):
             try:
-                r = requests.post(self.webhook, json=payload, timeout=timeout)
+                r = self._get_session().post(self.webhook, json=payload, timeout=timeout)
                 if r.status_code >= 200 and r.status_code < 300:
                     logging.info("[Lark] 推播成功")
                     return True
@@ -46,6 +71,32 @@ class LarkClient:
         logging.error("[Lark] 最終失敗：%s", last_err)
         return False
 
+    def enqueue(self, text: str) -> None:
+        """將文本訊息放入背景佇列後立即返回（重試與退避都在背景執行緒進行）"""
+        if not self.enabled:
+            logging.debug("[Lark] 已停用，略過訊息：%s", text[:60])
+            return
+        self._queue.put(text)
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._drain, name="lark-sender", daemon=True)
+                self._worker.start()
+
+    def _drain(self) -> None:
+        """背景執行緒：依序發送佇列中的訊息"""
+        while True:
+            text = self._queue.get()
+            try:
+                self.send_text(text)
+            except Exception as e:
+                logging.error("[Lark] 背景發送失敗：%s", e)
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """等待背景佇列中的訊息全部發送完成（阻塞，async 呼叫端應放到執行緒中執行）"""
+        self._queue.join()
+
     def send_test_report(self, report_data: Dict[str, Any]) -> bool:
         """
         發送結構化測試報告到Lark（可轉為Excel格式）
@@ -64,90 +115,99 @@ class LarkClient:
         """
         if not self.enabled:
             return False
-        
+        return self.send_text(self.format_test_report(report_data))
+
+    def enqueue_test_report(self, report_data: Dict[str, Any]) -> None:
+        """格式化測試報告後放入背景佇列發送，立即返回"""
+        if not self.enabled:
+            return
+        self.enqueue(self.format_test_report(report_data))
+
+    @staticmethod
+    def format_test_report(report_data: Dict[str, Any]) -> str:
+        """將 report_data 格式化為 Lark 文本（格式見 send_test_report）"""
+        get = report_data.get
         # 構建報告文本
         lines = [
-            f"📊 **測試報告** ({get_version_string()})",
+            _REPORT_TITLE,
             "",
-            f"**URL:** {report_data.get('url', 'N/A')}",
-            f"**CSV資料:** {report_data.get('csv_data', 'N/A')}",
+            f"**URL:** {get('url', 'N/A')}",
+            f"**CSV資料:** {get('csv_data', 'N/A')}",
             "",
             "---",
-            ""
+            "",
         ]
         
         # 進入狀態
-        entry_status = report_data.get('entry_status', 'unknown')
-        status_emoji = "✅" if entry_status == "success" else "❌"
-        lines.append(f"{status_emoji} **進入機器:** {entry_status}")
+        entry_status = get('entry_status', 'unknown')
+        lines.append(f"{_ok(entry_status == 'success')} **進入機器:** {entry_status}")
         
         # Console錯誤
-        console_errors = report_data.get('console_errors', [])
+        console_errors = get('console_errors', [])
         if console_errors:
             error_count = len(console_errors)
-            lines.append(f"")
-            lines.append(f"⚠️ **Console錯誤:** {error_count} 個")
-            # 只顯示前5個錯誤
-            for i, error in enumerate(console_errors[:5], 1):
-                error_text = error.get('text', str(error))[:100]  # 限制長度
-                error_type = error.get('type', 'unknown')
-                lines.append(f"  {i}. [{error_type}] {error_text}")
+            lines += ("", f"⚠️ **Console錯誤:** {error_count} 個")
+            # 只顯示前5個錯誤（限制長度）
+            lines.extend(
+                f"  {i}. [{error.get('type', 'unknown')}] {error.get('text', str(error))[:100]}"
+                for i, error in enumerate(islice(console_errors, 5), 1)
+            )
             if error_count > 5:
                 lines.append(f"  ... 還有 {error_count - 5} 個錯誤")
         else:
-            lines.append(f"✅ **Console錯誤:** 無")
+            lines.append("✅ **Console錯誤:** 無")
         
         # 視頻狀態
-        video_status = report_data.get('video_status', 'unknown')
-        video_message = report_data.get('video_message', '')
+        video_status = get('video_status', 'unknown')
         if video_status == "normal":
-            lines.append(f"✅ **視頻顯示:** 正常")
+            lines.append("✅ **視頻顯示:** 正常")
         else:
             lines.append(f"❌ **視頻顯示:** {video_status}")
+            video_message = get('video_message', '')
             if video_message:
                 lines.append(f"   詳情: {video_message}")
         
         # 按鈕測試
-        button_tests = report_data.get('button_tests', [])
+        button_tests = get('button_tests', [])
         if button_tests:
-            lines.append(f"")
-            lines.append(f"🔘 **按鈕測試:**")
-            for test in button_tests:
-                button_name = test.get('button', 'Unknown')
-                status = test.get('status', 'unknown')
-                emoji = "✅" if status == "success" else "❌"
-                lines.append(f"  {emoji} {button_name}: {status}")
+            lines += _BUTTON_TESTS_HEADER
+            lines.extend(_format_button_test(test) for test in button_tests)
         else:
-            lines.append(f"⚠️ **按鈕測試:** 未執行")
+            lines.append("⚠️ **按鈕測試:** 未執行")
         
         # 下注結果
-        bet_results = report_data.get('bet_results', [])
+        bet_results = get('bet_results', [])
         if bet_results:
-            lines.append(f"")
-            lines.append(f"💰 **下注結果:**")
-            for result in bet_results:
-                success = result.get('success', False)
-                emoji = "✅" if success else "❌"
-                bet_amount = result.get('bet_amount', 'N/A')
-                lines.append(f"  {emoji} 下注: {bet_amount} - {'成功' if success else '失敗'}")
+            lines += _BET_RESULTS_HEADER
+            lines.extend(_format_bet_result(result) for result in bet_results)
         
         # 圖片比對結果
-        image_comparisons = report_data.get('image_comparisons', [])
+        image_comparisons = get('image_comparisons', [])
         if image_comparisons:
-            lines.append(f"")
-            lines.append(f"🖼️ **圖片比對結果:**")
-            for comp in image_comparisons:
-                stage = comp.get('stage', 'unknown')
-                match = comp.get('match', False)
-                emoji = "✅" if match else "❌"
-                result_info = comp.get('result', {})
-                if isinstance(result_info, dict):
-                    matched = result_info.get('matched_images', 0)
-                    total = result_info.get('total_images', 0)
-                    lines.append(f"  {emoji} {stage}: {matched}/{total} 匹配")
-                else:
-                    lines.append(f"  {emoji} {stage}: {'匹配' if match else '不匹配'}")
+            lines += _IMAGE_COMPARISONS_HEADER
+            lines.extend(_format_image_comparison(comp) for comp in image_comparisons)
         
-        report_text = "\n".join(lines)
-        return self.send_text(report_text)
+        return "\n".join(lines)
+
+
+def _ok(passed: bool) -> str:
+    return "✅" if passed else "❌"
+
+
+def _format_button_test(test: Dict[str, Any]) -> str:
+    status = test.get('status', 'unknown')
+    return f"  {_ok(status == 'success')} {test.get('button', 'Unknown')}: {status}"
+
+
+def _format_bet_result(result: Dict[str, Any]) -> str:
+    success = result.get('success', False)
+    return f"  {_ok(success)} 下注: {result.get('bet_amount', 'N/A')} - {'成功' if success else '失敗'}"
+
 
+def _format_image_comparison(comp: Dict[str, Any]) -> str:
+    match = comp.get('match', False)
+    prefix = f"  {_ok(match)} {comp.get('stage', 'unknown')}: "
+    result_info = comp.get('result', {})
+    if isinstance(result_info, dict):
+        return f"{prefix}{result_info.get('matched_images', 0)}/{result_info.get('total_images', 0)} 匹配"
+    return f"{prefix}{'匹配' if match else '不匹配'}"
@@ -1,9 +1,24 @@
-"""QA 品質檢測模組 - 圖片比對、影片檢測、音頻檢測、測試管理"""
-from .test_manager import TestTaskManager
-from .video_detector import VideoDetector
-from .test_service import TestServiceClient
-from .image_comparator import ImageComparator
-from .audio_detector import AudioDetector
+"""QA 品質檢測模組 - 圖片比對、影片檢測、音頻檢測、測試管理
+
+子模組在第一次存取時才導入（圖片比對、影片檢測依賴 OpenCV / numpy 等較重的套件）。
+"""
+from importlib import import_module
+
+# 公開名稱 → 所在子模組
+_EXPORTS = {
+    "TestTaskManager": ".test_manager",
+    "VideoDetector": ".video_detector",
+    "TestServiceClient": ".test_service",
+    "ImageComparator": ".image_comparator",
+    "AudioDetector": ".audio_detector",
+}
 
 __all__ = ["TestTaskManager", "VideoDetector", "TestServiceClient", "ImageComparator", "AudioDetector"]
 
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(import_module(_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -14,6 +14,7 @@
 3. 定期從 Python 端讀取分析結果
 """
 import asyncio
+import heapq
 import json
 import logging
 import math
@@ -123,6 +124,7 @@ AUDIO_MONITOR_SCRIPT = """
     const dataMain = new Float32Array(bufLen);
     const dataL = new Float32Array(bufLen);
     const dataR = new Float32Array(bufLen);
+    const freqData = new Float32Array(bufLen);
 
     const sampleFn = () => {
       if (ctx.state !== 'running') return;
@@ -157,8 +159,7 @@ AUDIO_MONITOR_SCRIPT = """
       const denominator = Math.sqrt(sumSqL * sumSqR);
       const correlation = denominator > 0 ? sumLR / denominator : 0;
 
-      // 頻譜數據
-      const freqData = new Float32Array(bufLen);
+      // 頻譜數據（重複使用同一個緩衝區）
       analyserMain.getFloatFrequencyData(freqData);
 
       mon.samples.push({
@@ -174,7 +175,7 @@ AUDIO_MONITOR_SCRIPT = """
         channelCount: ctx.destination.channelCount,
         state: ctx.state,
         // 取前 64 個頻率 bin 做頻譜摘要
-        freqSummary: Array.from(freqData.slice(0, 64))
+        freqSummary: Array.from(freqData.subarray(0, 64))
       });
 
       // 最多保留 200 筆
@@ -469,7 +470,7 @@ class AudioDetector:
         # ─── 底噪分析 ───
         noise_floor = config.get("noise_floor_db", -55)
         if rms_dbs:
-            quietest = sorted(rms_dbs)[:max(1, len(rms_dbs) // 5)]
+            quietest = heapq.nsmallest(max(1, len(rms_dbs) // 5), rms_dbs)
             result.noise_floor_db = sum(quietest) / len(quietest)
 
         logging.info(
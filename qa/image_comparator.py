@@ -4,13 +4,18 @@
 與 tools/image_comparison_visualizer.py 保持一致。
 """
 import io
+import hashlib
 import logging
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
-from typing import Tuple, Optional, Dict, Any, List
+from typing import Tuple, Optional, Dict, Any, List, NamedTuple
 import numpy as np
 from PIL import Image
 from playwright.async_api import Page
 
+from core.utils import file_md5
+
 # 嘗試導入 OpenCV 和 scikit-image
 try:
     import cv2
@@ -22,6 +27,46 @@ except ImportError:
     logging.warning("[ImageComparator] 安裝: pip install opencv-python scikit-image")
 
 
+# 相似度結果快取：(參考圖 MD5, 截圖 MD5, 裁剪區域) → (相似度, 詳細信息)，超過上限時淘汰最舊的
+_SIMILARITY_CACHE: "OrderedDict[Tuple[str, str, Any], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_SIMILARITY_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=256)
+def _reference_md5_cached(path_str: str, mtime_ns: int, size: int) -> str:
+    """參考圖片 MD5（依路徑、修改時間與大小快取，檔案更新後自動重新計算）"""
+    return file_md5(Path(path_str))
+
+
+def _reference_md5(path: Path) -> str:
+    st = path.stat()
+    return _reference_md5_cached(str(path), st.st_mtime_ns, st.st_size)
+
+
+@lru_cache(maxsize=64)
+def _reference_array_cached(path_str: str, mtime_ns: int, size: int) -> np.ndarray:
+    """參考圖片解碼後的數組（依路徑、修改時間與大小快取；唯讀，避免被呼叫端修改）"""
+    with Image.open(path_str) as img:
+        arr = np.array(img)
+    arr.setflags(write=False)
+    return arr
+
+
+def _reference_array(path: Path) -> np.ndarray:
+    st = path.stat()
+    return _reference_array_cached(str(path), st.st_mtime_ns, st.st_size)
+
+
+class StageCapture(NamedTuple):
+    """階段比對所需的截圖與參考圖片（截圖後即可離開頁面，在背景完成比對）"""
+    stage_name: str
+    ref_images: List[Path]
+    screenshot: Optional[bytes]
+    error: str                           # 截圖失敗原因（screenshot 為 None 時）
+    config: Dict[str, Any]
+    skipped: Optional[Dict[str, Any]]    # 不需比對時的結果（沒有參考圖片等）
+
+
 class ImageComparator:
     """圖片比對器 - 使用 OpenCV SSIM + 直方圖的綜合比對方法"""
     
@@ -143,6 +188,81 @@ class ImageComparator:
             logging.error(f"[ImageComparator] 計算相似度時發生錯誤: {e}")
             return 0.0, info
     
+    @staticmethod
+    def to_rgb_array(image: Any) -> np.ndarray:
+        """將 PNG bytes 或 Pillow Image 轉為 (H, W, 3) uint8 RGB 數組"""
+        if isinstance(image, (bytes, bytearray)):
+            if OPENCV_AVAILABLE:
+                bgr = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+                return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+            image = Image.open(io.BytesIO(image))
+        return np.asarray(image.convert("RGB"))
+    
+    @staticmethod
+    def pixel_diff_ratio(img1: np.ndarray, img2: np.ndarray, threshold: float = 0.1) -> float:
+        """
+        pixelmatch 式感知差異：以 YIQ 色彩空間計算每個像素的差異，回傳超過閾值的像素比例
+        
+        Args:
+            img1: 第一張圖片的數組 (RGB, uint8)
+            img2: 第二張圖片的數組 (RGB, uint8)
+            threshold: 像素差異閾值（0-1，同 pixelmatch，預設 0.1）
+            
+        Returns:
+            差異像素比例 0-1（尺寸不同時視為完全不同，回傳 1.0）
+        """
+        if img1.shape != img2.shape:
+            return 1.0
+        if img1.size == 0:
+            return 0.0
+        
+        d = img1.astype(np.float32) - img2.astype(np.float32)
+        dr, dg, db = d[..., 0], d[..., 1], d[..., 2]
+        y = 0.29889531 * dr + 0.58662247 * dg + 0.11448223 * db
+        i = 0.59597799 * dr - 0.27417610 * dg - 0.32180189 * db
+        q = 0.21147017 * dr - 0.52261711 * dg + 0.31114694 * db
+        delta = 0.5053 * y * y + 0.299 * i * i + 0.1957 * q * q
+        # 35215 為 YIQ 差異的最大值
+        return float(np.count_nonzero(delta > 35215 * threshold * threshold)) / delta.size
+    
+    @staticmethod
+    def tile_changes(img1: np.ndarray, img2: np.ndarray, tile: int = 32, delta: int = 32) -> Optional[np.ndarray]:
+        """
+        將兩張圖片切成 tile×tile 的區塊比較，回傳每個區塊是否有變化的布林矩陣
+        
+        Args:
+            img1: 第一張圖片的數組 (RGB, uint8)
+            img2: 第二張圖片的數組 (RGB, uint8)
+            tile: 區塊邊長（像素）
+            delta: 任一通道差異超過此值的像素視為有變化
+            
+        Returns:
+            (列數, 行數) 的布林矩陣；尺寸不同時回傳 None
+        """
+        if img1.shape != img2.shape:
+            return None
+        diff = np.abs(img1.astype(np.int16) - img2.astype(np.int16))
+        changed = diff.max(axis=-1) > delta if diff.ndim == 3 else diff > delta
+        # 補齊到 tile 的整數倍後以 reshape 切塊（不複製區塊資料），邊緣不足一塊的部分也納入
+        pad_h, pad_w = -changed.shape[0] % tile, -changed.shape[1] % tile
+        if pad_h or pad_w:
+            changed = np.pad(changed, ((0, pad_h), (0, pad_w)))
+        rows, cols = changed.shape[0] // tile, changed.shape[1] // tile
+        return changed.reshape(rows, tile, cols, tile).any(axis=(1, 3))
+    
+    @staticmethod
+    def border_only_change(tiles: np.ndarray) -> bool:
+        """
+        外圈區塊有變化、內部區塊沒有變化（按鈕外框發光，而非內容動畫）
+        
+        區塊不足 3×3（沒有內部區塊）時，只要有任何區塊變化即成立
+        """
+        if tiles.shape[0] < 3 or tiles.shape[1] < 3:
+            return bool(tiles.any())
+        if tiles[1:-1, 1:-1].any():
+            return False
+        return bool(tiles[0].any() or tiles[-1].any() or tiles[:, 0].any() or tiles[:, -1].any())
+    
     @staticmethod
     async def compare_with_reference(
         page: Page,
@@ -161,30 +281,67 @@ class ImageComparator:
             similarity_threshold: 相似度閾值（0-1），超過此值認為匹配成功
             region: 可選的區域設定 {"x": 0, "y": 0, "width": 100, "height": 100}
             
+        Returns:
+            (是否匹配, 相似度分數, 訊息)
+        """
+        # 檢查參考圖片是否存在
+        if not reference_image_path.exists():
+            return False, 0.0, f"參考圖片不存在: {reference_image_path}"
+        
+        screenshot, error = await ImageComparator.capture(page, selector)
+        if screenshot is None:
+            return False, 0.0, error
+        return ImageComparator.compare_screenshot(screenshot, reference_image_path, similarity_threshold, region)
+    
+    @staticmethod
+    async def capture(page: Page, selector: Optional[str] = None) -> Tuple[Optional[bytes], str]:
+        """
+        截取元素（或整個頁面）
+        
+        Returns:
+            (截圖 bytes, 失敗原因)；失敗時截圖為 None
+        """
+        try:
+            if not selector:
+                return await page.screenshot(), ""
+            element = await page.wait_for_selector(selector, timeout=3000, state="visible")
+            if element:
+                return await element.screenshot(), ""
+            return None, f"找不到元素: {selector}"
+        except Exception as e:
+            return None, f"截圖失敗: {str(e)}"
+    
+    @staticmethod
+    def compare_screenshot(
+        screenshot: bytes,
+        reference_image_path: Path,
+        similarity_threshold: float = 0.8,
+        region: Optional[Dict[str, int]] = None
+    ) -> Tuple[bool, float, str]:
+        """
+        比對已截取的截圖與參考圖片（純 CPU 運算，不需要頁面）
+        
         Returns:
             (是否匹配, 相似度分數, 訊息)
         """
         try:
-            # 檢查參考圖片是否存在
             if not reference_image_path.exists():
                 return False, 0.0, f"參考圖片不存在: {reference_image_path}"
             
-            # 載入參考圖片
-            ref_img = Image.open(reference_image_path)
-            ref_array = np.array(ref_img)
+            # MD5 短路：截圖與參考圖片檔案完全相同時不需解碼比對；相同組合比對過則直接沿用結果
+            shot_md5 = hashlib.md5(screenshot).hexdigest()
+            ref_md5 = _reference_md5(reference_image_path)
+            if not region and shot_md5 == ref_md5:
+                return True, 1.0, "相似度: 100.00% (匹配, 截圖與參考圖片完全相同)"
+            region_key = tuple(sorted(region.items())) if region else None
+            cache_key = (ref_md5, shot_md5, region_key)
+            cached = _SIMILARITY_CACHE.get(cache_key)
+            if cached is not None:
+                _SIMILARITY_CACHE.move_to_end(cache_key)
+                return ImageComparator._build_result(*cached, similarity_threshold)
             
-            # 截取當前頁面
-            if selector:
-                try:
-                    element = await page.wait_for_selector(selector, timeout=3000, state="visible")
-                    if element:
-                        screenshot = await element.screenshot()
-                    else:
-                        return False, 0.0, f"找不到元素: {selector}"
-                except Exception as e:
-                    return False, 0.0, f"截圖失敗: {str(e)}"
-            else:
-                screenshot = await page.screenshot()
+            # 載入參考圖片（解碼結果快取，同一參考圖在各階段 / 各機器只讀取一次）
+            ref_array = _reference_array(reference_image_path)
             
             current_img = Image.open(io.BytesIO(screenshot))
             current_array = np.array(current_img)
@@ -221,32 +378,40 @@ class ImageComparator:
             
             # 計算相似度（使用 SSIM + 直方圖方法）
             similarity, info = ImageComparator.calculate_similarity(ref_array, current_array)
+            _SIMILARITY_CACHE[cache_key] = (similarity, info)
+            if len(_SIMILARITY_CACHE) > _SIMILARITY_CACHE_SIZE:
+                _SIMILARITY_CACHE.popitem(last=False)
             
-            # 判斷是否匹配
-            is_match = similarity >= similarity_threshold
-            
-            # 構建訊息
-            method = info.get("method", "unknown")
-            if method == "opencv_ssim":
-                message = (
-                    f"相似度: {similarity:.2%} ({'匹配' if is_match else '不匹配'}, "
-                    f"閾值: {similarity_threshold:.2%}) | "
-                    f"SSIM: {info.get('ssim', 0):.4f}, "
-                    f"直方圖: {info.get('histogram_similarity', 0):.4f}"
-                )
-            else:
-                message = (
-                    f"相似度: {similarity:.2%} ({'匹配' if is_match else '不匹配'}, "
-                    f"閾值: {similarity_threshold:.2%}) | "
-                    f"PSNR: {info.get('psnr', 0):.2f} dB"
-                )
-            
-            return is_match, similarity, message
+            return ImageComparator._build_result(similarity, info, similarity_threshold)
             
         except Exception as e:
             logging.error(f"[ImageComparator] 圖片比對過程發生錯誤: {e}")
             return False, 0.0, f"比對過程發生錯誤: {str(e)}"
     
+    @staticmethod
+    def _build_result(similarity: float, info: Dict[str, Any], similarity_threshold: float) -> Tuple[bool, float, str]:
+        """依閾值判斷是否匹配並組成訊息，回傳 (是否匹配, 相似度分數, 訊息)"""
+        # 判斷是否匹配
+        is_match = similarity >= similarity_threshold
+        
+        # 構建訊息
+        method = info.get("method", "unknown")
+        if method == "opencv_ssim":
+            message = (
+                f"相似度: {similarity:.2%} ({'匹配' if is_match else '不匹配'}, "
+                f"閾值: {similarity_threshold:.2%}) | "
+                f"SSIM: {info.get('ssim', 0):.4f}, "
+                f"直方圖: {info.get('histogram_similarity', 0):.4f}"
+            )
+        else:
+            message = (
+                f"相似度: {similarity:.2%} ({'匹配' if is_match else '不匹配'}, "
+                f"閾值: {similarity_threshold:.2%}) | "
+                f"PSNR: {info.get('psnr', 0):.2f} dB"
+            )
+        
+        return is_match, similarity, message
+    
     @staticmethod
     async def compare_stage(
         page: Page,
@@ -266,16 +431,34 @@ class ImageComparator:
         Returns:
             (是否匹配, 比對結果詳情)
         """
+        capture = await ImageComparator.capture_stage(page, stage_name, reference_images_dir, config)
+        return ImageComparator.compare_captured(capture)
+    
+    @staticmethod
+    async def capture_stage(
+        page: Page,
+        stage_name: str,
+        reference_images_dir: Path,
+        config: Dict[str, Any]
+    ) -> StageCapture:
+        """
+        找出階段的參考圖片並截圖（只截一次，所有參考圖片共用）
+        
+        Args:
+            page: Playwright Page 對象
+            stage_name: 階段名稱（例如 "entry", "video", "buttons"）
+            reference_images_dir: 參考圖片目錄
+            config: 比對配置
+            
+        Returns:
+            StageCapture，交給 compare_captured 完成比對
+        """
         stage_dir = reference_images_dir / stage_name
         
         if not stage_dir.exists():
             logging.warning(f"[ImageComparator] 階段 {stage_name} 的參考圖片目錄不存在: {stage_dir}")
-            return True, {"status": "skipped", "reason": "參考圖片目錄不存在"}
+            return StageCapture(stage_name, [], None, "", config, {"status": "skipped", "reason": "參考圖片目錄不存在"})
         
-        # 獲取配置
-        similarity_threshold = config.get("threshold", config.get("similarity_threshold", 0.8))
-        selector = config.get("selector")
-        region = config.get("region")
         image_files = config.get("images", [])
         
         # 獲取參考圖片列表
@@ -290,19 +473,42 @@ class ImageComparator:
         
         if not ref_images:
             logging.warning(f"[ImageComparator] 階段 {stage_name} 沒有找到參考圖片")
-            return True, {"status": "skipped", "reason": "沒有參考圖片"}
+            return StageCapture(stage_name, [], None, "", config, {"status": "skipped", "reason": "沒有參考圖片"})
+        
+        screenshot, error = await ImageComparator.capture(page, config.get("selector"))
+        return StageCapture(stage_name, ref_images, screenshot, error, config, None)
+    
+    @staticmethod
+    def compare_captured(capture: StageCapture) -> Tuple[bool, Dict[str, Any]]:
+        """
+        以 capture_stage 取得的截圖比對所有參考圖片（純 CPU 運算，可在背景執行）
+        
+        Returns:
+            (是否匹配, 比對結果詳情)
+        """
+        if capture.skipped is not None:
+            return True, capture.skipped
+        
+        # 獲取配置
+        config = capture.config
+        stage_name = capture.stage_name
+        similarity_threshold = config.get("threshold", config.get("similarity_threshold", 0.8))
+        region = config.get("region")
+        ref_images = capture.ref_images
         
         results = []
         all_match = True
         
         for ref_img_path in ref_images:
-            is_match, similarity, message = await ImageComparator.compare_with_reference(
-                page,
-                ref_img_path,
-                selector=selector,
-                similarity_threshold=similarity_threshold,
-                region=region
-            )
+            if capture.screenshot is None:
+                is_match, similarity, message = False, 0.0, capture.error
+            else:
+                is_match, similarity, message = ImageComparator.compare_screenshot(
+                    capture.screenshot,
+                    ref_img_path,
+                    similarity_threshold=similarity_threshold,
+                    region=region
+                )
             
             results.append({
                 "reference_image": ref_img_path.name,
@@ -1,82 +1,121 @@
-"""測試任務管理器 - 共享的 CSV 機器號佇列（線程安全）"""
+"""測試任務管理器 - 每個 Worker 一個本地佇列，空了就向其他 Worker 竊取（線程安全）"""
+import random
 import logging
-from typing import List, Optional, Dict
+import itertools
+from collections import deque
+from typing import Deque, List, Optional, Dict
 from threading import Lock
 
 
 class TestTaskManager:
     """
-    共享的 CSV 機器號佇列管理器
-    
-    所有 URL（GameRunner 線程）從同一個佇列中取機器號：
-    - URL A 取 CSV[0], URL B 取 CSV[1]
-    - A 跑完後取 CSV[2], B 跑完後取 CSV[3]
-    - 以此類推，直到所有機器號處理完畢
+    CSV 機器號的工作竊取（work-stealing）佇列管理器
+
+    啟動時將機器號依序輪流分配到每個 Worker 的本地佇列：
+    - Worker A 得到 CSV[0], CSV[2], ...；Worker B 得到 CSV[1], CSV[3], ...
+    - 每個 Worker 從自己佇列的前端依序取號，只需鎖住自己的佇列
+    - 自己的佇列空了，就隨機挑一個其他 Worker，從其佇列尾端竊取一個機器號
+    - 直到所有佇列都空了為止
+
+    未指定 worker_ids 時，所有機器號放在同一個佇列中，行為等同共享佇列。
     """
-    
-    def __init__(self, csv_data: List[str]):
+
+    def __init__(self, csv_data: List[str], worker_ids: Optional[List[str]] = None):
         """
-        初始化共享佇列
-        
+        初始化各 Worker 的本地佇列
+
         Args:
             csv_data: CSV 機器號列表，例如 ["873-JJBX-0004", "873-JJBX-0005", ...]
+            worker_ids: Worker 標識列表（與 get_next_csv 的 worker_id 對應）
         """
         self.csv_data = csv_data
-        self._next_index = 0
-        self._lock = Lock()
+        # 未指定 worker_ids 時，所有 Worker 共用 "" 這個佇列
+        self._shared = not worker_ids
+        self._worker_ids: List[str] = list(worker_ids) if worker_ids else [""]
+        self._queues: Dict[str, Deque[str]] = {wid: deque() for wid in self._worker_ids}
+        self._locks: Dict[str, Lock] = {wid: Lock() for wid in self._worker_ids}
+        for i, code in enumerate(csv_data):
+            self._queues[self._worker_ids[i % len(self._worker_ids)]].append(code)
+
+        # 已取出的機器號數量（itertools.count 的 next() 為原子操作）
+        self._taken_counter = itertools.count(1)
+        self._taken = 0
         # 追蹤每個 worker 完成的機器號
+        self._history_lock = Lock()
         self._worker_history: Dict[str, List[str]] = {}
-        
-        logging.info(f"[TaskManager] 初始化共享佇列: {len(csv_data)} 個機器號")
+
+        logging.info(f"[TaskManager] 初始化工作佇列: {len(csv_data)} 個機器號, {len(self._queues)} 個本地佇列")
         for i, code in enumerate(csv_data):
             logging.info(f"[TaskManager]   [{i+1}] {code}")
-    
+
+    def _pop_local(self, worker_id: str) -> Optional[str]:
+        """從自己的佇列前端取號（保持 CSV 順序）"""
+        if self._shared:
+            worker_id = ""
+        queue = self._queues.get(worker_id)
+        if queue is None:
+            return None
+        with self._locks[worker_id]:
+            return queue.popleft() if queue else None
+
+    def _steal(self, worker_id: str) -> Optional[str]:
+        """隨機挑選其他 Worker，從其佇列尾端竊取一個機器號"""
+        victims = [wid for wid in self._worker_ids if wid != worker_id]
+        random.shuffle(victims)
+        for victim in victims:
+            with self._locks[victim]:
+                queue = self._queues[victim]
+                if queue:
+                    return queue.pop()
+        return None
+
     def get_next_csv(self, worker_id: str = "") -> Optional[str]:
         """
-        從共享佇列中取得下一個機器號（線程安全）
-        
+        取得下一個機器號：先取自己的佇列，空了再向其他 Worker 竊取（線程安全）
+
         Args:
-            worker_id: 呼叫者標識（用於日誌追蹤）
-            
+            worker_id: 呼叫者標識（對應初始化時的 worker_ids，也用於日誌追蹤）
+
         Returns:
-            下一個機器號，如果佇列已空則返回 None
+            下一個機器號，如果所有佇列都已空則返回 None
         """
-        with self._lock:
-            if self._next_index >= len(self.csv_data):
-                logging.info(f"[TaskManager] {worker_id or 'Worker'} 請求機器號 - 佇列已空")
-                return None
-            
-            code = self.csv_data[self._next_index]
-            self._next_index += 1
-            
-            # 記錄歷史
-            if worker_id:
-                if worker_id not in self._worker_history:
-                    self._worker_history[worker_id] = []
-                self._worker_history[worker_id].append(code)
-            
-            logging.info(
-                f"[TaskManager] {worker_id or 'Worker'} 取得機器號 "
-                f"[{self._next_index}/{len(self.csv_data)}]: {code}"
-            )
-            return code
-    
+        code = self._pop_local(worker_id)
+        stolen = False
+        if code is None:
+            code = self._steal(worker_id)
+            stolen = code is not None
+
+        if code is None:
+            logging.info(f"[TaskManager] {worker_id or 'Worker'} 請求機器號 - 佇列已空")
+            return None
+
+        taken = next(self._taken_counter)
+        self._taken = max(self._taken, taken)
+
+        # 記錄歷史
+        if worker_id:
+            with self._history_lock:
+                self._worker_history.setdefault(worker_id, []).append(code)
+
+        logging.info(
+            f"[TaskManager] {worker_id or 'Worker'} {'竊取' if stolen else '取得'}機器號 "
+            f"[{taken}/{len(self.csv_data)}]: {code}"
+        )
+        return code
+
     def get_remaining_count(self) -> int:
         """取得佇列中剩餘的機器號數量"""
-        with self._lock:
-            return max(0, len(self.csv_data) - self._next_index)
-    
+        return max(0, len(self.csv_data) - self._taken)
+
     def get_progress(self) -> str:
         """取得進度字串，例如 '3/10'"""
-        with self._lock:
-            return f"{self._next_index}/{len(self.csv_data)}"
-    
+        return f"{self._taken}/{len(self.csv_data)}"
+
     def get_worker_history(self) -> Dict[str, List[str]]:
         """取得每個 worker 的執行歷史"""
-        with self._lock:
+        with self._history_lock:
             return {k: list(v) for k, v in self._worker_history.items()}
-    
+
     def is_all_done(self) -> bool:
         """是否所有機器號都已被取走"""
-        with self._lock:
-            return self._next_index >= len(self.csv_data)
+        return self._taken >= len(self.csv_data)
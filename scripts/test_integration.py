@@ -73,8 +73,9 @@ async def test_game_runner_integration():
         report = runner.test_report
         required_keys = ["url", "csv_data", "entry_status", "console_errors",
                         "video_status", "video_message", "button_tests", "bet_results"]
+        report_data = report.to_dict()
         for key in required_keys:
-            assert key in report, f"測試報告應包含 {key}"
+            assert key in report_data, f"測試報告應包含 {key}"
         print("[OK] 測試報告結構正確")
         
         # 檢查方法